@@ -0,0 +1,51 @@
+"""Compares retrieving objects one by one and in batches with ODMCursor.iter_batches.
+
+    python benchmarks/batches.py
+"""
+import timeit
+
+from ming import create_datastore, schema as S
+from ming.odm import ODMSession, MappedClass, FieldProperty, Mapper
+
+datastore = create_datastore('mim:///benchmark')
+session = ODMSession(bind=datastore)
+
+
+class Item(MappedClass):
+    class __mongometa__:
+        name = 'item'
+        session = session
+    _id = FieldProperty(S.ObjectId)
+    value = FieldProperty(int)
+    tags = FieldProperty([str])
+    meta = FieldProperty(dict(source=str, rank=int))
+
+
+Mapper.compile_all()
+
+
+def one_by_one():
+    session.clear()
+    for item in Item.query.find():
+        pass
+
+
+def in_batches():
+    session.clear()
+    for batch in Item.query.find().iter_batches(100):
+        pass
+
+
+def main(num_docs=10000):
+    session.clear()
+    Item.query.remove()
+    session.impl.db.item.insert_many([
+        dict(value=i, tags=['a', 'b'], meta=dict(source='benchmark', rank=i))
+        for i in range(num_docs)])
+    for name, read in (('one by one', one_by_one), ('in batches', in_batches)):
+        best = min(timeit.repeat(read, number=1, repeat=5))
+        print(f'{name}: {num_docs / best:10.0f} objects per second')
+
+
+if __name__ == '__main__':
+    main()
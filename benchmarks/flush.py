@@ -0,0 +1,46 @@
+"""Measures the cost of flushing one change in sessions tracking many clean objects.
+
+The flush cost is expected not to depend on the number of clean objects
+the session is tracking.
+
+    python benchmarks/flush.py
+"""
+import timeit
+
+from ming import create_datastore, schema as S
+from ming.odm import ODMSession, MappedClass, FieldProperty, Mapper
+
+datastore = create_datastore('mim:///benchmark')
+session = ODMSession(bind=datastore)
+
+
+class Item(MappedClass):
+    class __mongometa__:
+        name = 'item'
+        session = session
+    _id = FieldProperty(S.ObjectId)
+    value = FieldProperty(int)
+
+Mapper.compile_all()
+
+
+def main():
+    for num_clean in (100, 1000, 10000, 50000):
+        session.clear()
+        Item.query.remove()
+        items = [Item(value=i) for i in range(num_clean)]
+        session.flush()
+        # mim looks documents up by scanning the collection, change the
+        # first one stored so the scan doesn't hide the cost of the flush.
+        item = items[0]
+
+        def flush_one_change():
+            item.value += 1
+            session.flush()
+
+        best = min(timeit.repeat(flush_one_change, number=100, repeat=5)) / 100
+        print(f'{num_clean:>6} clean objects: {best * 1e6:8.1f} us per flush')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Compares loading wide documents of which only a few fields are read, with and without lazy_decoding.
+
+    python benchmarks/lazy_decoding.py
+"""
+import timeit
+
+from ming import create_datastore
+from ming.odm import ODMSession, MappedClass, FieldProperty, Mapper
+
+datastore = create_datastore('mim:///benchmark')
+session = ODMSession(bind=datastore)
+
+NUM_FIELDS = 60
+
+
+def wide_class(name, lazy_decoding):
+    fields = {'f%d' % i: FieldProperty(dict(value=int, tags=[str])) for i in range(NUM_FIELDS)}
+    fields['_id'] = FieldProperty(int)
+    fields['__mongometa__'] = type('__mongometa__', (), dict(
+        name='wide', session=session, lazy_decoding=lazy_decoding))
+    return type(name, (MappedClass,), fields)
+
+
+Eager = wide_class('Eager', False)
+Lazy = wide_class('Lazy', True)
+Mapper.compile_all()
+
+
+def read(cls):
+    session.clear()
+    for obj in cls.query.find():
+        obj.f0.value, obj.f1.value, obj.f2.value
+
+
+def main(num_docs=2000):
+    session.impl.db.wide.delete_many({})
+    session.impl.db.wide.insert_many([
+        dict(_id=i, **{'f%d' % f: dict(value=f, tags=['a', 'b']) for f in range(NUM_FIELDS)})
+        for i in range(num_docs)])
+    for cls in (Eager, Lazy):
+        best = min(timeit.repeat(lambda: read(cls), number=1, repeat=5))
+        print(f'{cls.__name__:5}: {num_docs / best:10.0f} objects per second')
+
+
+if __name__ == '__main__':
+    main()
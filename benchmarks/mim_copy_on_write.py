@@ -0,0 +1,32 @@
+"""Compares reading MIM documents as BSON copies and as copy-on-write copies.
+
+    python benchmarks/mim_copy_on_write.py
+"""
+import timeit
+from datetime import datetime
+
+from ming import mim
+
+
+def make_doc(i):
+    return dict(_id=i, name='name %d' % i, score=i * 1.5, created=datetime(2020, 1, 1),
+                tags=['a', 'b', 'c'], address=dict(street='street', city='city', zip='00000'),
+                items=[dict(sku='s%d' % j, qty=j, price=j * 2.5) for j in range(5)])
+
+
+def main(num_docs=10000):
+    for copy_on_write in (False, True):
+        connection = mim.Connection(copy_on_write=copy_on_write)
+        coll = connection.benchmark.docs
+        docs = [make_doc(i) for i in range(num_docs)]
+        inserting = min(timeit.repeat(lambda: (coll.delete_many({}), coll.insert_many(docs)),
+                                      number=1, repeat=3))
+        reading = min(timeit.repeat(lambda: list(coll.find()), number=1, repeat=5))
+        touching = min(timeit.repeat(lambda: [doc['items'][0]['qty'] for doc in coll.find()],
+                                     number=1, repeat=5))
+        print(f'copy_on_write={copy_on_write!s:5}: {num_docs / inserting:8.0f} inserts/s, '
+              f'{num_docs / reading:8.0f} reads/s, {num_docs / touching:8.0f} reads/s touching subdocuments')
+
+
+if __name__ == '__main__':
+    main()
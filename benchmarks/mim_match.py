@@ -0,0 +1,36 @@
+"""Compares scanning a MIM collection with compiled matchers and with ``mim.match``.
+
+    python benchmarks/mim_match.py
+"""
+import timeit
+
+from ming import mim
+
+QUERIES = {
+    'equality': {'kind': 'b', 'active': True},
+    'range': {'score': {'$gte': 10, '$lt': 20}},
+    'dotted': {'address.city': {'$in': ['c1', 'c2']}},
+    '$or': {'$or': [{'kind': 'a'}, {'score': {'$gt': 95}}]},
+    '$elemMatch': {'items': {'$elemMatch': {'sku': 's3', 'qty': {'$gt': 5}}}},
+}
+
+
+def main(num_docs=20000):
+    docs = [dict(_id=i, kind='abc'[i % 3], active=bool(i % 2), score=i % 100,
+                 address=dict(city='c%d' % (i % 10)),
+                 items=[dict(sku='s%d' % (j % 5), qty=j) for j in range(i % 4, i % 4 + 4)])
+            for i in range(num_docs)]
+    for name, spec in QUERIES.items():
+        matcher = mim.compile_match(spec)
+        assert (sum(1 for doc in docs if mim.match(spec, doc) is not None)
+                == sum(1 for doc in docs if matcher(doc)))
+        interpreted = min(timeit.repeat(
+            lambda: [doc for doc in docs if mim.match(spec, doc) is not None], number=1, repeat=3))
+        compiled = min(timeit.repeat(
+            lambda: [doc for doc in docs if matcher(doc)], number=1, repeat=3))
+        print(f'{name:11}: {num_docs / interpreted:10.0f} docs/s interpreted, '
+              f'{num_docs / compiled:10.0f} docs/s compiled ({interpreted / compiled:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
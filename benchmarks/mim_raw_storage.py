@@ -0,0 +1,37 @@
+"""Compares the memory and the speed of MIM collections storing decoded documents and BSON.
+
+    python benchmarks/mim_raw_storage.py
+"""
+import timeit
+import tracemalloc
+from datetime import datetime
+
+from ming import mim
+
+
+def make_doc(i):
+    return dict(_id=i, name='name %d' % i, score=i * 1.5, created=datetime(2020, 1, 1),
+                tags=['a', 'b', 'c'], address=dict(street='street', city='city', zip='00000'),
+                items=[dict(sku='s%d' % j, qty=j, price=j * 2.5) for j in range(5)])
+
+
+def main(num_docs=20000):
+    for raw_storage in (False, True):
+        connection = mim.Connection(raw_storage=raw_storage)
+        coll = connection.benchmark.docs
+        coll.create_index('name')
+        docs = [make_doc(i) for i in range(num_docs)]
+        tracemalloc.start()
+        coll.insert_many(docs)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        scanning = min(timeit.repeat(lambda: coll.find_one({'score': -1}), number=1, repeat=3))
+        reading = min(timeit.repeat(lambda: list(coll.find()), number=1, repeat=3))
+        indexed = min(timeit.repeat(lambda: coll.find_one({'name': 'name 5'}), number=1000, repeat=3))
+        print(f'raw_storage={raw_storage!s:5}: {size / num_docs:6.0f} bytes/doc, '
+              f'{num_docs / scanning:8.0f} docs/s scanned, {num_docs / reading:8.0f} docs/s read, '
+              f'{1000 / indexed:6.0f} indexed lookups/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Compares loading MIM fixtures by inserting them and by restoring a snapshot.
+
+    python benchmarks/mim_snapshot.py
+"""
+import os
+import tempfile
+import timeit
+from datetime import datetime
+
+from ming import mim
+
+
+def make_doc(i):
+    return dict(_id=i, name='name %d' % i, score=i * 1.5, created=datetime(2020, 1, 1),
+                tags=['a', 'b', 'c'], address=dict(street='street', city='city', zip='00000'),
+                items=[dict(sku='s%d' % j, qty=j, price=j * 2.5) for j in range(5)])
+
+
+def insert(connection, docs):
+    connection.drop_all()
+    coll = connection.benchmark.docs
+    coll.create_index('name', unique=True)
+    coll.create_index('score')
+    coll.insert_many(docs)
+
+
+def main(num_docs=20000):
+    docs = [make_doc(i) for i in range(num_docs)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'fixtures.bson')
+        connection = mim.Connection()
+        insert(connection, docs)
+        connection.snapshot(path)
+        inserting = min(timeit.repeat(lambda: insert(connection, docs), number=1, repeat=3))
+        print(f'insert_many     : {inserting:.3f}s')
+        for raw_storage in (False, True):
+            connection = mim.Connection(raw_storage=raw_storage)
+            restoring = min(timeit.repeat(lambda: connection.restore(path), number=1, repeat=3))
+            print(f'restore raw={raw_storage!s:5}: {restoring:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Compares the throughput of tracked and read only queries.
+
+    python benchmarks/readonly.py
+"""
+import timeit
+
+from ming import create_datastore, schema as S
+from ming.odm import ODMSession, MappedClass, FieldProperty, Mapper
+
+datastore = create_datastore('mim:///benchmark')
+session = ODMSession(bind=datastore)
+
+
+class Item(MappedClass):
+    class __mongometa__:
+        name = 'item'
+        session = session
+    _id = FieldProperty(S.ObjectId)
+    value = FieldProperty(int)
+    tags = FieldProperty([str])
+    meta = FieldProperty(dict(source=str, rank=int))
+
+
+Mapper.compile_all()
+
+
+def read(readonly):
+    session.clear()
+    for item in Item.query.find(readonly=readonly):
+        item.value, item.tags, item.meta.rank
+
+
+def main(num_docs=10000):
+    session.clear()
+    Item.query.remove()
+    session.impl.db.item.insert_many([
+        dict(value=i, tags=['a', 'b'], meta=dict(source='benchmark', rank=i))
+        for i in range(num_docs)])
+    for readonly in (False, True):
+        best = min(timeit.repeat(lambda: read(readonly), number=1, repeat=5))
+        print(f'readonly={readonly!s:5}: {num_docs / best:10.0f} objects per second')
+
+
+if __name__ == '__main__':
+    main()
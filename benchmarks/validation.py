@@ -0,0 +1,49 @@
+"""Compares validating documents with the compiled and the generic Object validation.
+
+    python benchmarks/validation.py
+"""
+import timeit
+from datetime import datetime
+
+import bson
+
+from ming import schema as S
+
+
+def make_schema():
+    return S.Document(dict(
+        _id=S.ObjectId(),
+        name=str,
+        score=float,
+        count=S.Int(if_missing=0),
+        active=bool,
+        tags=[str],
+        created=datetime,
+        address=dict(street=str, city=str, zip=str),
+        items=[dict(sku=str, qty=int, price=float)]))
+
+
+class Doc(dict):
+    pass
+
+
+def main(num_docs=5000):
+    docs = [
+        dict(_id=bson.ObjectId(), name='doc%d' % i, score=i / 3, count=i, active=bool(i % 2),
+             tags=['a', 'b', 'c'], created=datetime(2020, 1, 1),
+             address=dict(street='Main St', city='Springfield', zip='12345'),
+             items=[dict(sku='sku%d' % j, qty=j, price=j * 1.5) for j in range(5)])
+        for i in range(num_docs)]
+    compiled, generic = make_schema(), make_schema()
+    compiled.managed_class = generic.managed_class = Doc
+    generic.__dict__['_compiled'] = None
+    for item in generic.fields['address'], generic.fields['items'].field_type:
+        item.__dict__['_compiled'] = None
+    assert all(compiled.validate(d) == generic.validate(d) for d in docs)
+    for name, schema in (('generic', generic), ('compiled', compiled)):
+        elapsed = min(timeit.repeat(lambda: [schema.validate(d) for d in docs], number=1, repeat=5))
+        print(f'{name:10} {num_docs / elapsed:10.0f} docs/s')
+
+
+if __name__ == '__main__':
+    main()
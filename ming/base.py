@@ -1,9 +1,11 @@
 """Ming Base module.  Good stuff here.
 """
 import decimal
+import random
 import warnings
 from collections import defaultdict
 from datetime import datetime
+from itertools import islice
 
 import bson
 from bson import Decimal128
@@ -64,31 +66,84 @@ class Object(dict):
 class Cursor:
     '''Python class proxying a MongoDB cursor, constructing and validating
     objects that it tracks
+
+    When ``raw`` is ``True`` the documents are returned as they come
+    from MongoDB, without being constructed nor validated.
+
+    When ``sample_rate`` is set only that fraction of the documents is
+    validated, the others are trusted and only get their ``_id`` validated.
+    The validation errors of the sampled documents are passed to
+    ``on_invalid(cls, doc, error)`` and the document is trusted instead.
+
+    The ``deferred`` fields are the ones excluded from the documents
+    by the query projection, they are left out of their validation.
     '''
 
     def __bool__(self):
         raise MingException('Cannot evaluate Cursor to a boolean')
 
-    def __init__(self, cls, cursor, allow_extra=True, strip_extra=True, find_spec=None):
+    def __init__(self, cls, cursor, allow_extra=True, strip_extra=True, find_spec=None,
+                 raw=False, sample_rate=None, on_invalid=None, deferred=()):
         self.cls = cls
         self.cursor = cursor
         self._allow_extra = allow_extra
         self._strip_extra = strip_extra
         self.find_spec = find_spec
+        self._raw = raw
+        self._sample_rate = sample_rate
+        self._on_invalid = on_invalid
+        self._deferred = deferred
 
     def __iter__(self):
         return self
 
     def next(self):
         doc = next(self.cursor)
-        if doc is None: return None
+        if doc is None or self._raw: return doc
+        if self._sample_rate is not None: return self._make_sampled(doc)
         return self.cls.make(
             doc,
             allow_extra=self._allow_extra,
-            strip_extra=self._strip_extra)
+            strip_extra=self._strip_extra,
+            deferred=self._deferred)
 
     __next__ = next
 
+    def next_batch(self, size):
+        """Returns a list with up to ``size`` next objects, empty when exhausted"""
+        if self._raw:
+            return [doc for doc in islice(self.cursor, size) if doc is not None]
+        if self._sample_rate is not None:
+            return [self._make_sampled(doc)
+                    for doc in islice(self.cursor, size) if doc is not None]
+        make = self.cls.make
+        allow_extra, strip_extra, deferred = self._allow_extra, self._strip_extra, self._deferred
+        return [make(doc, allow_extra=allow_extra, strip_extra=strip_extra, deferred=deferred)
+                for doc in islice(self.cursor, size) if doc is not None]
+
+    def iter_batches(self, size=100):
+        """Iterates over the results in lists of up to ``size`` objects, see :meth:`next_batch`"""
+        while True:
+            batch = self.next_batch(size)
+            if not batch:
+                return
+            yield batch
+
+    def _make_sampled(self, doc):
+        if random.random() >= self._sample_rate:
+            return self.cls.m.make_trusted(doc)
+        from ming.schema import Invalid
+        try:
+            return self.cls.make(
+                doc,
+                allow_extra=self._allow_extra,
+                strip_extra=self._strip_extra,
+                deferred=self._deferred)
+        except Invalid as inv:
+            if self._on_invalid is not None:
+                self._on_invalid(self.cls, doc, inv)
+            return self.cls.m.make_trusted(doc)
+
     def count(self):
         """
         This method, although deprecated by pymongo, is kept for backcompat with existing code.
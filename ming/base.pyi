@@ -25,3 +25,5 @@ class Cursor(Iterator[M]):
     def one(self) -> M: ...
     def first(self) -> Optional[M]: ...
     def all(self) -> List[M]: ...
+    def next_batch(self, size: int) -> List[M]: ...
+    def iter_batches(self, size: int = 100) -> Iterator[List[M]]: ...
@@ -0,0 +1,203 @@
+"""Process wide cache of query results.
+
+Classes opt in with ``query_cache = True`` in their ``__mongometa__``,
+the results of their queries are then kept in :data:`query_cache` and
+reused by :meth:`.Session.find` until they expire or a write performed
+through a :class:`.Session` changes the collection they come from.
+Writes that don't go through Ming are not detected.
+"""
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from threading import Lock
+import time
+import weakref
+
+import bson
+import pymongo
+
+# Arguments of Collection.find which can be part of the cache key
+_CACHEABLE_ARGS = ('filter', 'projection', 'sort', 'skip', 'limit')
+
+
+class QueryCache:
+    """LRU cache of query results bound by number of entries and memory.
+
+    Results are stored encoded as BSON, so that they take less memory and
+    can't be changed by the objects created from them. ``max_size`` limits
+    the total size of the encoded results, ``ttl`` the seconds they are kept.
+    """
+
+    def __init__(self, max_entries=1000, ttl=60, max_size=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires, size, raw documents)
+        self._keys = defaultdict(set)  # collection -> keys
+        self._generations = defaultdict(int)  # collection -> writes counter
+        self._size = 0
+        self._lock = Lock()
+
+    def configure(self, **kwargs):
+        """Changes ``max_entries``, ``ttl`` or ``max_size`` and clears the cache"""
+        for k, v in kwargs.items():
+            if k not in ('max_entries', 'ttl', 'max_size'):
+                raise TypeError('Unexpected argument %r' % k)
+            setattr(self, k, v)
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._size = 0
+
+    def generation(self, collection_key):
+        """Counter of the writes to the collection identified by ``collection_key``"""
+        return self._generations[collection_key]
+
+    def get(self, key, codec_options=None):
+        """Returns the documents cached for ``key`` or ``None``"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, size, raw_docs = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+        if codec_options is None:
+            return [bson.decode(raw) for raw in raw_docs]
+        return [bson.decode(raw, codec_options) for raw in raw_docs]
+
+    def set(self, key, docs, generation, codec_options=None):
+        """Caches ``docs`` for ``key`` unless the collection changed since ``generation``"""
+        if codec_options is None:
+            raw_docs = [bson.encode(doc) for doc in docs]
+        else:
+            raw_docs = [bson.encode(doc, codec_options=codec_options) for doc in docs]
+        size = sum(len(raw) for raw in raw_docs)
+        if size > self.max_size:
+            return
+        collection = key[0]
+        with self._lock:
+            if self._generations[collection] != generation:
+                # Written while the query was running, results might be stale.
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, raw_docs)
+            self._keys[collection].add(key)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, collection):
+        """Forgets the results of the queries on the pymongo ``collection``"""
+        collection_key = _collection_key(collection)
+        with self._lock:
+            self._generations[collection_key] += 1
+            for key in self._keys.pop(collection_key, ()):
+                self._remove(key, forget=False)
+
+    def _remove(self, key, forget=True):
+        expires, size, raw_docs = self._entries.pop(key)
+        self._size -= size
+        if forget:
+            keys = self._keys.get(key[0])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys[key[0]]
+
+    def cursor(self, collection, *args, **kwargs):
+        """Returns a cursor for ``collection.find(*args, **kwargs)`` which uses the cache.
+
+        Queries using arguments other than the filter, projection, sort,
+        skip and limit are not cached and a plain cursor is returned.
+        """
+        spec = dict(zip(('filter', 'projection'), args))
+        if len(args) > 2 or not all(k in _CACHEABLE_ARGS and k not in spec for k in kwargs):
+            return collection.find(*args, **kwargs)
+        spec.update(kwargs)
+        return _CachingCursor(self, collection, spec)
+
+
+def _collection_key(collection):
+    # Referencing the client weakly doesn't keep alive the ones which are gone,
+    # while the collections of distinct clients get different keys
+    database = collection.database
+    return weakref.ref(database.client), database.name, collection.name
+
+
+class _CachingCursor:
+    """Stands in for a pymongo cursor, running the query only when not cached.
+
+    The whole result of the query is retrieved and cached when iterated.
+    Any option not supported by the cache switches to a plain cursor.
+    """
+
+    def __init__(self, cache, collection, spec):
+        self._cache = cache
+        self.collection = collection
+        self._spec = spec
+        self._results = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._results is None:
+            self._results = iter(self._fetch())
+        return next(self._results)
+
+    next = __next__
+
+    def _fetch(self):
+        try:
+            key = (_collection_key(self.collection), bson.encode(self._spec))
+        except (bson.errors.InvalidDocument, TypeError):
+            return self._cursor()
+        codec_options = getattr(self.collection, 'codec_options', None)
+        docs = self._cache.get(key, codec_options)
+        if docs is None:
+            generation = self._cache.generation(key[0])
+            docs = list(self._cursor())
+            self._cache.set(key, docs, generation, codec_options)
+        return docs
+
+    def _cursor(self):
+        return self.collection.find(**self._spec)
+
+    def limit(self, limit):
+        self._spec['limit'] = limit
+        return self
+
+    def skip(self, skip):
+        self._spec['skip'] = skip
+        return self
+
+    def sort(self, key_or_list, direction=None):
+        if isinstance(key_or_list, str):
+            key_or_list = [(key_or_list, direction or pymongo.ASCENDING)]
+        elif isinstance(key_or_list, Mapping):
+            key_or_list = key_or_list.items()
+        self._spec['sort'] = [tuple(k) for k in key_or_list]
+        return self
+
+    def rewind(self):
+        self._results = None
+        return self
+
+    def distinct(self, key):
+        return self.collection.distinct(key, self._spec.get('filter'))
+
+    def __getattr__(self, name):
+        # Anything else is delegated to a plain cursor
+        return getattr(self._cursor(), name)
+
+
+query_cache = QueryCache()
@@ -41,6 +41,9 @@ class _DocumentMeta(type):
         version_of=getattr(mm, 'version_of', None)
         migrate = getattr(mm, 'migrate', None)
         before_save = getattr(mm, 'before_save', None)
+        query_cache = getattr(mm, 'query_cache', None)
+        validate_reads = getattr(mm, 'validate_reads', None)
+        validate_saves = getattr(mm, 'validate_saves', None)
         if migrate:
             migrate = getattr(migrate, '__func__', migrate)
         if before_save:
@@ -53,7 +56,10 @@ class _DocumentMeta(type):
             polymorphic_registry=polymorphic_registry,
             version_of=version_of,
             migrate=migrate,
-            before_save=before_save)
+            before_save=before_save,
+            query_cache=query_cache,
+            validate_reads=validate_reads,
+            validate_saves=validate_saves)
         cls.m = _ManagerDescriptor(m)
         cls.__mongometa__ = mm
         return cls
@@ -1,4 +1,5 @@
 class MingException(Exception): pass
 class MongoGone(MingException): pass
 class MingConfigError(MingException): pass
+class ReadOnlyError(MingException): pass
     
@@ -8,7 +8,7 @@ from pymongo.errors import ConnectionFailure
 
 from . import schema as S
 from .base import Object
-from .utils import fixup_index, LazyProperty
+from .utils import fixup_index, LazyProperty, parse_validate_reads
 from .exc import MongoGone
 from .encryption import EncryptedMixin, NestedEncryptedField, NestedEncryptedFieldDescriptor
 
@@ -210,6 +210,7 @@ class _InstanceManager(metaclass=_CurriedProxyClass):
         self.schema = mgr.schema
         self.collection_name = mgr.collection_name
         self.before_save = mgr.before_save
+        self.validate_saves = mgr.validate_saves
         return
 
         def _proxy(name):
@@ -226,7 +227,7 @@ class _ClassManager(metaclass=_CurriedProxyClass):
     _proxy_on='session'
     _proxy_args=('cls',)
     _proxy_methods = (
-        'get', 'find', 'find_by', 'remove', 'count', 'update_partial',
+        'get', 'get_many', 'find', 'find_by', 'remove', 'count', 'update_partial',
         'create_index', 'ensure_index', 'ensure_indexes', 'index_information',  'drop_indexes',
         'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete',
         'aggregate', 'distinct',
@@ -238,7 +239,7 @@ class _ClassManager(metaclass=_CurriedProxyClass):
         polymorphic_on=None, polymorphic_identity=None,
         polymorphic_registry=None,
         version_of=None, migrate=None,
-        before_save=None):
+        before_save=None, query_cache=None, validate_reads=None, validate_saves=None):
         self.cls = cls
         self.collection_name = collection_name
         self.session = session
@@ -256,6 +257,12 @@ class _ClassManager(metaclass=_CurriedProxyClass):
         self.bases = self._get_bases()
         self.schema = self._get_schema()
         self._before_save = before_save
+        self._query_cache = query_cache
+        parse_validate_reads(validate_reads)
+        self._validate_reads = validate_reads
+        if validate_saves not in (None, 'changed', 'full'):
+            raise ValueError("validate_saves must be 'changed' or 'full', not %r" % (validate_saves,))
+        self._validate_saves = validate_saves
         return
 
         def _proxy(name):
@@ -302,6 +309,27 @@ class _ClassManager(metaclass=_CurriedProxyClass):
             if b.before_save: return b.before_save
         return None
 
+    @LazyProperty
+    def query_cache(self):
+        if self._query_cache is not None: return self._query_cache
+        for b in self.bases:
+            if b.query_cache: return b.query_cache
+        return False
+
+    @LazyProperty
+    def validate_reads(self):
+        if self._validate_reads is not None: return self._validate_reads
+        for b in self.bases:
+            if b.validate_reads: return b.validate_reads
+        return None
+
+    @LazyProperty
+    def validate_saves(self):
+        if self._validate_saves is not None: return self._validate_saves
+        for b in self.bases:
+            if b.validate_saves: return b.validate_saves
+        return None
+
     def _get_schema(self):
         schema = S.Document()
         for b in self.bases:
@@ -335,13 +363,44 @@ class _ClassManager(metaclass=_CurriedProxyClass):
         '''Load each doc in the collection and immediately save it'''
         for doc in self.find(): doc.m.save()
 
-    def make(self, data, allow_extra=False, strip_extra=True):
-        if self.schema:
-            return self.schema.validate(
+    def make(self, data, allow_extra=False, strip_extra=True, deferred=()):
+        """Validates ``data`` and builds the document out of it.
+
+        The ``deferred`` fields were left out when retrieving ``data``, so they
+        are neither required nor filled with their default values.
+        """
+        schema = self.schema
+        if deferred and isinstance(schema, S.Document):
+            cls = schema.get_polymorphic_cls(data) or self.cls
+            return cls.m._schema_without(frozenset(deferred)).validate(
+                data, allow_extra=allow_extra, strip_extra=strip_extra)
+        if schema:
+            return schema.validate(
                 data, allow_extra=allow_extra, strip_extra=strip_extra)
         else:
             return self.cls(data)
 
+    def _schema_without(self, names):
+        schemas = self.__dict__.setdefault('_schemas_without', {})
+        schema = schemas.get(names)
+        if schema is None:
+            schema = schemas[names] = self.schema.without(names)
+        return schema
+
+    def make_trusted(self, data):
+        """Like :meth:`make`, but only validates ``_id`` and trusts the rest of ``data``"""
+        schema = self.schema
+        if not isinstance(schema, S.Document):
+            return self.make(data, allow_extra=True)
+        cls = schema.get_polymorphic_cls(data) or self.cls
+        result = cls(data)
+        id_field = schema.fields.get('_id')
+        if id_field is not None:
+            _id = id_field.validate(data.get('_id', S.Missing))
+            if _id is not S.Missing:
+                result['_id'] = _id
+        return result
+
 
 class _ManagerDescriptor:
 
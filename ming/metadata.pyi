@@ -1,6 +1,6 @@
 from bson import ObjectId
 from datetime import datetime
-from typing import Generic, TypeVar, Any, Optional, overload, List, Dict, Type, Union, Mapping, type_check_only
+from typing import Generic, TypeVar, Any, Optional, overload, List, Dict, Type, Union, Mapping, Iterable, type_check_only
 from pymongo.results import UpdateResult, DeleteResult
 from pymongo.command_cursor import CommandCursor
 
@@ -185,9 +185,14 @@ SaveResult = Union[ObjectId, Any]
 class _ClassManager(Generic[M]):
     session: Session
     collection_name: str
+    validate_reads: Optional[str]
+    validate_saves: Optional[str]
+
+    def make_trusted(self, data: Mapping[str, Any]) -> M: ...
 
     # proxies these from Session
     def get(self, **kwargs) -> Optional[M]: ...
+    def get_many(self, ids: Iterable[Any], chunk_size: int = 1000) -> List[Optional[M]]: ...
     def find(self, filter: MongoFilter = None, *args, **kwargs) -> Cursor[M]: ...
     #@overload
     #def find(self, filter: MongoFilter = None, *args, validate: Literal[False], **kwargs) -> Generator[M]: ...
@@ -8,6 +8,7 @@ non-persistent and hopefully much, much faster
 import re
 import sys
 import time
+import bisect
 import itertools
 import uuid
 from itertools import chain
@@ -17,6 +18,8 @@ import logging
 import warnings
 from datetime import datetime
 from hashlib import md5
+import functools
+import operator
 from functools import cmp_to_key
 from enum import Enum
 
@@ -35,15 +38,17 @@ import bson
 from bson.binary import UuidRepresentation, Binary
 from bson.codec_options import CodecOptions
 from bson.raw_bson import RawBSONDocument
-from pymongo import database, collection, ASCENDING, MongoClient as RealMongoClient, UpdateOne
+from pymongo import database, collection, ASCENDING, MongoClient as RealMongoClient
+from pymongo import InsertOne, ReplaceOne, UpdateOne, UpdateMany, DeleteOne, DeleteMany
 from pymongo.cursor import Cursor as PymongoCursor
-from pymongo.errors import InvalidOperation, OperationFailure, DuplicateKeyError
+from pymongo.errors import InvalidOperation, OperationFailure, DuplicateKeyError, BulkWriteError
 from pymongo.results import DeleteResult, UpdateResult, InsertManyResult, InsertOneResult, BulkWriteResult
 
 log = logging.getLogger(__name__)
 
 UUID_REPRESENTATION = UuidRepresentation.PYTHON_LEGACY
 UUID_REPRESENTATION_STR = 'pythonLegacy'
+_SNAPSHOT_VERSION = 2
 
 
 class PymongoCursorNoCleanup(PymongoCursor):
@@ -64,8 +69,12 @@ class Connection(MongoClient):
             cls._singleton = cls()
         return cls._singleton
 
-    def __init__(self):
+    def __init__(self, copy_on_write=False, raw_storage=False):
         self._databases = {}
+        # Cursors return CowDict copies of the stored documents instead of BSON copies
+        self.copy_on_write = copy_on_write
+        # Collections store the BSON of the documents, decoding them when they are read
+        self.raw_storage = raw_storage
 
         # Clone defaults from a MongoClient instance.
         mongoclient = RealMongoClient(uuidRepresentation=UUID_REPRESENTATION_STR)
@@ -103,6 +112,52 @@ class Connection(MongoClient):
     def list_database_names(self):
         return self._databases.keys()
 
+    def snapshot(self, path):
+        """Writes the content of all the databases to ``path``, see :meth:`restore`.
+
+        The file is a stream of BSON documents: a header, then for each
+        collection its indexes followed by its documents.
+        """
+        with open(path, 'wb') as f:
+            f.write(bson.encode({'mim_snapshot': _SNAPSHOT_VERSION}))
+            for db in self._databases.values():
+                for coll in db._collections.values():
+                    coll._snapshot(f)
+
+    def restore(self, path):
+        """Replaces all the databases with the ones saved to ``path`` by :meth:`snapshot`.
+
+        Documents are loaded as they were saved, without validating them
+        or checking the unique indexes one document at a time, the indexes
+        are then built again from their definitions.
+
+        The existing databases and collections are restored in place, so
+        the handles already retrieved from this connection see the restored data,
+        those which are not in the snapshot are dropped.
+        """
+        with open(path, 'rb') as f:
+            stream = _bson_stream(f.read())
+        header = bson.decode(next(stream, bson.encode({})))
+        if header.get('mim_snapshot') != _SNAPSHOT_VERSION:
+            raise ValueError(f'{path} is not a MIM snapshot')
+        databases, self._databases = self._databases, {}
+        collections = {}  # database name -> collections not restored yet
+        for data in stream:
+            info = bson.decode(data)
+            db_name, coll_name = info['database'], info['collection']
+            db = self._databases.get(db_name)
+            if db is None:
+                db = databases.pop(db_name, None)
+                if db is None:
+                    db = Database(self, db_name)
+                self._databases[db_name] = db
+                collections[db_name], db._collections = db._collections, {}
+            coll = collections[db_name].pop(coll_name, None)
+            if coll is None:
+                coll = Collection(db, coll_name)
+            db._collections[coll_name] = coll
+            coll._restore(info, itertools.islice(stream, info['count']))
+
     def close(self):
         pass
 
@@ -116,6 +171,11 @@ class Connection(MongoClient):
     def __repr__(self):
         return 'mim.Connection()'
 
+    # Each connection is a distinct server, unlike MongoClient which compares addresses
+    __eq__ = object.__eq__
+    __ne__ = object.__ne__
+    __hash__ = object.__hash__
+
     def _ensure_connected(self):
         # For pymongo 2.7 compatibility
         return True
@@ -367,7 +427,10 @@ class Collection(collection.Collection):
         self._name = name
         self._database = database
         self._data = {}
+        self._positions = {}  # _id -> position of the document in _data
+        self._next_position = itertools.count()
         self._unique_indexes = {}  # name -> doc index {key_values -> _id}
+        self._secondary_indexes = {}  # name -> SecondaryIndex
         self._indexes = {}  # name -> dict of details (including 'key' entry)
 
     def __repr__(self):
@@ -375,8 +438,11 @@ class Collection(collection.Collection):
 
     def clear(self):
         self._data = {}
+        self._positions = {}
         for ui in self._unique_indexes.values():
             ui.clear()
+        for si in self._secondary_indexes.values():
+            si.clear()
 
     @property
     def name(self):
@@ -386,6 +452,14 @@ class Collection(collection.Collection):
     def database(self):
         return self._database
 
+    @property
+    def _copy_on_write(self):
+        return self._database.client.copy_on_write
+
+    @property
+    def _raw_storage(self):
+        return self._database.client.raw_storage
+
     def with_options(self, codec_options=None, read_preference=None, write_concern=None, read_concern=None):
         # options have no meaning for MIM
         return self
@@ -396,20 +470,84 @@ class Collection(collection.Collection):
     def __getattr__(self, name):
         return self._database[f'{self.name}.{name}']
 
-    def _find(self, spec, sort=None, **kwargs):
+    def _find(self, spec, sort=None, plan=None, **kwargs):
         bson_safe(spec)
+        spec = dict(spec)  # spec could be RawBSONDocument which needs to be converted to dict
+        if plan is None:
+            plan = self._plan(spec, sort)
+        matcher = compile_match(spec)
         def _gen():
-            for doc in self._data.values():
-                mspec = match(dict(spec), doc)  # spec could be RawBSONDocument which needs to be converted to dict
-                if mspec is not None: yield doc, mspec
+            if plan.ids is None:
+                # documents could be removed while iterating
+                docs = list(self._data.values())
+            else:
+                docs = (self._data[_id] for _id in plan.ids if _id in self._data)
+            for doc in docs:
+                doc = _load(doc)
+                plan.docs_examined += 1
+                if matcher(doc): yield doc
         return _gen()
 
+    def _plan(self, spec, sort=None):
+        """Chooses how to find the documents matching ``spec``.
+
+        The ``_id`` lookups use the documents storage, the other fields
+        use the :class:`SecondaryIndex` of the first index on them, if any.
+        When an index can avoid sorting the documents in memory it's used
+        for that when no index can be used to select them.
+        The candidate documents are always matched against ``spec``.
+        """
+        spec = dict(spec)
+        best = None
+        for field, condition in spec.items():
+            if field.startswith('$'):
+                continue
+            ops = dict(_parse_query(condition))
+            values = _equal_values(ops)
+            if field == '_id' and values is not None:
+                return QueryPlan('IDHACK', self._natural_order(v for v in values if v in self._data))
+            index = self._index_on(field)
+            if index is None:
+                continue
+            if values is not None:
+                plan = QueryPlan('IXSCAN', index.equal(values), index)
+            else:
+                bounds = _range_bounds(ops)
+                if bounds is None:
+                    continue
+                entries, others = index.range(*bounds)
+                if _sort_key(sort) == field and not others:
+                    plan = QueryPlan('IXSCAN', _entries_order(entries, sort[0][1]), index, sorted=True)
+                else:
+                    plan = QueryPlan('IXSCAN', {entry[2] for entry in entries} | others, index)
+            if best is None or len(plan.ids) < len(best.ids):
+                best = plan
+        if best is not None:
+            if not best.sorted:
+                best.ids = self._natural_order(best.ids)
+            return best
+        index = self._index_on(_sort_key(sort))
+        if index is not None and not index.others:
+            return QueryPlan('IXSCAN', _entries_order(index.ordered, sort[0][1]), index, sorted=True)
+        return QueryPlan('COLLSCAN')
+
+    def _index_on(self, field):
+        if field is None:
+            return None
+        for index in self._secondary_indexes.values():
+            if index.field == field:
+                return index
+        return None
+
+    def _natural_order(self, ids):
+        return sorted(ids, key=self._positions.__getitem__)
+
     def find(self, filter=None, projection=None, skip=0, limit=0, **kwargs):
         if filter is None:
             filter = {}
         PymongoCursorNoCleanup(collection=self, **kwargs)  # use this to raise any errors on invalid kwargs
         cur = Cursor(collection=self, projection=projection, limit=limit, skip=skip,
-                     _iterator_gen=lambda: self._find(filter, **kwargs))
+                     _iterator_gen=lambda: self._find(filter, **kwargs), _filter=filter)
         sort = kwargs.get('sort')
         if sort:
             cur = cur.sort(sort)
@@ -497,17 +635,20 @@ class Collection(collection.Collection):
         if not isinstance(doc_or_docs, list):
             doc_or_docs = [ doc_or_docs ]
         for doc in doc_or_docs:
-            bson_safe(doc)
+            # like bcopy(doc), but encoding doc only once
+            encoded = bson_safe(doc)
+            stored = encoded.decode() if isinstance(doc, dict) else doc
             _id = doc.get('_id', ())
             if _id == ():
-                _id = doc['_id'] = bson.ObjectId()
+                _id = doc['_id'] = stored['_id'] = bson.ObjectId()
+                encoded = None
             result.append(_id)
             if _id in self._data:
                 if kwargs.get('w', 1):
                     raise DuplicateKeyError('duplicate ID on insert')
                 continue
             self._index(doc)
-            self._data[_id] = bcopy(doc)
+            self._store(_id, stored, encoded)
         if len(result) > 1:
             return InsertManyResult(result, True)
         else:
@@ -533,10 +674,25 @@ class Collection(collection.Collection):
             nModified=0,
             upserted=None,
         )
-        for doc, mspec in self._find(spec):
-            self._deindex(doc)
-            mspec.update(updates)
-            self._index(doc)
+        for doc in self._find(spec):
+            _id = doc['_id']
+            updated = doc
+            if self._copy_on_write and isinstance(self._data[_id], dict):
+                # the stored document could be shared with the documents returned by cursors
+                updated = _copy_doc(doc)
+            # MatchDoc tracks the array positions the $ operator updates
+            mspec = match(spec, updated) or MatchDoc(updated)
+            self._deindex_secondary(_id, doc)
+            try:
+                self._deindex(doc)
+                mspec.update(updates)
+                self._index(updated)
+                self._data[_id] = bson_safe(updated) if self._raw_storage else updated
+            except Exception:
+                updated = _load(self._data[_id])
+                raise
+            finally:
+                self._index_secondary(_id, updated)
             raw_result['n'] += 1
             raw_result['nModified'] += 1
             if not multi:
@@ -552,7 +708,7 @@ class Collection(collection.Collection):
             if _id in self._data:
                 raise DuplicateKeyError('duplicate ID on upsert')
             self._index(doc)
-            self._data[_id] = bcopy(doc)
+            self._store(_id, bcopy(doc))
             raw_result['upserted'] = _id
             return UpdateResult(raw_result, True)
         else:
@@ -571,14 +727,17 @@ class Collection(collection.Collection):
         )
         multi = kwargs.get('multi', True)
         if spec is None: spec = {}
-        new_data = {}
-        for id, doc in self._data.items():
-            if match(spec, doc) and (multi or result['n'] == 0):
-                result['n'] += 1
-                self._deindex(doc)
-            else:
-                new_data[id] = doc
-        self._data = new_data
+        removed = []
+        for doc in self._find(spec):
+            removed.append(doc)
+            if not multi: break
+        for doc in removed:
+            _id = doc['_id']
+            result['n'] += 1
+            self._deindex(doc)
+            self._deindex_secondary(_id, doc)
+            del self._data[_id]
+            del self._positions[_id]
         return DeleteResult(result, True)
 
     def delete_one(self, filter, session=None):
@@ -595,20 +754,25 @@ class Collection(collection.Collection):
         if isinstance(key_or_list, (list, collections.abc.ItemsView)):
             keys = tuple(tuple(k) for k in key_or_list)
         else:
-            keys = ([key_or_list, ASCENDING],)
+            keys = ((key_or_list, ASCENDING),)
         if name:
             index_name = name
         else:
             index_name = '_'.join([k[0] for k in keys])
         self._indexes[index_name] = { "key": list(keys) }
         self._indexes[index_name].update(kwargs)
-        if not unique: return
+        if SecondaryIndex.supports(keys):
+            self._secondary_indexes[index_name] = index = SecondaryIndex(index_name, keys)
+            index.build((_id, _load(doc), self._positions[_id]) for _id, doc in self._data.items())
+        else:
+            self._secondary_indexes.pop(index_name, None)
+        if not unique: return index_name
         self._indexes[index_name]['unique'] = True
         self._unique_indexes[index_name] = docindex = {}
 
         # update the document index with any existing records
         for id, doc in self._data.items():
-            key_values = self._extract_index_key(doc, keys)
+            key_values = self._extract_index_key(_load(doc), keys)
             docindex[key_values] = id
 
         return index_name
@@ -621,6 +785,7 @@ class Collection(collection.Collection):
     def drop_index(self, iname):
         self._indexes.pop(iname, None)
         self._unique_indexes.pop(iname, None)
+        self._secondary_indexes.pop(iname, None)
 
     def drop_indexes(self):
         for iname in list(self._indexes.keys()):
@@ -661,20 +826,110 @@ class Collection(collection.Collection):
             key_values = self._extract_index_key(doc, keys)
             docindex.pop(key_values, None)
 
+    def _snapshot(self, f):
+        f.write(bson_safe({
+            'database': self.database.name,
+            'collection': self.name,
+            'count': len(self._data),
+            'indexes': [dict(details, name=name) for name, details in self._indexes.items()],
+            'raw_documents': [_id for _id, stored in self._data.items()
+                              if isinstance(stored, RawBSONDocument)],
+        }))
+        for _id in self._positions:
+            stored = self._data[_id]
+            if isinstance(stored, bytes):
+                f.write(stored)
+            elif isinstance(stored, RawBSONDocument):
+                f.write(stored.raw)
+            else:
+                f.write(bson_safe(stored))
+
+    def _restore(self, info, docs):
+        raw_documents = set(info['raw_documents'])
+        raw_storage = self._raw_storage
+        self._data = data = {}
+        self._positions = positions = {}
+        for position, encoded in enumerate(docs):
+            if raw_storage or raw_documents:
+                stored = RawBSONDocument(encoded)
+                _id = stored['_id']
+                if _id not in raw_documents:
+                    stored = encoded if raw_storage else bson.decode(encoded)
+            else:
+                stored = bson.decode(encoded)
+                _id = stored['_id']
+            data[_id] = stored
+            positions[_id] = position
+        self._next_position = itertools.count(len(positions))
+        self._indexes, self._unique_indexes, self._secondary_indexes = {}, {}, {}
+        for details in info['indexes']:
+            details = dict(details)
+            name, keys = details.pop('name'), details.pop('key')
+            self.create_index([tuple(k) for k in keys], name=name, **details)
+
+    def _store(self, _id, doc, encoded=None):
+        """Stores ``doc``, or its BSON in raw_storage mode, ``encoded`` when already known"""
+        if self._raw_storage and isinstance(doc, dict):
+            self._data[_id] = encoded if encoded is not None else bson_safe(doc)
+        else:
+            self._data[_id] = doc
+        self._positions[_id] = next(self._next_position)
+        self._index_secondary(_id, doc)
+
+    def _index_secondary(self, _id, doc):
+        for index in self._secondary_indexes.values():
+            index.add(_id, doc, self._positions[_id])
+
+    def _deindex_secondary(self, _id, doc):
+        for index in self._secondary_indexes.values():
+            index.remove(_id, doc, self._positions[_id])
+
     def distinct(self, key, filter=None, **kwargs):
         return self.database.command({'distinct': self.name,
                                       'key': key,
                                       'filter': filter})
 
     def bulk_write(self, requests, ordered=True,
-                   bypass_document_validation=False) -> BulkWriteResult:
-        for step in requests:
-            if isinstance(step, UpdateOne):
-                return self.update_one(step._filter, step._doc, upsert=step._upsert)
-            else:
-                raise NotImplementedError(
-                    "MIM currently doesn't support %s operations" % type(step)
-                )
+                   bypass_document_validation=False, session=None) -> BulkWriteResult:
+        raw_result = dict(
+            writeErrors=[],
+            writeConcernErrors=[],
+            nInserted=0,
+            nUpserted=0,
+            nMatched=0,
+            nModified=0,
+            nRemoved=0,
+            upserted=[],
+        )
+        for index, step in enumerate(requests):
+            try:
+                if isinstance(step, InsertOne):
+                    self.__insert(step._doc)
+                    raw_result['nInserted'] += 1
+                elif isinstance(step, (UpdateOne, UpdateMany, ReplaceOne)):
+                    result = self.__update(step._filter, step._doc, upsert=step._upsert,
+                                           multi=isinstance(step, UpdateMany))
+                    if result.upserted_id is not None:
+                        raw_result['nUpserted'] += 1
+                        raw_result['upserted'].append(dict(index=index, _id=result.upserted_id))
+                    else:
+                        raw_result['nMatched'] += result.matched_count
+                        raw_result['nModified'] += result.modified_count
+                elif isinstance(step, (DeleteOne, DeleteMany)):
+                    result = self.__remove(step._filter, multi=isinstance(step, DeleteMany))
+                    raw_result['nRemoved'] += result.deleted_count
+                else:
+                    raise NotImplementedError(
+                        "MIM currently doesn't support %s operations" % type(step)
+                    )
+            except DuplicateKeyError as e:
+                raw_result['writeErrors'].append(dict(index=index, code=11000,
+                                                      errmsg=str(e), op=step))
+                if ordered:
+                    break
+        if raw_result['writeErrors']:
+            raise BulkWriteError(raw_result)
+        return BulkWriteResult(raw_result, True)
 
     def aggregate(self, pipeline, **kwargs):
         steps = {}
@@ -700,12 +955,13 @@ class Collection(collection.Collection):
 
 class Cursor:
     def __init__(self, collection, _iterator_gen,
-                 sort=None, skip=None, limit=None, projection=None):
+                 sort=None, skip=None, limit=None, projection=None, _filter=None):
         if isinstance(projection, (tuple, list)):
             projection = {f: 1 for f in projection}
 
         self.collection = collection
         self._iterator_gen = _iterator_gen
+        self._filter = _filter  # the query, when the documents come from collection._find
         self._sort = sort
         self._skip = skip or None    # cope with 0 being passed.
         self._limit = limit or None  # cope with 0 being passed.
@@ -715,12 +971,17 @@ class Cursor:
     @LazyProperty
     def iterator(self):
         self._safe_to_chain = False
-        # normally a (doc, match) tuple but could be a single doc (e.g. when gridfs indexes involved)
-        result = (doc_match[0] if isinstance(doc_match, tuple) else doc_match
-                  for doc_match in self._iterator_gen())
-        if self._sort is not None:
+        sort = self._sort
+        if self._filter is not None:
+            plan = self.collection._plan(self._filter, sort)
+            if plan.sorted:
+                sort = None
+            result = self.collection._find(self._filter, plan=plan)
+        else:
+            result = self._iterator_gen()
+        if sort is not None:
             result = sorted(result, key=cmp_to_key(
-                    cursor_comparator(self._sort)))
+                    cursor_comparator(sort)))
         if self._skip is not None:
             result = itertools.islice(result, self._skip, sys.maxsize)
         if self._limit is not None:
@@ -735,6 +996,7 @@ class Cursor:
             skip=self._skip,
             limit=self._limit,
             projection=self._projection._projection,
+            _filter=self._filter,
         )
         for k,v in overrides.items():
             setattr(result, k, v)
@@ -773,12 +1035,23 @@ class Cursor:
 
     def next(self):
         value = next(self.iterator)
-        value = bcopy(value)
-        value = self._projection.apply(value)
+        document_class = self.collection.codec_options.document_class
+        if type(value) is dict and isinstance(self.collection._data.get(value.get('_id')), bytes):
+            # just decoded from the BSON stored in raw_storage mode
+            value = self._projection.apply(value)
+            if document_class is dict:
+                return value
+        elif self.collection._copy_on_write and type(value) is dict:
+            value = self._projection.apply(CowDict(value))
+            if document_class is dict:
+                return value
+        else:
+            value = bcopy(value)
+            value = self._projection.apply(value)
 
         # mim doesn't currently do anything with codec_options, so this doesn't do anything currently
         # but leaving it here as a placeholder for the future - otherwise we should delete wrap_as_class()
-        return wrap_as_class(value, self.collection.codec_options.document_class)
+        return wrap_as_class(value, document_class)
 
     __next__ = next
 
@@ -838,12 +1111,41 @@ class Cursor:
             raise TypeError('hint index should be string, list of tuples, or None, but was %s' % type(index))
         return self
 
+    def explain(self):
+        """Reports how the query is run, similarly to MongoDB.
+
+        The ``winningPlan`` is a ``COLLSCAN`` when the whole collection is scanned,
+        an ``IDHACK`` when looking up ``_id`` values or an ``IXSCAN`` when an index
+        was used, in which case a ``SORT`` stage means the index wasn't used to sort.
+        """
+        if self._filter is None:
+            raise InvalidOperation('explain is only supported for queries')
+        plan = self.collection._plan(self._filter, self._sort)
+        returned = sum(1 for _ in self.collection._find(self._filter, plan=plan))
+        winning_plan = plan.explain()
+        if self._sort is not None and not plan.sorted:
+            winning_plan = {'stage': 'SORT', 'sortPattern': dict(self._sort),
+                            'inputStage': winning_plan}
+        return {
+            'queryPlanner': {
+                'namespace': f'{self.collection.database.name}.{self.collection.name}',
+                'parsedQuery': self._filter,
+                'winningPlan': winning_plan,
+            },
+            'executionStats': {
+                'nReturned': returned,
+                'totalKeysExamined': plan.keys_examined,
+                'totalDocsExamined': plan.docs_examined,
+            },
+        }
+
     def add_option(self, *args, **kwargs):
         # Adding options to MIM does nothing.
         pass
 
     def close(self):
         self._iterator_gen = lambda: iter(())
+        self._filter = None
 
 
 def cursor_comparator(keys):
@@ -863,9 +1165,11 @@ class BsonArith:
 
     @classmethod
     def cmp(cls, x, y):
-        x_bson = cls.to_bson(x)
-        y_bson = cls.to_bson(y)
+        return cls.cmp_bson(cls.to_bson(x), cls.to_bson(y))
 
+    @classmethod
+    def cmp_bson(cls, x_bson, y_bson):
+        """Compares two values already converted by :meth:`to_bson`"""
         if len(x_bson) != len(y_bson):
             return compat.base_cmp(len(x_bson),
                                    len(y_bson))
@@ -958,6 +1262,281 @@ def match(spec, doc):
     return mspec
 
 
+def compile_match(spec):
+    """Compiles ``spec`` into a function checking if a document matches it.
+
+    The function answers like ``match(spec, doc) is not None`` but doesn't
+    copy the spec nor wrap the document in a ``MatchDoc`` on each call,
+    so it's meant to be reused against all the documents of a query.
+    Unlike ``match`` it doesn't create the missing parents of the paths
+    it traverses, so later keys of the spec see the document as MongoDB does.
+    Specs using operators which aren't compiled are checked by ``match``.
+    """
+    spec = bcopy(spec)
+    try:
+        shape, params = _spec_shape(spec)
+        compiled = _matcher_factory(shape)(iter(params))
+    except _Uncompiled:
+        return lambda doc: match(spec, doc) is not None
+
+    def matcher(doc):
+        try:
+            return compiled(doc)
+        except (TypeError, ValueError, KeyError):
+            # Paths through scalars, list indexes out of range and values which
+            # can't be compared: match raises its own error or answers for them.
+            return match(spec, doc) is not None
+    return matcher
+
+
+class _Uncompiled(Exception):
+    pass
+
+
+_COMPILED_OPS = frozenset(('$eq', '$ne', '$gt', '$gte', '$lt', '$lte', '$in', '$nin',
+                           '$exists', '$all', '$elemMatch', '$regex', '$options'))
+_REGEX_TYPES = (bson.RE_TYPE, bson.Regex)
+
+
+def _spec_shape(spec):
+    """Splits ``spec`` into its shape, which compiled matchers are cached by, and its values.
+
+    The values are listed in the order the matcher built for the shape consumes them.
+    """
+    params = []
+    shape = _collect_shape(spec, params)
+    return shape, params
+
+
+def _collect_shape(spec, params):
+    if not isinstance(spec, dict):
+        raise _Uncompiled(spec)
+    branches = None
+    if '$or' in spec:
+        branches = tuple(_collect_shape(branch, params) for branch in spec['$or'])
+    fields = []
+    for key, value in spec.items():
+        if key == '$or':
+            continue
+        if '$' in key:
+            raise _Uncompiled(key)
+        ops = []
+        for op, arg in _parse_query(value):
+            if op not in _COMPILED_OPS:
+                raise _Uncompiled(op)
+            if op == '$elemMatch':
+                ops.append((op, _collect_shape(arg, params)))
+                continue
+            if op in ('$in', '$nin', '$all') and not isinstance(arg, list):
+                raise _Uncompiled(op)
+            ops.append((op, None))
+            params.append(arg)
+        fields.append((key, tuple(ops)))
+    return branches, tuple(fields)
+
+
+@functools.lru_cache(maxsize=512)
+def _matcher_factory(shape):
+    """Builds a function making the matcher of specs shaped like ``shape`` from their values"""
+    branches, fields = shape
+    branch_factories = None
+    if branches is not None:
+        branch_factories = [_matcher_factory(branch) for branch in branches]
+    field_factories = [(_path_resolver(key), [_op_factory(op, sub) for op, sub in ops])
+                       for key, ops in fields]
+
+    def make(params):
+        or_matchers = None
+        if branch_factories is not None:
+            or_matchers = [factory(params) for factory in branch_factories]
+        checks = [(resolve, [factory(params) for factory in op_factories])
+                  for resolve, op_factories in field_factories]
+
+        def matcher(doc):
+            if not isinstance(doc, dict):
+                raise TypeError(f'cannot match {doc!r}')
+            if or_matchers is not None and not any(m(doc) for m in or_matchers):
+                return False
+            for resolve, tests in checks:
+                container, key = resolve(doc)
+                for test in tests:
+                    if not _match_at(container, key, test):
+                        return False
+            return True
+        return matcher
+    return make
+
+
+_MISSING_PARENT = {}
+
+
+def _path_resolver(key):
+    """Resolves the dotted ``key`` to ``(container, leaf_key)`` like ``MatchDoc.traverse``"""
+    parts = key.split('.')
+    if len(parts) == 1:
+        return lambda doc: (doc, key)
+    head, last = parts[:-1], parts[-1]
+
+    def resolve(doc):
+        container = doc
+        for part in head:
+            if isinstance(container, dict):
+                if part not in container:
+                    return _MISSING_PARENT, last
+                child = container[part]
+                if child is None:
+                    return _MISSING_PARENT, None
+            else:
+                try:
+                    child = container[int(part)]
+                except IndexError:
+                    raise KeyError(part)
+            if not isinstance(child, (dict, list)):
+                raise TypeError(f'cannot traverse {child!r}')
+            container = child
+        return container, last
+    return resolve
+
+
+def _match_at(container, key, test):
+    if isinstance(container, list):
+        return _list_match(container, key, test)
+    return _value_match(container, key, test)
+
+
+def _value_match(container, key, test):
+    """Checks ``container[key]`` like ``Match.match``"""
+    if isinstance(container, list):
+        try:
+            val = container[int(key)]
+        except IndexError:
+            val = ()
+    else:
+        val = container.get(key, ())
+    if isinstance(val, list) and _list_match(val, '$', test):
+        return True
+    return test(container, key, val)
+
+
+def _list_match(container, key, test):
+    """Checks ``container[key]`` and ``key`` in the items of the list like ``MatchList.match``"""
+    if key == '$':
+        return any(_list_match(container, i, test) for i in range(len(container)))
+    try:
+        if _value_match(container, key, test):
+            return True
+    except (TypeError, ValueError):
+        pass  # key isn't an index of the list or the values can't be compared
+    for item in container:
+        if isinstance(item, (dict, list)) and _match_at(item, key, test):
+            return True
+    return False
+
+
+# Types for which BsonArith.cmp gives the same result as the Python operators
+_NATIVE_CMP_TYPES = frozenset((int, str, bool, bson.ObjectId, type(None)))
+
+
+def _op_factory(op, sub):
+    """Builds a function making the test of ``op`` from the values of a spec.
+
+    Tests are called with ``(container, key, value)`` and implement the
+    operators like ``Match.match``, after the items of lists were checked.
+    """
+    if op == '$elemMatch':
+        factory = _matcher_factory(sub)
+
+        def make(params):
+            matcher = factory(params)
+
+            def test(container, key, val):
+                return isinstance(val, list) and any(matcher(item) for item in val)
+            return test
+        return make
+    if op in ('$in', '$nin', '$all'):
+        return lambda params: _set_test(op, [_eq_test(ele) for ele in next(params)])
+    return lambda params: _value_test(op, next(params))
+
+
+def _value_test(op, arg):
+    if op == '$eq':
+        return _eq_test(arg)
+    if op == '$ne':
+        eq = _eq_test(arg)
+        return lambda container, key, val: not eq(container, key, val)
+    if op in ('$gt', '$gte', '$lt', '$lte'):
+        return _range_test(op, arg)
+    if op == '$exists':
+        if arg:
+            return lambda container, key, val: val != ()
+        return lambda container, key, val: val == ()
+    if op == '$regex':
+        if not isinstance(arg, _REGEX_TYPES):
+            arg = re.compile(arg)
+        return _regex_test(arg)
+    if op == '$options':
+        def test(container, key, val):
+            log.warning('$options not implemented')
+            return True
+        return test
+    raise _Uncompiled(op)
+
+
+def _eq_test(arg):
+    if isinstance(arg, _REGEX_TYPES):
+        return _regex_test(arg)
+    arg_bson = BsonArith.to_bson(arg)
+    arg_type = type(arg)
+    cmp_bson, to_bson = BsonArith.cmp_bson, BsonArith.to_bson
+    if arg_type in _NATIVE_CMP_TYPES:
+        def test(container, key, val):
+            if type(val) is arg_type:
+                return val == arg
+            return cmp_bson(to_bson(val), arg_bson) == 0
+    else:
+        def test(container, key, val):
+            return cmp_bson(to_bson(val), arg_bson) == 0
+    return test
+
+
+def _range_test(op, arg):
+    compare = {'$gt': operator.gt, '$gte': operator.ge,
+               '$lt': operator.lt, '$lte': operator.le}[op]
+    arg_bson = BsonArith.to_bson(arg)
+    arg_type = type(arg)
+    cmp_bson, to_bson = BsonArith.cmp_bson, BsonArith.to_bson
+    native = arg_type in _NATIVE_CMP_TYPES and arg is not None
+
+    def test(container, key, val):
+        if native and type(val) is arg_type:
+            return compare(val, arg)
+        return compare(cmp_bson(to_bson(val), arg_bson), 0)
+    return test
+
+
+def _regex_test(regex):
+    if isinstance(regex, bson.Regex):
+        try:
+            regex = regex.try_compile()
+        except re.error:
+            pass  # fails like Match._match_regex does when there is something to match
+
+    def test(container, key, val):
+        pattern = regex.try_compile() if isinstance(regex, bson.Regex) else regex
+        if isinstance(val, list):
+            return any(item not in (None, ()) and pattern.search(item) for item in val)
+        return bool(val not in (None, ()) and pattern.search(val))
+    return test
+
+
+def _set_test(op, eqs):
+    if op == '$in':
+        return lambda container, key, val: any(_match_at(container, key, eq) for eq in eqs)
+    if op == '$nin':
+        return lambda container, key, val: not any(_match_at(container, key, eq) for eq in eqs)
+    return lambda container, key, val: all(_match_at(container, key, eq) for eq in eqs)
+
+
 class Match:
     """Foundation for ``MatchDoc`` and ``MatchList``.
 
@@ -1398,6 +1977,243 @@ def compare(op, a, b):
         return match(b, a)
     raise NotImplementedError(op)
 
+# Types of the values the indexes can look up, ordered like BsonArith.cmp compares them
+_INDEX_KEY_TYPES = frozenset(BsonArith.bson_type(value) for value in (
+    None, 0, '', b'', bson.ObjectId(), False, datetime(2000, 1, 1), 0.0))
+_NONE_TYPE = BsonArith.bson_type(None)
+_FLOAT_TYPE = BsonArith.bson_type(0.0)
+_NAN_KEY = (_FLOAT_TYPE, 'nan')  # BsonArith.cmp finds NaN equal to any float
+
+
+def _index_key(value):
+    """The key of ``value`` in a :class:`SecondaryIndex`, ``None`` when it can't be indexed"""
+    try:
+        tp = BsonArith.bson_type(value)
+    except KeyError:
+        return None
+    if tp not in _INDEX_KEY_TYPES:
+        return None
+    if isinstance(value, float) and value != value:
+        return None  # NaN
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return None  # can't be ordered with the naive datetimes stored
+    return BsonArith.to_bson(value)
+
+
+def _path_values(value, parts):
+    """Yields all the values ``parts`` leads to, looking inside the lists found on the way"""
+    if isinstance(value, list):
+        for item in value:
+            yield from _path_values(item, parts)
+    elif not parts:
+        yield value
+    elif isinstance(value, dict) and parts[0] in value:
+        yield from _path_values(value[parts[0]], parts[1:])
+
+
+def _path_scalar(value, parts):
+    """The value ``parts`` leads to if it's reached only through subdocuments, ``()`` otherwise"""
+    for part in parts:
+        if not isinstance(value, dict) or part not in value:
+            return ()
+        value = value[part]
+    return value
+
+
+class SecondaryIndex:
+    """Index of the values of the first field of a collection index.
+
+    ``hashed`` maps the key of each value of the field, including the items
+    of arrays, to the ``_id`` of the documents holding it. ``ordered`` holds
+    ``(key, position, _id)`` for the documents where the field is a single
+    value, sorted like ``BsonArith.cmp`` sorts them, and ``others`` holds the
+    ``_id`` of the remaining documents, which a range query can't rule out.
+
+    Indexes only pick the candidate documents of a query, those are then
+    matched against the whole query.
+    """
+
+    def __init__(self, name, keys):
+        self.name = name
+        self.keys = keys
+        self.field = keys[0][0]
+        self._parts = self.field.split('.')
+        self.clear()
+
+    @classmethod
+    def supports(cls, keys):
+        field, direction = keys[0]
+        if direction not in (1, -1, 'hashed'):
+            return False
+        return not any(part.isdigit() or part.startswith('$') for part in field.split('.'))
+
+    def clear(self):
+        self.hashed = collections.defaultdict(set)
+        self.ordered = []
+        self.others = set()
+
+    def _keys(self, doc):
+        keys = set()
+        for value in _path_values(doc, self._parts):
+            key = _index_key(value)
+            if key is not None:
+                keys.add(key)
+            elif isinstance(value, float) and value != value:
+                keys.add(_NAN_KEY)
+        return keys
+
+    def build(self, docs):
+        """Indexes the ``(_id, doc, position)`` of ``docs``, sorting them only once"""
+        for _id, doc, position in docs:
+            entry = self._add(_id, doc, position)
+            if entry is not None:
+                self.ordered.append(entry)
+        self.ordered.sort()
+
+    def add(self, _id, doc, position):
+        entry = self._add(_id, doc, position)
+        if entry is not None:
+            bisect.insort(self.ordered, entry)
+
+    def _add(self, _id, doc, position):
+        for key in self._keys(doc):
+            self.hashed[key].add(_id)
+        key = _index_key(_path_scalar(doc, self._parts))
+        if key is None:
+            self.others.add(_id)
+            return None
+        return key, position, _id
+
+    def remove(self, _id, doc, position):
+        for key in self._keys(doc):
+            ids = self.hashed.get(key)
+            if ids is not None:
+                ids.discard(_id)
+                if not ids:
+                    del self.hashed[key]
+        key = _index_key(_path_scalar(doc, self._parts))
+        if key is None:
+            self.others.discard(_id)
+        else:
+            i = bisect.bisect_left(self.ordered, (key, position))
+            if i < len(self.ordered) and self.ordered[i][2] == _id:
+                del self.ordered[i]
+
+    def equal(self, values):
+        """The ``_id`` of the documents which might hold any of ``values``"""
+        ids = set()
+        for value in values:
+            key = _index_key(value)
+            ids.update(self.hashed.get(key, ()))
+            if key[0] == _FLOAT_TYPE:
+                ids.update(self.hashed.get(_NAN_KEY, ()))
+        return ids
+
+    def range(self, lower, lower_inclusive, upper, upper_inclusive):
+        """The ``ordered`` entries between the bounds and the ``others`` documents"""
+        start, end = 0, len(self.ordered)
+        if lower is not None:
+            lower = _index_key(lower)
+            if lower_inclusive:
+                start = bisect.bisect_left(self.ordered, (lower,))
+            else:
+                start = bisect.bisect_right(self.ordered, (lower, float('inf')))
+        if upper is not None:
+            upper = _index_key(upper)
+            if upper_inclusive:
+                end = bisect.bisect_right(self.ordered, (upper, float('inf')))
+            else:
+                end = bisect.bisect_left(self.ordered, (upper,))
+        return self.ordered[start:end], self.others
+
+
+class QueryPlan:
+    """How the documents matching a query are found.
+
+    ``ids`` are the ``_id`` of the candidate documents in the order they
+    are examined, or ``None`` when the whole collection is scanned.
+    ``sorted`` tells whenever they are already in the order requested.
+    """
+
+    def __init__(self, stage, ids=None, index=None, sorted=False):
+        self.stage = stage
+        self.ids = ids
+        self.index = index
+        self.sorted = sorted
+        self.docs_examined = 0
+
+    @property
+    def keys_examined(self):
+        return 0 if self.ids is None else len(self.ids)
+
+    def explain(self):
+        if self.index is None:
+            return {'stage': self.stage}
+        return {'stage': 'FETCH', 'inputStage': {
+            'stage': self.stage,
+            'indexName': self.index.name,
+            'keyPattern': dict(self.index.keys),
+        }}
+
+
+def _equal_values(ops):
+    """The values an equality or ``$in`` condition looks for, if they can be looked up"""
+    if '$eq' in ops:
+        values = [ops['$eq']]
+    elif '$in' in ops and isinstance(ops['$in'], (list, tuple)):
+        values = list(ops['$in'])
+    else:
+        return None
+    for value in values:
+        key = _index_key(value)
+        if key is None or key[0] == _NONE_TYPE:
+            return None
+    return values
+
+
+def _range_bounds(ops):
+    """The ``(lower, lower_inclusive, upper, upper_inclusive)`` bounds of a range condition"""
+    lower = upper = None
+    lower_inclusive = upper_inclusive = False
+    for op, value in ops.items():
+        if op not in ('$gt', '$gte', '$lt', '$lte'):
+            continue
+        key = _index_key(value)
+        if key is None or key[0] == _NONE_TYPE:
+            return None
+        if op in ('$gt', '$gte'):
+            if lower is not None:
+                return None
+            lower, lower_inclusive = value, op == '$gte'
+        else:
+            if upper is not None:
+                return None
+            upper, upper_inclusive = value, op == '$lte'
+    if lower is None and upper is None:
+        return None
+    return lower, lower_inclusive, upper, upper_inclusive
+
+
+def _sort_key(sort):
+    """The field of a sort on a single field"""
+    if sort and len(sort) == 1 and sort[0][1] in (1, -1):
+        return sort[0][0]
+    return None
+
+
+def _entries_order(entries, direction):
+    """The ``_id`` of the :class:`SecondaryIndex` entries sorted in ``direction``.
+
+    Like the sorting of cursors, documents with the same value are kept in natural order.
+    """
+    if direction == 1:
+        return [entry[2] for entry in entries]
+    result = []
+    for _, group in itertools.groupby(reversed(entries), key=lambda entry: entry[0]):
+        result.extend(entry[2] for entry in reversed(list(group)))
+    return result
+
+
 def validate(doc):
     for k,v in doc.items():
         assert '$' not in k
@@ -1409,6 +2225,21 @@ def bson_safe(obj):
     codec_options = CodecOptions(uuid_representation=UUID_REPRESENTATION)
     return bson.BSON.encode(obj, codec_options=codec_options)
 
+def _bson_stream(data):
+    """Yields the BSON documents written one after the other in ``data``"""
+    pos = 0
+    while pos < len(data):
+        size = int.from_bytes(data[pos:pos + 4], 'little')
+        yield data[pos:pos + size]
+        pos += size
+
+
+def _load(stored):
+    """The document stored in a collection, decoding the ones stored as BSON"""
+    if isinstance(stored, bytes):
+        return bson.decode(stored)
+    return stored
+
 def bcopy(obj):
     if isinstance(obj, dict):
         return bson_safe(obj).decode()
@@ -1417,6 +2248,165 @@ def bcopy(obj):
     else:
         return obj
 
+def _copy_doc(obj):
+    """Copies the dicts and lists of a decoded document, sharing its immutable values"""
+    if isinstance(obj, dict):
+        return {k: _copy_doc(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_copy_doc(v) for v in obj]
+    return obj
+
+
+def _cow(value):
+    if type(value) is dict:
+        return CowDict(value)
+    elif type(value) is list:
+        return CowList(value)
+    return value
+
+
+class CowDict(dict):
+    """A copy of a stored document which copies its subdocuments when they are accessed.
+
+    The stored document ``source`` is never modified, so the dicts and lists
+    it holds are shared until they are read from this copy: they are then
+    replaced by a ``CowDict`` or ``CowList`` of their own.
+    """
+    _source = {}
+
+    def __init__(self, source):
+        dict.__init__(self, source)
+        self._source = source
+
+    def _thaw(self, key, value):
+        if value is not self._source.get(key, self) or type(value) not in (dict, list):
+            return value
+        value = _cow(value)
+        dict.__setitem__(self, key, value)
+        return value
+
+    def _thaw_all(self):
+        for key, value in dict.items(self):
+            self._thaw(key, value)
+
+    def __getitem__(self, key):
+        return self._thaw(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def pop(self, key, *default):
+        if key in self:
+            self[key]
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._thaw_all()
+        return dict.popitem(self)
+
+    def __iter__(self):
+        # makes dict(self) and {**self} go through __getitem__
+        return dict.__iter__(self)
+
+    def values(self):
+        self._thaw_all()
+        return dict.values(self)
+
+    def items(self):
+        self._thaw_all()
+        return dict.items(self)
+
+    def copy(self):
+        self._thaw_all()
+        return dict(dict.items(self))
+
+    __copy__ = copy
+
+    def __or__(self, other):
+        return self.copy() | other
+
+    def __ror__(self, other):
+        return other | self.copy()
+
+    def __reduce_ex__(self, protocol):
+        return dict, (self.copy(),)
+
+
+class CowList(list):
+    """A copy of a list of a stored document, see :class:`CowDict`"""
+    _shared = frozenset()
+
+    def __init__(self, source):
+        list.__init__(self, source)
+        self._source = source  # keeps the ids of the shared values from being reused
+        self._shared = {id(value) for value in source if type(value) in (dict, list)}
+
+    def _thaw(self, index, value):
+        if id(value) not in self._shared or type(value) not in (dict, list):
+            return value
+        self._shared.discard(id(value))
+        value = _cow(value)
+        list.__setitem__(self, index, value)
+        return value
+
+    def _thaw_all(self):
+        if self._shared:
+            for index, value in enumerate(list.__iter__(self)):
+                self._thaw(index, value)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._thaw_all()
+            return list.__getitem__(self, index)
+        if index < 0:
+            index += len(self)
+        return self._thaw(index, list.__getitem__(self, index))
+
+    def __iter__(self):
+        self._thaw_all()
+        return list.__iter__(self)
+
+    def __reversed__(self):
+        self._thaw_all()
+        return list.__reversed__(self)
+
+    def pop(self, *index):
+        self._thaw_all()
+        return list.pop(self, *index)
+
+    def sort(self, *args, **kwargs):
+        self._thaw_all()
+        list.sort(self, *args, **kwargs)
+
+    def copy(self):
+        self._thaw_all()
+        return list(list.__iter__(self))
+
+    __copy__ = copy
+
+    def __add__(self, other):
+        return self.copy() + other
+
+    def __radd__(self, other):
+        return other + self.copy()
+
+    def __mul__(self, n):
+        return self.copy() * n
+
+    __rmul__ = __mul__
+
+    def __reduce_ex__(self, protocol):
+        return list, (self.copy(),)
+
+
 def wrap_as_class(value, as_class):
     if isinstance(value, dict):
         return as_class({
@@ -1,6 +1,12 @@
-from copy import deepcopy
+from copy import copy, deepcopy
 import typing
 
+from bson.raw_bson import RawBSONDocument
+
+from ming.base import Missing
+from ming.exc import ReadOnlyError
+from ming.schema import Invalid
+
 
 if typing.TYPE_CHECKING:
     # avoid circular imports
@@ -42,20 +48,229 @@ class _with_hooks:
 class ObjectState:
     new, clean, dirty, deleted = 'new clean dirty deleted'.split()
 
-    def __init__(self, options, session):
+    def __init__(self, options, session, instance=None):
         self.options = options
         self.session = session
-        self.status = self.new
+        self.instance = instance
+        self.evicted_from = None  # session which expunged the object to track less objects
+        self._status = self.new
+        # fields of the document not yet decoded nor validated, see set_lazy
+        self._raw = self._lazy_fields = None
+        self.deferred = set()  # names of the fields excluded when the document was loaded
         self.original_document = None # unvalidated, as loaded from mongodb
         self.document = None
         self.i_document = {}
         self.extra_state = {}
         self.tracker = _DocumentTracker(self)
+        # changes since original_document as {path: [op, values]},
+        # None when the changes are not known.
+        self.changes = {}
+        self._changed_prefixes = set()
+
+    @property
+    def document(self):
+        if self._lazy_fields is not None:
+            self._load_lazy_fields()
+        return self._document
+
+    @document.setter
+    def document(self, value):
+        if self._lazy_fields is not None:
+            self._load_lazy_fields()
+        self._document = value
+
+    @property
+    def original_document(self):
+        if self._lazy_fields is not None:
+            self._load_lazy_fields()
+        return self._original_document
+
+    @original_document.setter
+    def original_document(self, value):
+        if self._lazy_fields is not None:
+            self._load_lazy_fields()
+        self._original_document = value
+
+    def set_lazy(self, raw, schema, deferred=()):
+        """Uses ``raw``, a document as loaded from MongoDB, as the document.
+
+        Fields of ``raw`` are only decoded and validated with the fields of
+        the ``schema`` :class:`ming.schema.Document` when they are first accessed,
+        or all together when the whole document is needed. The ``deferred``
+        fields were excluded from ``raw`` and are retrieved when accessed instead.
+        """
+        cls = schema.managed_class
+        self._document = cls.__new__(cls)
+        self._original_document = cls.__new__(cls)
+        self._raw = raw
+        self.deferred.update(deferred)
+        self._lazy_fields = {name: field for name, field in schema.fields.items()
+                             if name not in self.deferred}
+        self.i_document = {}
+
+    def field(self, name):
+        """Gets the value of the ``name`` field of the document.
+
+        Deferred fields are retrieved from MongoDB. Raises ``KeyError``
+        when the document has no such field.
+        """
+        if self.deferred and name in self.deferred:
+            sess = self.session or session(self.instance.__class__)
+            sess.load_fields([self.instance], name)
+        if self._lazy_fields is not None and name in self._lazy_fields:
+            self._load_lazy_field(name)
+        return self._document[name]
+
+    def set_loaded(self, name, value):
+        """Stores ``value`` for the deferred ``name`` field, as retrieved from MongoDB"""
+        self.deferred.discard(name)
+        if self._lazy_fields is not None:
+            self._lazy_fields.pop(name, None)
+            if not self._lazy_fields:
+                self._raw = self._lazy_fields = None
+        self.i_document.pop(name, None)
+        for document in (self._document, self._original_document):
+            if value is Missing:
+                document.pop(name, None)
+            else:
+                document[name] = value
+
+    def _load_lazy_field(self, name):
+        field = self._lazy_fields[name]
+        value = field.validate(_decoded(self._raw.get(name, Missing)),
+                               allow_extra=True, strip_extra=True)
+        del self._lazy_fields[name]
+        if value is not Missing:
+            # Like the shallow copy of validated documents, they share the value
+            self._document[name] = value
+            self._original_document[name] = value
+        if not self._lazy_fields:
+            self._raw = self._lazy_fields = None
+
+    def _load_lazy_fields(self):
+        errors = []
+        for name in list(self._lazy_fields):
+            try:
+                self._load_lazy_field(name)
+            except Invalid as inv:
+                errors.append((name, inv))
+        if errors:
+            msg = '\n'.join('%s:%s' % t for t in errors)
+            raise Invalid(msg, self._raw, None, error_dict=dict(errors))
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        if value in (self.dirty, self.deleted):
+            self._check_writable()
+        old, self._status = self._status, value
+        if old != value and self.session is not None:
+            # Keep the UnitOfWork aware of the objects it has to flush
+            self.session.uow.status_changed(self, old)
+        elif value != self.clean and self.evicted_from is not None:
+            # Evicted because it was clean, it has to be tracked again to be flushed
+            sess, self.evicted_from = self.evicted_from, None
+            sess.save(self.instance)
+
+    def _check_writable(self):
+        if self.options.get('readonly', False):
+            raise ReadOnlyError('Fields of objects retrieved by readonly queries cannot be changed')
 
     def soil(self):
-        if self.status == self.clean:
+        """Marks the object to be saved, replacing the whole document.
+
+        As the changes made to the document are unknown, a full save is the
+        only way to persist them, like when values nested in it changed in place.
+        """
+        self.changes = None
+        self._soil()
+
+    def _soil(self):
+        if self._status == self.clean:
             self.status = self.dirty
 
+    def record(self, path, op, values=None):
+        """Records a change to the document at ``path`` (a tuple of keys).
+
+        ``op`` is ``'push'`` or ``'pull'`` of ``values`` for lists, or
+        ``'set'`` when the value at ``path`` is just to be stored as it is.
+        Changes that would conflict with each other are merged into a ``'set'``
+        of their closest common path.
+        """
+        changes = self.changes
+        if changes is not None:
+            for i in range(1, len(path)):
+                ancestor = changes.get(path[:i])
+                if ancestor is not None:
+                    ancestor[:] = ['set', None]
+                    break
+            else:
+                current = changes.get(path)
+                if current is not None:
+                    if current[0] == op and op != 'set':
+                        current[1].extend(values)
+                    else:
+                        current[:] = ['set', None]
+                else:
+                    if path in self._changed_prefixes:
+                        for p in [p for p in changes if p[:len(path)] == path]:
+                            del changes[p]
+                        op, values = 'set', None
+                    changes[path] = [op, list(values) if values is not None else None]
+                    self._changed_prefixes.update(path[:i] for i in range(1, len(path)))
+        self._soil()
+
+    def saved(self):
+        """Marks the current document as the one stored on MongoDB"""
+        self.status = self.clean
+        self.original_document = copy(self.document)
+        self.changes = {}
+        self._changed_prefixes = set()
+
+    def partial_update(self):
+        """Gets the update operators persisting the changes since ``original_document``.
+
+        Returns ``None`` when the document should be replaced instead,
+        either because the changes are unknown or because every field changed.
+        """
+        document, original, changes = self.document, self.original_document, self.changes
+        if changes is None or original is None:
+            return None
+        if '_id' not in document or document['_id'] != original.get('_id', ()):
+            return None
+        touched = {path[0] for path in changes}
+        fields_set, fields_unset, fields_push, fields_pull = {}, {}, {}, {}
+        for k, v in document.items():
+            if k not in touched and (k not in original or not _same_value(original[k], v)):
+                fields_set[k] = v
+        for k in original:
+            if k not in document and k not in touched:
+                fields_unset[k] = ''
+        for path, (op, values) in changes.items():
+            key = '.'.join(str(p) for p in path)
+            if op == 'push':
+                fields_push[key] = {'$each': values}
+            elif op == 'pull':
+                fields_pull[key] = values
+            else:
+                value = _lookup_path(document, path)
+                if value is Missing:
+                    fields_unset[key] = ''
+                else:
+                    fields_set[key] = value
+        if len([k for k in fields_set if '.' not in k]) == len(document) - 1:
+            # Every field apart from _id is replaced, the update would not be smaller
+            return None
+        update = {}
+        for op, fields in (('$set', fields_set), ('$unset', fields_unset),
+                           ('$push', fields_push), ('$pullAll', fields_pull)):
+            if fields:
+                update[op] = fields
+        return update
+
     def validate(self, schema):
         status = self.status
         self.document = schema.validate(self.document)
@@ -72,7 +287,7 @@ class ObjectState:
             return self.i_document[name]
         except KeyError:
             from .icollection import instrument
-            result = instrument(self.document[name], self.tracker)
+            result = instrument(self.field(name), _FieldTracker(self, name), key=name)
             self.i_document[name] = result
         return result
 
@@ -81,23 +296,84 @@ class ObjectState:
         self.i_document = {}
 
     def set(self, name, value):
-        self.document[name] = value
+        self._check_writable()
+        self.deferred.discard(name)
+        if self._lazy_fields is not None and name in self._lazy_fields:
+            self._load_lazy_field(name)
+        self._document[name] = value
         self.i_document.pop(name, None)
+        self.record((name,), 'set')
 
     def delete(self, name):
-        del self.document[name]
+        self._check_writable()
+        self.deferred.discard(name)
+        if self._lazy_fields is not None and name in self._lazy_fields:
+            self._load_lazy_field(name)
+        del self._document[name]
         self.i_document.pop(name, None)
+        self.record((name,), 'set')
+
+def _decoded(value):
+    """Converts the embedded documents of a decoded BSON value to dicts"""
+    if isinstance(value, RawBSONDocument):
+        return {k: _decoded(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decoded(v) for v in value]
+    return value
+
+def _same_value(a, b):
+    return a is b or (type(a) is type(b) and a == b)
+
+def _lookup_path(document, path):
+    value = document
+    for key in path:
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and isinstance(key, int) and 0 <= key < len(value):
+            value = value[key]
+        else:
+            return Missing
+    return value
 
 class _DocumentTracker:
+    """Tracks changes anywhere in the document, without knowing which field changed"""
     __slots__ = ('state',)
 
     def __init__(self, state):
         self.state = state
 
-    def soil(self, value):
+    def soil(self, value=None):
         self.state.soil()
     added_items = soil
     added_item = soil
     removed_item = soil
+    removed_items = soil
+    cleared = soil
+
+class _FieldTracker:
+    """Tracks changes to the collections instrumented for a top level field.
+
+    The instrumented collections report what changed through :meth:`record`,
+    the other notifications only soil the object.
+    """
+    __slots__ = ('state', 'name')
+
+    def __init__(self, state, name):
+        self.state = state
+        self.name = name
+
+    def record(self, path, op, values=None):
+        if path is None:
+            # Change to a value which is not part of the document anymore.
+            path, op, values = (self.name,), 'set', None
+        self.state.record(path, op, values)
+
+    def soil(self, value=None):
+        # The changes were already reported through record
+        self.state._soil()
+    added_items = soil
+    added_item = soil
+    removed_item = soil
+    removed_items = soil
     cleared = soil
 
@@ -36,6 +36,12 @@ class _MappedClassMeta(type):
         include_properties = getattr(mm, 'include_properties', [])
         exclude_properties = getattr(mm, 'exclude_properties', [])
         extensions = getattr(mm, 'extensions', [])
+        mapper_kwargs = {}
+        if getattr(mm, 'deferred_fields', None):
+            mapper_kwargs['deferred_fields'] = mm.deferred_fields
+        lazy_options = {k: True for k in ('lazy_decoding', 'lazy_validation') if getattr(mm, k, False)}
+        if lazy_options:
+            mapper_kwargs['options'] = dict(refresh=False, instrument=True, **lazy_options)
         for k,v in dct.items():
             if isinstance(v, ORMProperty):
                 v.name = k
@@ -47,7 +53,8 @@ class _MappedClassMeta(type):
                properties=properties,
                include_properties=include_properties,
                exclude_properties=exclude_properties,
-               extensions=extensions)
+               extensions=extensions,
+               **mapper_kwargs)
         return cls
 
     @classmethod
@@ -79,6 +86,12 @@ class _MappedClassMeta(type):
         )
         if hasattr(mm, 'before_save'):
             collection_kwargs['before_save'] = getattr(mm.before_save, '__func__', mm.before_save)
+        if hasattr(mm, 'query_cache'):
+            collection_kwargs['query_cache'] = mm.query_cache
+        if hasattr(mm, 'validate_reads'):
+            collection_kwargs['validate_reads'] = mm.validate_reads
+        if hasattr(mm, 'validate_saves'):
+            collection_kwargs['validate_saves'] = mm.validate_saves
         if not doc_bases:
             collection_cls = collection(
                 mm.name, mm.session and mm.session.impl,
@@ -115,6 +128,23 @@ class MappedClass(EncryptedMixin, metaclass=_MappedClassMeta):
             title = FieldProperty(schema.String(required=True))
             text = FieldProperty(schema.String(if_missing=''))
 
+    When ``lazy_decoding = True`` is set in ``__mongometa__``, queries retrieve
+    the documents as :class:`bson.raw_bson.RawBSONDocument` and each field is
+    only decoded and validated when it gets accessed. This saves time and
+    memory when only a few fields of big documents are used, but validation
+    errors are raised when accessing the invalid fields instead of when
+    querying them.
+
+    ``lazy_validation = True`` works the same way, but documents are decoded
+    as usual and only their validation is deferred. The fields which were
+    not accessed are all validated when the object gets flushed.
+
+    ``validate_reads = 'sample:0.01'`` only validates 1% of the documents
+    loaded by queries and trusts the others, see :class:`ming.Session`.
+
+    Flushed objects are not validated again, ``validate_saves = 'changed'``
+    validates the top-level fields which changed since they were loaded and
+    ``validate_saves = 'full'`` validates all the fields of the flushed objects.
     """
     _registry = {}
 
@@ -1,12 +1,19 @@
 
-def instrument(obj, tracker):
+def instrument(obj, tracker, parent=None, key=None):
+    """Instruments ``obj`` notifying ``tracker`` of its changes.
+
+    ``parent`` is the instrumented collection containing ``obj``
+    and ``key`` its key in there or in the document when ``obj`` is a top
+    level value. They allow to report the path of changes to trackers
+    supporting ``record(path, op, values)``.
+    """
     if isinstance(obj, (dict, list)):
         if hasattr(obj, '_ming_instrumentation'):
             return obj
         if isinstance(obj, dict):
-            return InstrumentedObj(obj, tracker)
+            return InstrumentedObj(obj, tracker, parent, key)
         else:
-            return InstrumentedList(obj, tracker)
+            return InstrumentedList(obj, tracker, parent, key)
     else:
         return obj
 
@@ -16,17 +23,58 @@ def deinstrument(obj):
     else:
         return obj
 
+def _path(icollection):
+    """Path of ``icollection`` in the document, ``None`` when unknown.
+
+    A ``None`` key is part of the path when the position in a parent list
+    is ambiguous, in such case the change must be recorded on the parent.
+    """
+    parent = icollection._parent
+    if parent is None:
+        if icollection._key is None:
+            return None
+        return (icollection._key,)
+    path = _path(parent)
+    if path is None or None in path:
+        return path
+    if isinstance(parent, InstrumentedList):
+        impl = icollection._impl
+        positions = [i for i, item in enumerate(parent._impl) if item is impl]
+        if len(positions) != 1:
+            return path + (None,)
+        return path + (positions[0],)
+    return path + (icollection._key,)
+
+def _record(icollection, op, key=None, values=None):
+    record = getattr(icollection._tracker, 'record', None)
+    if record is None:
+        return
+    path = _path(icollection)
+    if path is not None:
+        if None in path:
+            path, op, key = path[:path.index(None)], 'set', None
+        elif isinstance(key, str) and ('.' in key or key.startswith('$')):
+            # Not usable as a path, record the whole collection
+            op, key = 'set', None
+        if key is not None:
+            path += (key,)
+    if op == 'set':
+        values = None
+    record(path, op, values)
+
 class InstrumentedObj(dict):
     '''self is instrumented; _impl is not.'''
-    __slots__ = ('_impl', '_tracker')
+    __slots__ = ('_impl', '_tracker', '_parent', '_key')
     _ming_instrumentation = True
 
-    def __init__(self, impl, tracker):
+    def __init__(self, impl, tracker, parent=None, key=None):
         self._impl = impl
         self._tracker = tracker
+        self._parent = parent
+        self._key = key
         dict.update(
             self,
-            ((k,instrument(v, self._tracker)) for k,v in impl.items()))
+            ((k,instrument(v, self._tracker, self, k)) for k,v in impl.items()))
 
     def _deinstrument(self):
         return self._impl
@@ -39,10 +87,11 @@ class InstrumentedObj(dict):
 
     def __setitem__(self, k, v):
         v = deinstrument(v)
-        iv = instrument(v, self._tracker)
+        iv = instrument(v, self._tracker, self, k)
         self.pop(k, None)
         super().__setitem__(k, iv)
         self._impl[k] = v
+        _record(self, 'set', k)
         self._tracker.added_item(v)
 
     def __setattr__(self, k, v):
@@ -63,6 +112,7 @@ class InstrumentedObj(dict):
     def clear(self):
         super().clear()
         self._impl.clear()
+        _record(self, 'set')
         self._tracker.cleared()
 
     def copy(self):
@@ -74,13 +124,16 @@ class InstrumentedObj(dict):
 
     def pop(self, k, *args):
         value = self._impl.pop(k, *args)
-        if k in self: self._tracker.removed_item(value)
+        if k in self:
+            _record(self, 'set', k)
+            self._tracker.removed_item(value)
         super().pop(k, *args)
         return value
 
     def popitem(self):
         k,v = self._impl.popitem()
         super().popitem()
+        _record(self, 'set', k)
         self._tracker.removed_item(v)
         return v
 
@@ -116,14 +169,16 @@ class InstrumentedObj(dict):
 
 class InstrumentedList(list):
     '''self is instrumented; _impl is not.'''
-    __slots__ = ('_impl', '_tracker')
+    __slots__ = ('_impl', '_tracker', '_parent', '_key')
     _ming_instrumentation = True
 
-    def __init__(self, impl, tracker):
+    def __init__(self, impl, tracker, parent=None, key=None):
         self._impl = impl
         self._tracker = tracker
+        self._parent = parent
+        self._key = key
         super().extend(
-            instrument(item, self._tracker)
+            instrument(item, self._tracker, self)
             for item in self._impl)
 
     def __repr__(self):
@@ -137,17 +192,20 @@ class InstrumentedList(list):
 
     def __setitem__(self, key, v):
         v = deinstrument(v)
-        iv = instrument(v, self._tracker)
-        super().__setitem__(key, iv)
 
         if isinstance(key, slice):
+            v = list(map(deinstrument, v))
+            super().__setitem__(key, [instrument(item, self._tracker, self) for item in v])
             self._tracker.removed_items(self._impl[key.start:key.stop])
             self._impl[key.start:key.stop:key.step] = v
+            _record(self, 'set')
             self._tracker.added_items(v)
         else:
+            super().__setitem__(key, instrument(v, self._tracker, self))
             i = key
             self._tracker.removed_item(self._impl[i])
             self._impl[i] = v
+            _record(self, 'set', i if i >= 0 else i + len(self._impl))
             self._tracker.added_item(self._impl[i])
 
     def __delitem__(self, key):
@@ -160,6 +218,7 @@ class InstrumentedList(list):
             i = key
             self._tracker.removed_item(self._impl[i])
             del self._impl[i]
+        _record(self, 'set')
 
     def __add__(self, y):
         return instrument(self._impl + y, self._tracker)
@@ -192,36 +251,48 @@ class InstrumentedList(list):
 
     def append(self, v):
         v = deinstrument(v)
-        iv =instrument(v, self._tracker)
+        iv =instrument(v, self._tracker, self)
         self._impl.append(v)
         super().append(iv)
+        _record(self, 'push', values=[v])
         self._tracker.added_item(v)
 
     def extend(self, iterable):
         new_items = list(map(deinstrument, iterable))
         self._impl.extend(new_items)
         super().extend(
-            instrument(item, self._tracker)
+            instrument(item, self._tracker, self)
             for item in new_items)
+        _record(self, 'push', values=new_items)
         self._tracker.added_items(new_items)
 
     def insert(self, index, v):
         v = deinstrument(v)
-        iv = instrument(v, self._tracker)
+        iv = instrument(v, self._tracker, self)
         super().insert(index, iv)
         self._impl.insert(index, v)
+        _record(self, 'set')
         self._tracker.added_item(v)
 
     def pop(self, pos=-1):
         v = self._impl.pop(pos)
         super().pop(pos)
+        _record(self, 'set')
         self._tracker.removed_item(v)
         return v
 
     def remove(self, v):
         v = deinstrument(v)
         i = self._impl.index(v)
-        del self[i]
+        removed = self._impl[i]
+        super().__delitem__(i)
+        del self._impl[i]
+        if isinstance(removed, (dict, list)) or removed in self._impl:
+            # $pullAll would remove all the matching items, not just the first one
+            _record(self, 'set')
+        else:
+            _record(self, 'pull', values=[removed])
+        self._tracker.removed_item(removed)
 
     def index(self, v, *args, **kwargs):
         v = deinstrument(v)
@@ -1,36 +1,55 @@
+from weakref import WeakValueDictionary, finalize
+
 from ming.utils import indent
 
 class IdentityMap:
+    """Maps ``(class, _id)`` to the object loaded for that document.
+
+    When ``weak`` is ``True`` objects are only weakly referenced,
+    so they are removed from the map once they get garbage collected.
+    """
 
-    def __init__(self):
-        self._objects = {}
+    def __init__(self, weak=False):
+        self.weak = weak
+        self._objects = WeakValueDictionary() if weak else {}
+        self._keys = {}  # dict[id(obj)] = key of obj in _objects
 
     def get(self, cls, id):
         return self._objects.get((cls, id), None)
 
     def save(self, value):
         vid = getattr(value, '_id', ())
-        if vid != ():
-            self._objects[value.__class__, vid] = value
+        key = (value.__class__, vid) if vid != () else None
+        old_key = self._keys.get(id(value))
+        if old_key is not None and old_key != key and self._objects.get(old_key) is value:
+            # The _id of the object changed since it was saved
+            del self._objects[old_key]
+        if key is None:
+            self._keys.pop(id(value), None)
+        else:
+            self._objects[key] = value
+            if self.weak and old_key is None:
+                # Forget the key once the object gets garbage collected
+                finalize(value, self._keys.pop, id(value), None).atexit = False
+            self._keys[id(value)] = key
 
     def clear(self):
-        self._objects = {}
+        self._objects = WeakValueDictionary() if self.weak else {}
+        self._keys = {}
 
     def expunge(self, obj):
-        vid = getattr(obj, '_id', ())
-        if vid == (): return
-        try:
-            del self._objects[(obj.__class__, vid)]
-        except KeyError:
-            pass
+        key = self._keys.pop(id(obj), None)
+        if key is None: return
+        if self._objects.get(key) is obj:
+            del self._objects[key]
 
     def __iter__(self):
-        for (cls,vid), value in self._objects.items():
+        for (cls,vid), value in list(self._objects.items()):
             yield cls, vid, value
 
     def __repr__(self):
         l = [ '<imap (%d)>' % len(self._objects) ]
-        for k,v in self._objects.items():
+        for k,v in list(self._objects.items()):
             l.append(indent('  %s : %s => %r'
                             % (k[0].__name__, k[1], v),
                             4))
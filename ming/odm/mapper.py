@@ -4,11 +4,14 @@ import typing
 import warnings
 from copy import copy
 
+from pymongo import UpdateOne
+
+from ming import schema as S
 from ming.base import Object, NoDefault
 from ming.session import Session
-from ming.utils import wordwrap
+from ming.utils import wordwrap, LazyProperty
 
-from .base import ObjectState, state, _with_hooks
+from .base import ObjectState, state, _with_hooks, _same_value
 from .property import FieldProperty
 
 if typing.TYPE_CHECKING:
@@ -64,6 +67,7 @@ class Mapper:
         extensions = kwargs.pop('extensions', [])
         self.extensions = [e(self) for e in extensions]
         self.options = Object(kwargs.pop('options', dict(refresh=False, instrument=True)))
+        self._deferred_fields = kwargs.pop('deferred_fields', ())
         if kwargs:
             raise TypeError('Unknown kwd args: %r' % kwargs)
         self._instrument_class(properties, include_properties, exclude_properties)
@@ -84,20 +88,34 @@ class Mapper:
 
     @_with_hooks('insert')
     def insert(self, obj: MappedClass, state: ObjectState, session: ODMSession, **kwargs):
+        self._validate_changes(state, None)
         doc = self.collection(state.document, skip_from_bson=True)
         ret = session.impl.insert(doc, validate=False)
-        state.status = state.clean
+        state.saved()
         return ret
 
     @_with_hooks('update')
     def update(self, obj: MappedClass, state: ObjectState, session: ODMSession, **kwargs):
-        fields = state.options.get('fields', None)
-        if fields is None:
-            fields = ()
+        """Persists the changes of a dirty object.
 
+        When the changed fields are known only those are sent through a
+        ``$set``/``$unset`` update, otherwise the whole document is replaced.
+        """
+        update = self._partial_update(state)
+        if self._validate_changes(state, update):
+            update = self._partial_update(state)
+        if update is not None:
+            ret = None
+            if update:
+                ret = session.impl.update_partial(self.collection,
+                                                  {'_id': state.document['_id']}, update)
+            state.saved()
+            return ret
+
+        fields = self._replaced_fields(state)
         doc = self.collection(state.document, skip_from_bson=True)
         ret = session.impl.save(doc, *fields, validate=False)
-        state.status = state.clean
+        state.saved()
         return ret
 
     @_with_hooks('delete')
@@ -105,6 +123,96 @@ class Mapper:
         doc = self.collection(state.document, skip_from_bson=True)
         return session.impl.delete(doc)
 
+    def insert_op(self, obj: MappedClass, state: ObjectState, session: ODMSession):
+        """Builds the bulk write request performed by :meth:`insert`"""
+        self._validate_changes(state, None)
+        doc = self.collection(state.document, skip_from_bson=True)
+        op = session.impl.insert_op(doc, validate=False)
+        if '_id' not in state.document:
+            state.document['_id'] = doc['_id']
+        return op
+
+    def update_op(self, obj: MappedClass, state: ObjectState, session: ODMSession):
+        """Builds the bulk write request performed by :meth:`update`
+
+        Returns ``None`` when there is nothing to write.
+        """
+        update = self._partial_update(state)
+        if self._validate_changes(state, update):
+            update = self._partial_update(state)
+        if update is not None:
+            if not update:
+                return None
+            return UpdateOne({'_id': state.document['_id']}, update)
+
+        fields = self._replaced_fields(state)
+        doc = self.collection(state.document, skip_from_bson=True)
+        return session.impl.save_op(doc, *fields, validate=False)
+
+    def delete_op(self, obj: MappedClass, state: ObjectState, session: ODMSession):
+        """Builds the bulk write request performed by :meth:`delete`"""
+        doc = self.collection(state.document, skip_from_bson=True)
+        return session.impl.delete_op(doc)
+
+    def _replaced_fields(self, state: ObjectState):
+        """Fields to save when not updating only the changes, all of them when empty"""
+        fields = state.options.get('fields', None)
+        if fields is not None:
+            return fields
+        if state.deferred:
+            # The deferred fields which were never loaded must be left untouched
+            return [k for k in state.document if k != '_id' and k not in state.deferred]
+        return ()
+
+    def _validate_changes(self, state: ObjectState, update):
+        """Checks the top-level fields changed since the object was loaded.
+
+        Only done with ``validate_saves = 'changed'``, as assigned values are
+        already validated by the :class:`.FieldProperty`, this catches the invalid
+        values changed in place, like items appended to lists. New objects were
+        validated when created. With ``validate_saves = 'full'`` all the fields
+        of new and dirty objects are validated instead.
+
+        The validated values replace the ones in the document, so that what
+        gets saved is what was validated. Returns whenever they were replaced.
+        """
+        validate_saves = self.collection.m.validate_saves
+        schema = self.collection.m.schema
+        if not validate_saves or not schema:
+            return False
+        document = state.document
+        full = validate_saves == 'full'
+        if not isinstance(schema, S.Object):
+            if full:
+                state.validate(schema)
+            return full
+        if full:
+            names = [k for k in schema.fields if k not in state.deferred]
+        elif state.status == state.new:
+            return False
+        elif update is not None:
+            names = {key.split('.', 1)[0] for fields in update.values() for key in fields}
+        elif state.original_document is not None:
+            original = state.original_document
+            names = [k for k, v in document.items()
+                     if k not in original or not _same_value(original[k], v)]
+            names.extend(k for k in original if k not in document)
+        else:
+            names = list(document)
+        state.update(schema.validate_partial(document, [k for k in names if k != '_id']))
+        return True
+
+    def _partial_update(self, state: ObjectState):
+        if not state.options.get('instrument', True):
+            # Changes to nested values are not tracked without instrumentation
+            return None
+        if state.options.get('fields', None) is not None:
+            return None
+        if self.collection.m.before_save:
+            # The hook might change nested values we are unable to track
+            return None
+        return state.partial_update()
+
     @_with_hooks('remove')
     def remove(self, session: ODMSession, *args, **kwargs):
         return session.impl.remove(self.collection, *args, **kwargs)
@@ -118,6 +226,22 @@ class Mapper:
         mapper = self.by_collection(type(doc))
         return mapper._from_doc(doc, Object(self.options, **options), validate=False)
 
+    def create_many(self, docs, options, remake=True):
+        """Same as :meth:`create` for a list of documents, which share the same options"""
+        options = Object(self.options, **options)
+        lazy = self.lazy_decoding_supported and (
+            options.get('lazy_decoding', False) or options.get('lazy_validation', False))
+        result = []
+        for doc in docs:
+            if lazy and not isinstance(doc, Object):
+                result.append(self._from_raw(doc, options))
+                continue
+            if remake is True or type(doc) is not self.collection:
+                doc = self.collection.make(doc)
+            mapper = self.by_collection(type(doc))
+            result.append(mapper._from_doc(doc, options, validate=False))
+        return result
+
     def base_mappers(self):
         for base in self.mapped_class.__bases__:
             if base in self._mapper_by_class:
@@ -187,6 +311,34 @@ class Mapper:
     def update_partial(self, session: ODMSession, *args, **kwargs):
         return session.impl.update_partial(self.collection, *args, **kwargs)
 
+    @LazyProperty
+    def deferred_fields(self):
+        """Names of the fields excluded by default from the results of queries"""
+        result = {p.name for p in self.properties if getattr(p, 'deferred', False)}
+        result.update(self._deferred_fields)
+        return frozenset(result)
+
+    @property
+    def lazy_decoding_supported(self):
+        """Whenever documents can be decoded and validated field by field, see :meth:`_from_raw`"""
+        return isinstance(self.collection.m.schema, S.Document)
+
+    def _from_raw(self, raw, options):
+        """Creates an object for ``raw``, a document not yet decoded nor validated.
+
+        Its fields are decoded and validated when first accessed, see
+        :meth:`.ObjectState.set_lazy`. Fields which are not part of
+        the schema are stripped like when the document is validated.
+        """
+        collection = self.collection.m.schema.get_polymorphic_cls(raw)
+        mapper = self.by_collection(collection)
+        obj = mapper.mapped_class.__new__(mapper.mapped_class)
+        obj.__ming__ = _ORMDecoration(mapper, obj, options)
+        st = state(obj)
+        st.set_lazy(raw, collection.m.schema, options.get('deferred', ()))
+        st.status = st.new
+        return obj
+
     def _from_doc(self, doc, options, validate=True):
         obj = self.mapped_class.__new__(self.mapped_class)
         obj.__ming__ = _ORMDecoration(self, obj, options)
@@ -201,8 +353,9 @@ class Mapper:
         if validate is False:
             # .create calls this after it already created the document with the
             # right type and so it got already validated. We re-validate it
-            # only if explicitly requested.
-            st.document = copy(doc)
+            # only if explicitly requested. Read only objects are never
+            # changed, so they can share the document.
+            st.document = doc if options.get('readonly', False) else copy(doc)
         elif self.collection.m.schema:
             st.document = self.collection.m.schema.validate(doc)
         else:
@@ -213,6 +366,7 @@ class Mapper:
                 "mapped from the database document onto the object.",
                 UserWarning, stacklevel=2)
             st.document = copy(doc)
+        st.deferred.update(options.get('deferred', ()))
         st.status = st.new
         return obj
 
@@ -311,7 +465,7 @@ class _ORMDecoration:
     def __init__(self, mapper, instance, options):
         self.mapper = mapper
         self.instance = instance
-        self.state = ObjectState(options, None)
+        self.state = ObjectState(options, None, instance)
         self.state.document = Object()
         self.state.original_document = Object()
 
@@ -327,7 +481,7 @@ class _QueryDescriptor:
 class _ClassQuery:
     """Provides ``.query`` attribute for :class:`MappedClass`."""
     _proxy_methods = (
-        'find', 'remove', 'update', 'distinct',
+        'find', 'get_many', 'remove', 'update', 'distinct',
         'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete', 
         'aggregate',)
 
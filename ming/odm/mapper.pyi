@@ -1,7 +1,8 @@
-from typing import Generator, List, type_check_only, TypeVar, Generic, Optional, Union, Any, overload, Type
+from typing import Generator, List, Iterable, type_check_only, TypeVar, Generic, Optional, Union, Any, overload, Type
 
 from bson import ObjectId
 from pymongo.command_cursor import CommandCursor
+import pymongo
 import pymongo.results
 
 
@@ -36,10 +37,18 @@ class Mapper(Generic[TMappedClass]):
 
     def delete(self, obj: MappedClass, state: ObjectState, session: ODMSession, **kwargs) -> pymongo.results.DeleteResult: ...
 
+    def insert_op(self, obj: MappedClass, state: ObjectState, session: ODMSession) -> pymongo.InsertOne: ...
+
+    def update_op(self, obj: MappedClass, state: ObjectState, session: ODMSession) -> Optional[Union[pymongo.InsertOne, pymongo.ReplaceOne, pymongo.UpdateOne]]: ...
+
+    def delete_op(self, obj: MappedClass, state: ObjectState, session: ODMSession) -> pymongo.DeleteOne: ...
+
     def remove(self, session: ODMSession, *args, **kwargs) -> pymongo.results.DeleteResult: ...
 
     def create(self, doc, options, remake=True) -> TMappedClass: ...
 
+    def create_many(self, docs, options, remake=True) -> List[TMappedClass]: ...
+
     def base_mappers(self) -> Generator[Mapper]: ...
 
     def all_properties(self) -> Generator[FieldProperty]: ...
@@ -74,6 +83,7 @@ MongoFilter = dict
 class _ClassQuery(Generic[TMappedClass]):
     # proxies most of these from Session
     def get(self, _id: Union[ObjectId|Any] = None, **kwargs) -> Optional[TMappedClass]: ...
+    def get_many(self, ids: Iterable[ObjectId|Any], chunk_size: int = 1000) -> List[Optional[TMappedClass]]: ...
     def find(self, filter: MongoFilter = None, *args, **kwargs) -> Cursor[TMappedClass]: ...
     def find_by(self, filter: MongoFilter = None, *args, **kwargs) -> Cursor[TMappedClass]: ...
     def remove(self, spec_or_id: Union[MongoFilter, ObjectId] = None, **kwargs) -> pymongo.results.DeleteResult: ...
@@ -1,15 +1,18 @@
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import chain, islice
 import warnings
 
+import bson
 from pymongo.collection import ReturnDocument
 from pymongo.database import Database
 
 from ming.session import Session
 from ming.utils import ThreadLocalProxy, ContextualProxy, indent
-from ming.base import Object
+from ming.base import Object, Missing
 from ming.exc import MingException
-from .base import state, ObjectState, session, _with_hooks, _call_hook
+from .base import state, ObjectState, session, _with_hooks, _call_hook, _decoded
 from .mapper import mapper
+from .property import RelationProperty
 from .unit_of_work import UnitOfWork
 from .identity_map import IdentityMap
 from ..datastore import DataStore
@@ -22,19 +25,62 @@ class ODMSession:
     and of the current connection to the database. All the operation
     on MongoDB should happen through the ODMSession to avoid inconsistent
     state between objects updated through the session and outside the session.
+
+    When ``bulk_flush`` is enabled, :meth:`flush` sends all the pending
+    inserts, updates and deletes of each collection with a single
+    ``bulk_write`` instead of one request per object. ``bulk_ordered``
+    tells whenever those bulk writes should be ordered or not.
+
+    When ``max_tracked_objects`` is set, the least recently used clean
+    objects are expunged from the session as soon as it tracks more than
+    ``max_tracked_objects`` objects, so that iterating over big queries
+    doesn't grow memory without bound. New, dirty and deleted objects are
+    never expunged, unless ``flush_on_evict`` is enabled in which case
+    the session is flushed when there aren't enough clean objects to expunge.
+    The objects just returned by a query are never expunged, so a query
+    can temporarily make the session track more objects. Expunged objects
+    are added back to the session as soon as they are changed, so that
+    their changes are flushed.
+
+    When ``weak_identity_map`` is enabled, the IdentityMap and UnitOfWork
+    only keep weak references to clean objects, so they are released as
+    soon as the application doesn't use them anymore. New, dirty and deleted
+    objects are kept until they get flushed.
+
+    When ``memoize_queries`` is enabled, the session remembers the ``_id``
+    of the objects returned by each query that was iterated until its end,
+    and a following identical query on the same class returns those objects
+    from the IdentityMap without querying the database again. The memo of
+    a collection is discarded whenever the session flushes, updates or
+    removes documents of that collection, changes performed outside the
+    session are not detected. Queries with ``refresh`` or ``readonly``
+    are never memoized.
+
+    ``validate_reads`` is passed to the :class:`ming.Session` created when
+    no ``doc_session`` is provided, ``'sample:0.01'`` only fully validates
+    1% of the documents loaded by queries.
     """
     _registry = {}
 
     def __init__(self, doc_session: Session = None, bind: DataStore = None, extensions=None,
-                 autoflush=False):
+                 autoflush=False, bulk_flush=False, bulk_ordered=True,
+                 max_tracked_objects=None, flush_on_evict=False, weak_identity_map=False,
+                 memoize_queries=False, validate_reads=None):
         if doc_session is None:
-            doc_session = Session(bind)
+            doc_session = Session(bind, validate_reads=validate_reads)
         if extensions is None: extensions = []
         self.impl = doc_session
-        self.uow = UnitOfWork(self)
-        self.imap = IdentityMap()
+        self.uow = UnitOfWork(self, weak=weak_identity_map)
+        self.imap = IdentityMap(weak=weak_identity_map)
         self.extensions = [ e(self) for e in extensions ]
         self.autoflush = autoflush
+        self.bulk_flush = bulk_flush
+        self.bulk_ordered = bulk_ordered
+        self.max_tracked_objects = max_tracked_objects
+        self.flush_on_evict = flush_on_evict
+        self.memoize_queries = memoize_queries
+        self._query_memo = {}  # collection name -> {query key: [(class, _id)]}
+        self._query_generations = defaultdict(int)  # collection name -> writes counter
 
     def register_extension(self, extension):
         self.extensions.append(extension(self))
@@ -79,12 +125,46 @@ class ODMSession:
         self.uow.save(obj)
         self.imap.save(obj)
         state(obj).session = self
+        if self.max_tracked_objects is not None:
+            self.uow.touch(obj)
+            self._evict()
+
+    def _save_loaded(self, objs, returned=None):
+        """Adds ``objs``, clean objects just loaded from the database, to the Session
+
+        ``returned`` are all the objects returned by the query, which must stay
+        tracked while they are returned, ``objs`` when not provided.
+        """
+        self.uow.save_clean(objs)
+        for obj in objs:
+            self.imap.save(obj)
+            state(obj).session = self
+        if self.max_tracked_objects is not None:
+            self._evict(objs if returned is None else returned)
+
+    def _evict(self, keep=()):
+        """Expunges the least recently used clean objects over ``max_tracked_objects``
+
+        The objects in ``keep`` are never expunged.
+        """
+        excess = len(self.uow) - self.max_tracked_objects
+        if excess <= 0:
+            return
+        evicted = self.uow.least_recently_used(excess, keep)
+        if len(evicted) < excess and self.flush_on_evict:
+            self.flush()
+            evicted = self.uow.least_recently_used(excess, keep)
+        for obj in evicted:
+            self.expunge(obj)
+            # Tracked again when changed, see ObjectState.status
+            state(obj).evicted_from = self
 
     def expunge(self, obj):
         """Remove an object from the Session (and its UnitOfWork and IdentityMap)"""
         self.uow.expunge(obj)
         self.imap.expunge(obj)
-        state(obj).session = None
+        st = state(obj)
+        st.session = st.evicted_from = None
 
     def refresh(self, obj):
         """Refreshes the object in the session by querying it back and updating its state"""
@@ -101,6 +181,10 @@ class ODMSession:
         state.
         """
         if self.impl.db is None: return
+        if self.memoize_queries:
+            pending = chain(self.uow.new, self.uow.dirty, self.uow.deleted) if obj is None else [obj]
+            for cls in {o.__class__ for o in pending if state(o).status != ObjectState.clean}:
+                self._forget_queries(cls)
         if obj is None:
             self.uow.flush()
         else:
@@ -124,6 +208,78 @@ class ODMSession:
     def delete_now(self, obj, st, **kwargs):
         mapper(obj).delete(obj, st, self, **kwargs)
 
+    def load_relations(self, objs, *names):
+        """Loads the ``names`` relations of all ``objs`` with one query per relation.
+
+        This avoids performing one query for each object when the relations
+        are accessed. The loaded relations are cached on the objects like
+        when they are accessed, relations already loaded are left untouched.
+        """
+        for name in names:
+            by_property = {}
+            for obj in objs:
+                prop = mapper(obj).property_index.get(name)
+                if not isinstance(prop, RelationProperty):
+                    raise AttributeError('{} has no relation {!r}'.format(
+                        obj.__class__.__name__, name))
+                by_property.setdefault(prop, []).append(obj)
+            for prop, prop_objs in by_property.items():
+                prop.load_many(prop_objs)
+
+    def _query_generation(self, cls):
+        return self._query_generations[mapper(cls).collection.m.collection_name]
+
+    def _memoized_query(self, cls, key):
+        """Returns the objects of the query memoized as ``key`` or ``None``"""
+        memo = self._query_memo.get(mapper(cls).collection.m.collection_name)
+        if not memo or key not in memo:
+            return None
+        objs = [self.imap.get(obj_cls, idvalue) for obj_cls, idvalue in memo[key]]
+        if None in objs:
+            # Some objects are not tracked anymore, the query must be performed again
+            del memo[key]
+            return None
+        if self.max_tracked_objects is not None:
+            for obj in objs:
+                self.uow.touch(obj)
+        return objs
+
+    def _memoize_query(self, cls, key, generation, objs):
+        """Remembers ``objs`` as the result of ``key`` unless written since ``generation``"""
+        collection_name = mapper(cls).collection.m.collection_name
+        if self._query_generations[collection_name] != generation:
+            return
+        self._query_memo.setdefault(collection_name, {})[key] = [
+            (obj.__class__, obj._id) for obj in objs]
+
+    def _forget_queries(self, cls):
+        """Discards the memoized queries on the collection of ``cls``"""
+        collection_name = mapper(cls).collection.m.collection_name
+        self._query_generations[collection_name] += 1
+        self._query_memo.pop(collection_name, None)
+
+    def load_fields(self, objs, *names):
+        """Loads the deferred ``names`` fields of all ``objs`` with one query.
+
+        Fields which were already loaded are left untouched.
+        """
+        by_collection = {}
+        for obj in objs:
+            if state(obj).deferred.intersection(names):
+                by_collection.setdefault(mapper(obj).collection, []).append(obj)
+        for collection, coll_objs in by_collection.items():
+            ids = [obj._id for obj in coll_objs]
+            docs = {doc['_id']: doc for doc in self.impl.find(
+                collection, {'_id': {'$in': ids}}, projection=dict.fromkeys(names, 1), raw=True)}
+            for obj in coll_objs:
+                st = state(obj)
+                doc = docs.get(obj._id, {})
+                fields = mapper(obj).collection.m.schema.fields
+                for name in st.deferred.intersection(names):
+                    value = fields[name].validate(_decoded(doc.get(name, Missing)),
+                                                  allow_extra=True, strip_extra=True)
+                    st.set_loaded(name, value)
+
     def clear(self):
         """Expunge all the objects from the session."""
         # Orphan all objects
@@ -131,6 +287,7 @@ class ODMSession:
             state(obj).session = None
         self.uow.clear()
         self.imap.clear()
+        self._query_memo.clear()
 
     def close(self):
         """Clear the session."""
@@ -149,8 +306,35 @@ class ODMSession:
         result = self.imap.get(cls, idvalue)
         if result is None:
             result = self.find(cls, dict(_id=idvalue)).first()
+        elif self.max_tracked_objects is not None:
+            self.uow.touch(result)
         return result
 
+    def get_many(self, cls, ids, chunk_size=1000):
+        """Retrieves ``cls`` objects for each of the ``_id`` values in ``ids``.
+
+        The objects already available in the IdentityMap are reused, the
+        others are retrieved with one ``$in`` query every ``chunk_size`` ids.
+        Objects are returned in the same order as ``ids``, with ``None``
+        in place of the ones that were not found.
+
+        This is the same as calling ``cls.query.get_many(ids)``.
+        """
+        ids = list(ids)
+        found, missing = {}, []
+        for idvalue in dict.fromkeys(ids):
+            obj = self.imap.get(cls, idvalue)
+            if obj is None:
+                missing.append(idvalue)
+            else:
+                if self.max_tracked_objects is not None:
+                    self.uow.touch(obj)
+                found[idvalue] = obj
+        for i in range(0, len(missing), chunk_size):
+            for obj in self.find(cls, {'_id': {'$in': missing[i:i + chunk_size]}}):
+                found[obj._id] = obj
+        return [found.get(idvalue) for idvalue in ids]
+
     def find(self, cls, *args, **kwargs):
         """Retrieves ``cls`` by performing a mongodb query.
 
@@ -170,6 +354,15 @@ class ODMSession:
               fields not specified in the model definition.
             * ``strip_extra`` Whenever extra fields should be stripped if present.
             * ``validate`` Disable validation or not.
+            * ``readonly`` Whenever the objects should be read only. Read only
+              objects are not tracked by the session nor instrumented, so they
+              are faster to retrieve, but their fields cannot be assigned nor
+              deleted. As they are not instrumented, changes made in place to
+              their nested lists and dicts are not detected and never saved.
+              Each query returns new read only objects, even for the same document.
+
+        Unless a ``projection`` is provided, the deferred fields of ``cls``
+        are excluded from the results and retrieved when first accessed.
 
         It returns an :class:`.ODMCursor` with the results.
         """
@@ -178,15 +371,33 @@ class ODMSession:
 
         refresh = kwargs.pop('refresh', False)
         decorate = kwargs.pop('decorate', None)
+        readonly = kwargs.pop('readonly', False)
         m = mapper(cls)
 
         projection = kwargs.pop('fields', kwargs.pop('projection', None))
+        if projection is None and len(args) > 1:
+            # Projection passed positionally, after the filter
+            projection, args = args[1], args[:1] + args[2:]
+        deferred = ()
         if projection is not None:
             kwargs['projection'] = projection
-
+        elif m.deferred_fields:
+            deferred = tuple(sorted(m.deferred_fields))
+            kwargs['projection'] = dict.fromkeys(deferred, 0)
+            kwargs['deferred'] = deferred
+            if not args:
+                args = ({},)
+
+        if m.lazy_decoding_supported:
+            if m.options.get('lazy_decoding', False):
+                kwargs['raw_bson'] = True
+            elif m.options.get('lazy_validation', False):
+                kwargs['raw'] = True
         ming_cursor = self.impl.find(m.collection, *args, **kwargs)
         odm_cursor = ODMCursor(self, cls, ming_cursor, refresh=refresh, decorate=decorate,
-                               fields=kwargs.get('projection'))
+                               fields=projection, readonly=readonly, deferred=deferred)
+        if self.memoize_queries:
+            odm_cursor._memo_spec = [list(args), kwargs]
         _call_hook(self, 'cursor_created', odm_cursor, 'find', cls, *args, **kwargs)
         return odm_cursor
 
@@ -204,6 +415,8 @@ class ODMSession:
         decorate = kwargs.pop('decorate', None)
         if self.autoflush:
             self.flush()
+        if self.memoize_queries:
+            self._forget_queries(cls)
         m = mapper(cls)
         fn = getattr(self.impl, operation)
         obj = fn(m.collection, *args, **kwargs)
@@ -232,6 +445,8 @@ class ODMSession:
 
         Arguments are the same as :meth:`pymongo.collection.Collection.remove`.
         """
+        if self.memoize_queries:
+            self._forget_queries(cls)
         m = mapper(cls)
         return m.remove(self, *args, **kwargs)
 
@@ -245,6 +460,8 @@ class ODMSession:
 
         Arguments are the same as :meth:`pymongo.collection.Collection.update`.
         """
+        if self.memoize_queries:
+            self._forget_queries(cls)
         m = mapper(cls)
         return m.update_partial(self, spec, fields, **kwargs)
 
@@ -344,10 +561,10 @@ class SessionExtension:
         """New cursor with the results of a query got created"""
         pass
     def before_cursor_next(self, cursor):
-        """Cursor is going to advance to next result"""
+        """Cursor is going to advance to next result, or batch of results"""
         pass
     def after_cursor_next(self, cursor):
-        """Cursor has advanced to next result"""
+        """Cursor has advanced to next result, or batch of results"""
         pass
 
 class ThreadLocalODMSession(ThreadLocalProxy):
@@ -464,7 +681,8 @@ class ODMCursor:
     def __bool__(self):
         raise MingException('Cannot evaluate ODMCursor to a boolean')
 
-    def __init__(self, session, cls, ming_cursor, refresh=False, decorate=None, fields=None):
+    def __init__(self, session, cls, ming_cursor, refresh=False, decorate=None, fields=None,
+                 readonly=False, deferred=()):
         self.session = session
         self.cls = cls
         self.mapper = mapper(cls)
@@ -473,7 +691,12 @@ class ODMCursor:
             refresh=refresh,
             decorate=decorate,
             fields=fields,
-            instrument=True)
+            instrument=not readonly,
+            readonly=readonly,
+            deferred=deferred)
+        self._eager_buffer = deque()
+        self._memo_spec = None  # Query performed, when the session memoizes queries
+        self._reset_memo()
 
     def __iter__(self):
         return self
@@ -490,28 +713,152 @@ class ODMCursor:
         return self.ming_cursor.distinct(*args, **kwargs)
 
     def _next_impl(self):
-        doc = next(self.ming_cursor)
-        obj = self.session.imap.get(self.cls, doc['_id'])
-        if obj is None:
-            obj = self.mapper.create(doc, self._options, remake=False)
-            state(obj).status = ObjectState.clean
-            self.session.save(obj)
-        elif self._options.refresh:
-            # Refresh object
-            state(obj).update(doc)
-            state(obj).status = ObjectState.clean
+        if self._memo_spec is not None and self._memo_key is None:
+            self._start_memo()
+        if self._replay is not None:
+            obj = next(self._replay)
         else:
-            # Never refresh objects from the DB unless explicitly requested
-            pass
-        other_session = session(obj)
-        if other_session is not None and other_session != self:
-            other_session.expunge(obj)
-            self.session.save(obj)
+            try:
+                if self._options.get('eager') or self._options.get('undefer'):
+                    if not self._eager_buffer:
+                        self._load_eager_batch()
+                    obj = self._eager_buffer.popleft()
+                else:
+                    obj = self._load(next(self.ming_cursor))
+            except StopIteration:
+                self._finish_memo()
+                raise
         if self._options.decorate is not None:
             return self._options.decorate(obj)
         else:
             return obj
 
+    def _next_batch_impl(self, size):
+        if self._memo_spec is not None and self._memo_key is None:
+            self._start_memo()
+        if self._replay is not None:
+            objs = list(islice(self._replay, size))
+        elif self._eager_buffer:
+            objs = [self._eager_buffer.popleft()
+                    for i in range(min(size, len(self._eager_buffer)))]
+        else:
+            objs = self._load_many(self._next_docs(size))
+            if not objs:
+                self._finish_memo()
+            else:
+                self._prefetch(objs)
+        if self._options.decorate is not None:
+            return [self._options.decorate(obj) for obj in objs]
+        else:
+            return objs
+
+    def _next_docs(self, size):
+        """Retrieves up to ``size`` documents from the underlying cursor"""
+        next_batch = getattr(self.ming_cursor, 'next_batch', None)
+        if next_batch is not None:
+            return next_batch(size)
+        return list(islice(self.ming_cursor, size))
+
+    def _reset_memo(self):
+        self._memo_key = None
+        self._memo_generation = None
+        self._replay = None
+        self._recorded = None
+
+    def _start_memo(self):
+        """Replays the objects memoized for the query or starts recording them"""
+        self._memo_key = ()
+        if self._options.refresh or self._options.readonly:
+            return
+        try:
+            self._memo_key = (self.cls, bson.encode({'query': self._memo_spec}))
+        except (bson.errors.InvalidDocument, TypeError):
+            return
+        objs = self.session._memoized_query(self.cls, self._memo_key)
+        if objs is None:
+            self._memo_generation = self.session._query_generation(self.cls)
+            self._recorded = []
+            return
+        self._prefetch(objs)
+        self._replay = iter(objs)
+
+    def _finish_memo(self):
+        """Memoizes the objects recorded once the query got exhausted"""
+        if self._recorded is not None:
+            self.session._memoize_query(self.cls, self._memo_key,
+                                        self._memo_generation, self._recorded)
+            self._recorded = None
+
+    def _chained_memo_spec(self, *spec):
+        if self._memo_spec is None or self._memo_key is not None:
+            # Not memoized or already iterated
+            return None
+        return self._memo_spec + [list(spec)]
+
+    def _load_eager_batch(self):
+        """Loads the next batch of objects along with their ``eager`` relations and ``undefer`` fields"""
+        batch_size = self._options.get('eager_batch_size', 100)
+        batch = self._load_many(self._next_docs(batch_size))
+        if not batch:
+            raise StopIteration
+        self._prefetch(batch)
+        self._eager_buffer.extend(batch)
+
+    def _prefetch(self, objs):
+        if self._options.get('undefer'):
+            self.session.load_fields(objs, *self._options.undefer)
+        if self._options.get('eager'):
+            self.session.load_relations(objs, *self._options.eager)
+
+    def _load(self, doc):
+        return self._load_many([doc])[0]
+
+    def _load_many(self, docs):
+        """Creates the objects for ``docs`` or reuses the ones in the IdentityMap"""
+        if self._options.readonly:
+            # Not tracked by the session, nor looked up in the IdentityMap
+            objs = self.mapper.create_many(docs, self._options, remake=False)
+            for obj in objs:
+                state(obj).status = ObjectState.clean
+            return objs
+        imap_get = self.session.imap.get
+        objs = [imap_get(self.cls, doc['_id']) for doc in docs]
+        for doc, obj in zip(docs, objs):
+            if obj is None:
+                continue
+            if self._options.refresh:
+                # Refresh object
+                st = state(obj)
+                deferred = self._options.get('deferred', ())
+                if isinstance(doc, Object):
+                    st.update(doc)
+                    st.original_document = doc
+                    st.deferred.update(deferred)
+                else:
+                    st.set_lazy(doc, mapper(obj).collection.m.schema, deferred)
+                st.changes = {}
+                st.status = ObjectState.clean
+            else:
+                # Never refresh objects from the DB unless explicitly requested
+                pass
+            other_session = session(obj)
+            if other_session is not None and other_session is not self.session:
+                other_session.expunge(obj)
+                self.session.save(obj)
+            elif self.session.max_tracked_objects is not None:
+                self.session.uow.touch(obj)
+        missing = [doc for doc, obj in zip(docs, objs) if obj is None]
+        if missing:
+            created = self.mapper.create_many(missing, self._options, remake=False)
+            for obj in created:
+                state(obj).status = ObjectState.clean
+            created_iter = iter(created)
+            objs = [next(created_iter) if obj is None else obj for obj in objs]
+            self.session._save_loaded(created, objs)
+        if self._recorded is not None:
+            self._recorded.extend(objs)
+        return objs
+
     def next(self):
         _call_hook(self, 'before_cursor_next', self)
         try:
@@ -522,15 +869,40 @@ class ODMCursor:
     __next__ = next
 
     def options(self, **kwargs):
+        """Changes the options used to create the objects retrieved by the query.
+
+        With ``readonly=True`` the objects are not tracked by the session
+        nor instrumented, see :meth:`.ODMSession.find`.
+
+        With ``eager`` set to a list of :class:`.RelationProperty` names, the
+        results are retrieved in batches of ``eager_batch_size`` (100 by default)
+        and those relations are loaded for the whole batch at once,
+        instead of issuing one query per object when they are accessed.
+        ``undefer`` does the same for deferred fields, see :meth:`undefer`.
+        """
+        if kwargs.get('readonly'):
+            kwargs.setdefault('instrument', False)
         odm_cursor = ODMCursor(self.session, self.cls,self.ming_cursor)
         odm_cursor._options = Object(self._options, **kwargs)
+        odm_cursor._memo_spec = self._chained_memo_spec()
         _call_hook(self, 'cursor_created', odm_cursor, 'options', self, **kwargs)
         return odm_cursor
 
+    def undefer(self, *names):
+        """Retrieves the deferred ``names`` fields along with the results.
+
+        They are retrieved with one query for each batch of
+        ``eager_batch_size`` results, instead of one query per object
+        when they are accessed.
+        """
+        return self.options(undefer=names)
+
     def limit(self, limit):
         """Limit the number of entries retrieved by the query"""
         odm_cursor = ODMCursor(self.session, self.cls,
                                self.ming_cursor.limit(limit))
+        odm_cursor._options = self._options
+        odm_cursor._memo_spec = self._chained_memo_spec('limit', limit)
         _call_hook(self, 'cursor_created', odm_cursor, 'limit', self, limit)
         return odm_cursor
 
@@ -538,12 +910,16 @@ class ODMCursor:
         """Skip the first ``skip`` entries retrieved by the query"""
         odm_cursor = ODMCursor(self.session, self.cls,
                                self.ming_cursor.skip(skip))
+        odm_cursor._options = self._options
+        odm_cursor._memo_spec = self._chained_memo_spec('skip', skip)
         _call_hook(self, 'cursor_created', odm_cursor, 'skip', self, skip)
         return odm_cursor
 
     def hint(self, index_or_name):
         odm_cursor = ODMCursor(self.session, self.cls,
                                self.ming_cursor.hint(index_or_name))
+        odm_cursor._options = self._options
+        odm_cursor._memo_spec = self._chained_memo_spec('hint', index_or_name)
         _call_hook(self, 'cursor_created', odm_cursor, 'hint', self, index_or_name)
         return odm_cursor
 
@@ -555,6 +931,8 @@ class ODMCursor:
         """
         odm_cursor = ODMCursor(self.session, self.cls,
                                self.ming_cursor.sort(*args, **kwargs))
+        odm_cursor._options = self._options
+        odm_cursor._memo_spec = self._chained_memo_spec('sort', list(args), kwargs)
         _call_hook(self, 'cursor_created', odm_cursor, 'sort', self, *args, **kwargs)
         return odm_cursor
 
@@ -581,9 +959,27 @@ class ODMCursor:
         except StopIteration:
             return None
 
+    def iter_batches(self, size=100):
+        """Iterates over the results of the query in lists of up to ``size`` objects.
+
+        The documents of each batch are retrieved, validated and added to
+        the session together, and the ``before_cursor_next`` and
+        ``after_cursor_next`` hooks are called once per batch instead of
+        once per object, which makes retrieving many objects much faster.
+        """
+        while True:
+            _call_hook(self, 'before_cursor_next', self)
+            try:
+                batch = self._next_batch_impl(size)
+            finally:
+                _call_hook(self, 'after_cursor_next', self)
+            if not batch:
+                return
+            yield batch
+
     def all(self):
-        """Retrieve all the results of the query"""
-        return list(self)
+        """Retrieve all the results of the query, see :meth:`iter_batches`"""
+        return [obj for batch in self.iter_batches() for obj in batch]
 
     def rewind(self):
         """Rewind this cursor to its unevaluated state.
@@ -592,4 +988,6 @@ class ODMCursor:
         Future iterating performed on this cursor will cause new queries to be sent to the server,
         even if the resultant data has already been retrieved by this cursor.
         """
+        self._eager_buffer.clear()
+        self._reset_memo()
         return self.ming_cursor.rewind()
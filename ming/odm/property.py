@@ -43,9 +43,14 @@ class FieldProperty(ORMProperty):
 
     For details on available options in ``FieldProperty`` just rely on
     :class:`.Field` documentation.
+
+    ``deferred=True`` excludes the field from the documents retrieved by
+    queries, it's then retrieved from MongoDB when first accessed.
+    See :meth:`.ODMCursor.undefer` to retrieve it along with the query results.
     """
-    def __init__(self, field_type, *args, **kwargs):
+    def __init__(self, field_type, *args, deferred=False, **kwargs):
         ORMProperty.__init__(self)
+        self.deferred = deferred
         if isinstance(field_type, Field):
             self.field = field_type
             if args or kwargs:
@@ -75,7 +80,7 @@ class FieldProperty(ORMProperty):
         if instance is None: return self
         st = state(instance)
         if not st.options.instrument:
-            return st.document[self.name]
+            return st.field(self.name)
         try:
             return st.instrumented(self.name)
         except KeyError:
@@ -90,8 +95,8 @@ class FieldProperty(ORMProperty):
         if instance is None: return self
         st = state(instance)
         try:
-            return getattr(st.document, self.name)
-        except AttributeError:
+            return st.field(self.name)
+        except KeyError:
             session(instance).flush(instance)
             return getattr(st.document, self.name)
 
@@ -99,9 +104,12 @@ class FieldProperty(ORMProperty):
         st = state(instance)
         value = deinstrument(value)
         value = self.field.schema.validate(value)
-        if st.document.get(self.name, ()) != value:
+        try:
+            current = st.field(self.name)
+        except KeyError:
+            current = ()
+        if current != value:
             st.set(self.name, value)
-            st.soil()
 
     def __delete__(self, instance, cls=None):
         st = state(instance)
@@ -118,7 +126,7 @@ class FieldPropertyWithMissingNone(FieldProperty):
         if instance is None: return self
         st = state(instance)
         if not st.options.instrument:
-            return st.document[self.name]
+            return st.field(self.name)
         try:
             return st.instrumented(self.name)
         except KeyError:
@@ -280,6 +288,20 @@ class RelationProperty(ORMProperty):
     def __set__(self, instance, value):
         self.join.set(instance, value)
 
+    def load_many(self, instances):
+        """Loads the relation of all ``instances`` which didn't load it yet.
+
+        The related objects are retrieved at once when supported by the join
+        and are cached as if they were loaded by accessing the relation.
+        """
+        if not self.fetch:
+            return
+        instances = [i for i in instances if self not in state(i).extra_state]
+        if not instances:
+            return
+        for instance, value in zip(instances, self.join.load_many(instances)):
+            state(instance).extra_state[self] = value
+
 class ManyToOneJoin:
 
     def __init__(self, own_cls, rel_cls, prop):
@@ -294,6 +316,16 @@ class ManyToOneJoin:
             return None
         return self.rel_cls.query.get(_id=key_value)
 
+    def load_many(self, instances):
+        key_values = [self.prop.__get__(instance, self.own_cls) for instance in instances]
+        if not self.prop.allow_none:
+            wanted = {k for k in key_values if k is not None}
+        else:
+            wanted = set(key_values)
+        wanted = list(wanted)
+        related = dict(zip(wanted, self.rel_cls.query.get_many(wanted)))
+        return [related.get(k) for k in key_values]
+
     def iterator(self, instance):
         return [ self.load(instance) ]
 
@@ -312,6 +344,13 @@ class OneToManyJoin:
             list(self.iterator(instance)),
             OneToManyTracker(state(instance)))
 
+    def load_many(self, instances):
+        related = {instance._id: [] for instance in instances}
+        for obj in self.rel_cls.query.find({self.prop.name: {'$in': list(related)}}):
+            related[self.prop.__get__(obj, self.rel_cls)].append(obj)
+        return [instrument(related[instance._id], OneToManyTracker(state(instance)))
+                for instance in instances]
+
     def iterator(self, instance):
         key_value = instance._id
         return self.rel_cls.query.find({self.prop.name:key_value})
@@ -356,6 +395,28 @@ class ManyToManyListJoin:
             list(self.iterator(instance)),
             ManyToManyListTracker(state(instance)))
 
+    def load_many(self, instances):
+        if self.detains_list:
+            # instances own the lists, query the union of all the lists and
+            # keep the related objects in the order they were retrieved.
+            id_lists = [self.prop.__get__(instance, self.prop.name) for instance in instances]
+            field_name = self.rel_cls._id.field.name
+            related_ids = list({i for ids in id_lists for i in ids})
+            results = self.rel_cls.query.find({field_name: {'$in': related_ids}}).all()
+            position = {obj._id: n for n, obj in enumerate(results)}
+            related = [[results[n] for n in sorted({position[i] for i in ids if i in position})]
+                       for ids in id_lists]
+        else:
+            # related objects own the lists, group them by the instances they refer to
+            grouped = {instance._id: [] for instance in instances}
+            for obj in self.rel_cls.query.find({self.prop.name: {'$in': list(grouped)}}):
+                for instance_id in set(self.prop.__get__(obj, self.rel_cls)):
+                    if instance_id in grouped:
+                        grouped[instance_id].append(obj)
+            related = [grouped[instance._id] for instance in instances]
+        return [instrument(objs, ManyToManyListTracker(state(instance)))
+                for instance, objs in zip(instances, related)]
+
     def iterator(self, instance):
         if self.detains_list:
             # instance is the class owning the list
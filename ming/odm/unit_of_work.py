@@ -1,22 +1,82 @@
+from collections import defaultdict
+from weakref import WeakValueDictionary
+
+from pymongo.errors import BulkWriteError
+
 from ming.utils import indent
-from .base import state, ObjectState
+from .base import state, ObjectState, _call_hook
+from .mapper import mapper
 
 class UnitOfWork:
+    """Tracks the objects of a session and their state.
 
-    def __init__(self, session):
+    When ``weak`` is ``True`` clean objects are only weakly referenced,
+    so they are removed from the UnitOfWork once they get garbage collected.
+    New, dirty and deleted objects are always kept until they are flushed.
+    """
+
+    def __init__(self, session, weak=False):
         self.session = session
-        self._objects = {}
+        self.weak = weak
+        self._objects = WeakValueDictionary() if weak else {} # dict[id(obj)] = obj
+        self._pending = {} # dict[id(obj)] = obj, for new, dirty and deleted objects
 
     def __iter__(self):
         return iter(self._objects.values())
 
+    def __len__(self):
+        return len(self._objects)
+
     def save(self, obj):
         self._objects[id(obj)] = obj
+        if state(obj).status == ObjectState.clean:
+            self._pending.pop(id(obj), None)
+        else:
+            self._pending[id(obj)] = obj
+
+    def save_clean(self, objs):
+        """Same as :meth:`save` for many objects known to be clean"""
+        self._objects.update((id(obj), obj) for obj in objs)
+
+    def status_changed(self, st, old_status):
+        """Called by :class:`.ObjectState` when the status of an object changes.
+
+        Keeps track of the objects which are not clean, so that flushing
+        only has to look at them instead of every object in the session.
+        """
+        obj = st.instance
+        if obj is None or self._objects.get(id(obj)) is not obj:
+            return
+        if st.status == ObjectState.clean:
+            self._pending.pop(id(obj), None)
+        else:
+            self._pending[id(obj)] = obj
+
+    def touch(self, obj):
+        """Marks ``obj`` as the most recently used object"""
+        objid = id(obj)
+        if objid in self._objects:
+            self._objects[objid] = self._objects.pop(objid)
+
+    def least_recently_used(self, count, exclude=()):
+        """Returns up to ``count`` clean objects, least recently used first, apart from ``exclude``"""
+        result = []
+        if count > 0 and len(self._objects) > len(self._pending):
+            excluded = {id(obj) for obj in exclude}
+            for objid, obj in self._objects.items():
+                if objid not in self._pending and objid not in excluded:
+                    result.append(obj)
+                    if len(result) == count:
+                        break
+        return result
+
+    def _with_status(self, status):
+        return (obj for obj in list(self._pending.values())
+                if state(obj).status == status)
 
     @property
     def new(self):
-        return (obj for obj in self._objects.values()
-                if state(obj).status == ObjectState.new)
+        return self._with_status(ObjectState.new)
 
     @property
     def clean(self):
@@ -25,39 +85,120 @@ class UnitOfWork:
 
     @property
     def dirty(self):
-        return (obj for obj in self._objects.values()
-                if state(obj).status == ObjectState.dirty)
+        return self._with_status(ObjectState.dirty)
 
     @property
     def deleted(self):
-        return (obj for obj in self._objects.values()
-                if state(obj).status == ObjectState.deleted)
+        return self._with_status(ObjectState.deleted)
 
     def flush(self):
-        new_objs = {}
+        """Flush all the new, dirty and deleted objects.
+
+        Only the objects which are not clean are looked at and the session
+        IdentityMap is only updated for the flushed objects, so the cost
+        doesn't depend on the clean objects in the session.
+        When a write fails, the objects already written are still
+        marked as flushed, so that a later flush doesn't write them again.
+        """
+        flushed = []
+        try:
+            if self.session.bulk_flush:
+                self._flush_bulk(flushed)
+            else:
+                self._flush_each(flushed)
+        finally:
+            imap = self.session.imap
+            for obj, deleted in flushed:
+                if deleted:
+                    self.expunge(obj)
+                    imap.expunge(obj)
+                else:
+                    # new objects might have got their _id only when inserted
+                    imap.save(obj)
+
+    def _flush_each(self, flushed):
         inow = self.session.insert_now
         unow = self.session.update_now
         dnow = self.session.delete_now
-        for i, obj in self._objects.items():
+        for obj in list(self._pending.values()):
             st = state(obj)
             if st.status == ObjectState.new:
                 inow(obj, st)
                 st.status = ObjectState.clean
-                new_objs[i] = obj
+                flushed.append((obj, False))
             elif st.status == ObjectState.dirty:
                 unow(obj, st)
                 st.status = ObjectState.clean
-                new_objs[i] = obj
+                flushed.append((obj, False))
             elif st.status == ObjectState.deleted:
                 dnow(obj, st)
+                flushed.append((obj, True))
+            elif st.status == ObjectState.clean:
+                pass
+            else:
+                assert False, 'Unknown obj state: %s' % st.status
+
+    def _flush_bulk(self, flushed):
+        """Flush grouping the pending writes in one ``bulk_write`` per collection.
+
+        The before/after hooks of the session and mapper extensions are still
+        called for each object, the after hooks once the bulk write succeeded.
+        Writes are ordered within each collection, but not across collections.
+        """
+        sess = self.session
+        batches = defaultdict(list)
+        for obj in list(self._pending.values()):
+            st = state(obj)
+            if st.status == ObjectState.new:
+                action = 'insert'
+            elif st.status == ObjectState.dirty:
+                action = 'update'
+            elif st.status == ObjectState.deleted:
+                action = 'delete'
             elif st.status == ObjectState.clean:
-                new_objs[i] = obj
+                continue
             else:
                 assert False, 'Unknown obj state: %s' % st.status
-        self._objects = new_objs
-        self.session.imap.clear()
-        for obj in new_objs.values():
-            self.session.imap.save(obj)
+            m = mapper(obj)
+            _call_hook(sess, 'before_' + action, obj, st)
+            _call_hook(m, 'before_' + action, obj, st, sess)
+            op = getattr(m, action + '_op')(obj, st, sess)
+            batches[m.collection.m.collection_name].append((obj, st, m, action, op))
+        for batch in batches.values():
+            self._write_batch(batch, flushed)
+
+    def _write_batch(self, batch, flushed):
+        """Performs the ``bulk_write`` of a collection and marks the written objects as flushed.
+
+        When some of the writes fail, the others are still marked
+        before the ``BulkWriteError`` is raised again.
+        """
+        sess = self.session
+        requested = [item for item in batch if item[4] is not None]
+        failed = set()
+        error = None
+        if requested:
+            try:
+                sess.impl.bulk_write(batch[0][2].collection, [item[4] for item in requested],
+                                     ordered=sess.bulk_ordered)
+            except BulkWriteError as e:
+                error = e
+                indexes = {err['index'] for err in e.details.get('writeErrors', ())}
+                if sess.bulk_ordered and indexes:
+                    # The writes after the first error were not performed
+                    indexes = range(min(indexes), len(requested))
+                failed = {id(requested[i]) for i in indexes}
+        for item in batch:
+            if id(item) in failed:
+                continue
+            obj, st, m, action, op = item
+            if action != 'delete':
+                st.saved()
+            _call_hook(m, 'after_' + action, obj, st, sess)
+            _call_hook(sess, 'after_' + action, obj, st)
+            flushed.append((obj, action == 'delete'))
+        if error is not None:
+            raise error
 
     def __repr__(self):
         l = ['<UnitOfWork>']
@@ -72,9 +213,11 @@ class UnitOfWork:
         return '\n'.join(l)
 
     def clear(self):
-        self._objects = {} # dict[id(obj)] = obj
+        self._objects = WeakValueDictionary() if self.weak else {}
+        self._pending = {}
 
     def expunge(self, obj):
+        self._pending.pop(id(obj), None)
         try:
             del self._objects[id(obj)]
         except KeyError:
@@ -1,7 +1,7 @@
 import types
 import logging
 
-from copy import deepcopy
+from copy import copy, deepcopy
 from datetime import datetime, date
 from decimal import Decimal, ROUND_HALF_DOWN, Context
 
@@ -301,6 +301,9 @@ class Object(FancySchemaItem):
     to a :class:`ming.base.Object`.
 
     Also ensures that the incoming object does not have any extra keys.
+
+    The first time it's used, the validation is compiled to a function
+    specialized for its fields, see :func:`compile_object`.
     """
 
     def __init__(self, fields=None, required=False, if_missing=NoDefault):
@@ -373,7 +376,23 @@ class Object(FancySchemaItem):
             except Invalid as inv:
                 errors.append((name, inv))
 
+    @LazyProperty
+    def _compiled(self):
+        return compile_object(self)
+
     def _validate(self, d, allow_extra=False, strip_extra=False):
+        compiled = self._compiled
+        if compiled is not None:
+            try:
+                result = compiled(d, allow_extra, strip_extra)
+            except Invalid:
+                # Validate again to report all the errors
+                result = None
+            if result is not None:
+                return result
+        return self._validate_fields(d, allow_extra, strip_extra)
+
+    def _validate_fields(self, d, allow_extra=False, strip_extra=False):
         if not isinstance(d, dict): raise Invalid(f'notdict: {d}', d, None)
         if allow_extra and not strip_extra:
             to_set = list(d.items())
@@ -395,9 +414,47 @@ class Object(FancySchemaItem):
                 raise Invalid('Extra keys: %r' % extra_keys, d, None)
         return result
 
+    def without(self, names):
+        """Returns a copy of this schema which doesn't have the ``names`` fields"""
+        result = copy(self)
+        result.__dict__.pop('field_items', None)
+        result.__dict__.pop('_compiled', None)
+        if 'validate' in self.__dict__:
+            result.validate = getattr(result, self.validate.__name__)
+        result.fields = {name: field for name, field in self.fields.items()
+                         if name not in names}
+        return result
+
+    def validate_partial(self, d, names, **kw):
+        """Validates only the ``names`` fields of ``d``.
+
+        Returns a :class:`ming.base.Object` with the validated values of those
+        fields, the fields which are still missing after validation are left out.
+        """
+        result = BaseObject()
+        errors = []
+        for name in names:
+            field = self.fields.get(name)
+            if field is None:
+                errors.append((name, Invalid('Extra key', d.get(name), None)))
+                continue
+            try:
+                value = field.validate(d.get(name, Missing), **kw)
+            except Invalid as inv:
+                errors.append((name, inv))
+                continue
+            if value is not Missing:
+                result[name] = value
+        if errors:
+            msg = '\n'.join('%s:%s' % t for t in errors)
+            raise Invalid(msg, d, None, error_dict=dict(errors))
+        return result
+
     def extend(self, other):
         if other is None: return
         self.fields.update(other.fields)
+        self.__dict__.pop('field_items', None)
+        self.__dict__.pop('_compiled', None)
 
 
 class Document(Object):
@@ -752,3 +809,109 @@ SHORTHAND = {
     datetime: DateTime,
     Decimal128: NumberDecimal,
 }
+
+
+def compile_object(schema):
+    """Generates a function validating dictionaries like ``schema._validate_fields``.
+
+    The function is specialized for the fields of the :class:`Object` ``schema``:
+    values of the expected type are checked inline, nested objects use their
+    own compiled function and anything else is validated by the fields
+    themselves. It returns ``None`` when the dictionary has to be validated
+    by ``schema._validate_fields`` instead, like when it has extra keys,
+    and raises :class:`Invalid` without the details of the errors.
+
+    Returns ``None`` when the schema cannot be compiled.
+    """
+    if '_validate' in schema.__dict__:
+        return None  # homogenous objects
+    if not all(isinstance(name, str) for name in schema.fields):
+        return None
+    namespace = dict(Missing=Missing, BaseObject=BaseObject, FIELDS=frozenset(schema.fields))
+    lines = [
+        'def validate(d, allow_extra, strip_extra):',
+        '    if not isinstance(d, dict): return None',
+        '    if not allow_extra and not d.keys() <= FIELDS: return None',
+        '    to_set = list(d.items()) if allow_extra and not strip_extra else []',
+        '    append = to_set.append',
+        '    get = d.get',
+    ]
+    for i, (name, field) in enumerate(schema.field_items):
+        namespace['N%d' % i] = name
+        lines.append('    v = get(N%d, Missing)' % i)
+        lines.extend('    ' + line for line in _compile_field(field, i, namespace))
+        lines.append('    if r is not Missing: append((N%d, r))' % i)
+    lines.append('    return BaseObject(to_set)')
+    exec(compile('\n'.join(lines), '<ming.schema %s>' % type(schema).__name__, 'exec'), namespace)
+    return namespace['validate']
+
+
+def _compile_field(field, i, namespace):
+    """Code storing in ``r`` the value of ``v`` validated by ``field``"""
+    namespace['F%d' % i] = field.validate
+    generic = 'r = F%d(v, allow_extra=allow_extra, strip_extra=strip_extra)' % i
+    mode = getattr(getattr(field, 'validate', None), '__func__', None)
+    if mode not in (FancySchemaItem._validate_required,
+                    FancySchemaItem._validate_fast_missing,
+                    FancySchemaItem._validate_optional):
+        return [generic]
+    check, value = _compile_check(field, i, namespace)
+    if check is None:
+        return [generic]
+    namespace['IFM%d' % i] = field.if_missing
+    if mode is FancySchemaItem._validate_fast_missing:
+        lines = ['if v is Missing or v == IFM%d: r = IFM%d' % (i, i)]
+    else:
+        lines = ['if v is Missing: ' + generic]
+        if mode is FancySchemaItem._validate_optional and not field._callable_if_missing:
+            lines.append('elif v == IFM%d: r = v' % i)
+    lines.append(f'elif {check}: r = {value}')
+    lines.append('else: ' + generic)
+    return lines
+
+
+def _compile_check(field, key, namespace, var='v'):
+    """Inline check of the values ``var`` that ``field`` accepts as they are, and the validated value.
+
+    Returns ``(None, None)`` when the values can only be validated by ``field``.
+    """
+    if '_validate' in field.__dict__ and not isinstance(field, Array):
+        return None, None
+    cls = type(field)
+    if cls._validate is ParticularScalar._validate:
+        types = field.type if isinstance(field.type, tuple) else (field.type,)
+        namespace['T%s' % key] = types
+        if field._allow_none:
+            return '({0} is None or type({0}) in T{1})'.format(var, key), var
+        return 'type({0}) in T{1}'.format(var, key), var
+    if cls is Int:
+        if field._allow_none:
+            return '({0} is None or type({0}) is int)'.format(var), var
+        return 'type({0}) is int'.format(var), var
+    if cls is ObjectId:
+        namespace['OID'] = bson.ObjectId
+        return '({0} is None or type({0}) is OID)'.format(var), var
+    if cls in (Object, Document) and cls._validate is Object._validate:
+        compiled = field._compiled
+        if compiled is None:
+            return None, None
+        namespace['C%s' % key] = compiled
+        return ('isinstance(v, dict)',
+                '(C{0}(v, allow_extra, strip_extra) or F{0}(v, allow_extra=allow_extra, '
+                'strip_extra=strip_extra))'.format(key))
+    if cls is Array and getattr(field._validate, '__func__', None) is Array._full_validate:
+        element = field.field_type
+        namespace['EF%s' % key] = element.validate
+        mode = getattr(getattr(element, 'validate', None), '__func__', None)
+        element_check = None
+        if not isinstance(element, (Object, Array)) and (
+                mode in (FancySchemaItem._validate_required, FancySchemaItem._validate_optional)
+                or (mode is FancySchemaItem._validate_fast_missing and element.if_missing is None)):
+            element_check, _ = _compile_check(element, 'E%s' % key, namespace, 'x')
+        if element_check is None:
+            value = '[EF{0}(x, allow_extra=allow_extra, strip_extra=strip_extra) for x in v]'
+        else:
+            value = ('[x if %s else EF{0}(x, allow_extra=allow_extra, strip_extra=strip_extra) '
+                     'for x in v]' % element_check)
+        return 'isinstance(v, list)', value.format(key)
+    return None, None
@@ -1,4 +1,5 @@
 import logging
+from collections import defaultdict
 from functools import update_wrapper
 
 import bson.errors
@@ -7,11 +8,15 @@ import pymongo
 import pymongo.errors
 import pymongo.collection
 import pymongo.database
+from bson.raw_bson import RawBSONDocument
+from pymongo import InsertOne, ReplaceOne, UpdateOne, DeleteOne
 
 from .base import Cursor, Object
+from .cache import query_cache
 from .datastore import DataStore
-from .utils import fixup_index, fix_write_concern
+from .utils import fixup_index, fix_write_concern, parse_validate_reads
 from . import exc
+from . import schema as S
 
 log = logging.getLogger(__name__)
 
@@ -30,16 +35,42 @@ def annotate_doc_failure(func):
             raise
     return update_wrapper(wrapper, func)
 
+def invalidates_query_cache(func):
+    '''Decorator to wrap a session operation writing to the collection of the
+    class or document it receives, so that the cached query results for
+    that collection are discarded
+    '''
+    def wrapper(self, cls_or_doc, *args, **kwargs):
+        try:
+            return func(self, cls_or_doc, *args, **kwargs)
+        finally:
+            query_cache.invalidate(self._impl(cls_or_doc))
+    return update_wrapper(wrapper, func)
+
 
 class Session:
+    '''
+    ``validate_reads`` sets how the documents returned by :meth:`find` are
+    validated, unless the ``validate_reads`` of the class ``__mongometa__``
+    overrides it. ``'full'`` validates all of them, ``'sample:0.01'`` fully
+    validates a random 1% of them and trusts the others, only validating
+    their ``_id``. Errors found in the sampled documents are logged and
+    counted in :attr:`read_violations` instead of being raised.
+
+    When :meth:`save` only saves some fields and the class ``__mongometa__``
+    sets ``validate_saves = 'changed'``, only those fields are validated.
+    '''
     _registry = {}
     _datastores = {}
 
-    def __init__(self, bind: DataStore = None):
+    def __init__(self, bind: DataStore = None, validate_reads=None):
         '''
         bind may be a lazy parameter, established later with ming.configure
         '''
         self.bind = bind
+        parse_validate_reads(validate_reads)
+        self.validate_reads = validate_reads
+        self.read_violations = defaultdict(int)  # collection name -> invalid documents read
 
     @classmethod
     def by_name(cls, name):
@@ -66,7 +97,24 @@ class Session:
         if bson is None: return None
         return cls.make(bson, allow_extra=True, strip_extra=True)
 
+    def get_many(self, cls, ids, chunk_size=1000):
+        """Retrieves the ``cls`` documents with the given ``_id`` values.
+
+        The documents are retrieved with one ``$in`` query every ``chunk_size``
+        ids and are returned in the same order as ``ids``, with ``None`` in place
+        of the documents that were not found.
+        """
+        ids = list(ids)
+        wanted = list(dict.fromkeys(ids))
+        found = {}
+        for i in range(0, len(wanted), chunk_size):
+            for bson in self._impl(cls).find({'_id': {'$in': wanted[i:i + chunk_size]}}):
+                found[bson['_id']] = cls.make(bson, allow_extra=True, strip_extra=True)
+        return [found.get(idvalue) for idvalue in ids]
+
     def find(self, cls, *args, **kwargs):
+        raw_bson = kwargs.pop('raw_bson', False)
+        raw = kwargs.pop('raw', False) or raw_bson
         if not args and kwargs:
             raise ValueError('A query dict is typically the first param to find() but it is not present. '
                              'Moreover, **kwargs were found.  Kwargs are only used for options and not query criteria. '
@@ -75,13 +123,22 @@ class Session:
         allow_extra = kwargs.pop('allow_extra', True)
         strip_extra = kwargs.pop('strip_extra', True)
         validate = kwargs.pop('validate', True)
+        deferred = kwargs.pop('deferred', ())
 
         projection = kwargs.pop('projection', None)
         if projection is not None:
             kwargs['projection'] = projection
 
         collection = self._impl(cls)
-        cursor = collection.find(*args, **kwargs)
+        if raw_bson:
+            # Documents are left encoded and returned without validation
+            collection = collection.with_options(
+                codec_options=collection.codec_options.with_options(
+                    document_class=RawBSONDocument))
+        if cls.m.query_cache:
+            cursor = query_cache.cursor(collection, *args, **kwargs)
+        else:
+            cursor = collection.find(*args, **kwargs)
 
         find_spec = kwargs.get('filter', None) or args[0] if args else {}
 
@@ -91,8 +148,18 @@ class Session:
         return Cursor(cls, cursor,
                       allow_extra=allow_extra,
                       strip_extra=strip_extra,
-                      find_spec=find_spec)
-
+                      find_spec=find_spec,
+                      raw=raw,
+                      sample_rate=parse_validate_reads(cls.m.validate_reads or self.validate_reads),
+                      on_invalid=self._read_violation,
+                      deferred=deferred)
+
+    def _read_violation(self, cls, doc, error):
+        collection_name = cls.m.collection_name
+        self.read_violations[collection_name] += 1
+        log.warning('Invalid document %r read from %s: %s', doc.get('_id'), collection_name, error)
+
+    @invalidates_query_cache
     def remove(self, cls, filter={}, *args, **kwargs):
         fix_write_concern(kwargs)
         for kwarg in kwargs:
@@ -124,35 +191,45 @@ class Session:
     def distinct(self, cls, *args, **kwargs):
         return self._impl(cls).distinct(*args, **kwargs)
 
+    @invalidates_query_cache
     def update_partial(self, cls, spec, fields, upsert=False, **kw):
         multi = kw.pop('multi', False)
         if multi is True:
             return self._impl(cls).update_many(spec, fields, upsert, **kw)
         return self._impl(cls).update_one(spec, fields, upsert, **kw)
 
+    @invalidates_query_cache
     def find_one_and_update(self, cls, *args, **kwargs):
         return self._impl(cls).find_one_and_update(*args, **kwargs)
 
+    @invalidates_query_cache
     def find_one_and_replace(self, cls, *args, **kwargs):
         return self._impl(cls).find_one_and_replace(*args, **kwargs)
 
+    @invalidates_query_cache
     def find_one_and_delete(self, cls, *args, **kwargs):
         return self._impl(cls).find_one_and_delete(*args, **kwargs)
 
-    def _prep_save(self, doc, validate):
+    def _prep_save(self, doc, validate, fields=()):
         hook = doc.m.before_save
         if hook: hook(doc)
         if validate:
-            if doc.m.schema is None:
+            schema = doc.m.schema
+            if schema is None:
+                data = dict(doc)
+            elif fields and doc.m.validate_saves == 'changed' and isinstance(schema, S.Object):
+                # Only the saved fields are validated
                 data = dict(doc)
+                data.update(schema.validate_partial(doc, fields))
             else:
-                data = doc.m.schema.validate(doc)
+                data = schema.validate(doc)
             doc.update(data)
         else:
             data = dict(doc)
         return data
 
     @annotate_doc_failure
+    @invalidates_query_cache
     def save(self, doc, *args, **kwargs) -> bson.ObjectId:
         """
         Can either
@@ -165,7 +242,7 @@ class Session:
         Y  |   replace    |   update   |
            |---------------------------|
         """
-        data = self._prep_save(doc, kwargs.pop('validate', True))
+        data = self._prep_save(doc, kwargs.pop('validate', True), args)
 
         # if _id is None:
         #     doc.pop('_id', None)
@@ -198,6 +275,7 @@ class Session:
         return result
 
     @annotate_doc_failure
+    @invalidates_query_cache
     def insert(self, doc, **kwargs):
         data = self._prep_save(doc, kwargs.pop('validate', True))
         bson = self._impl(doc).insert_one(data, **fix_write_concern(kwargs))
@@ -205,7 +283,39 @@ class Session:
             doc._id = bson
         return bson
 
+    def insert_op(self, doc, **kwargs) -> InsertOne:
+        """Builds the request :meth:`insert` would perform, for :meth:`bulk_write`"""
+        data = self._prep_save(doc, kwargs.pop('validate', True))
+        return self._insert_request(doc, data)
+
+    def save_op(self, doc, *args, **kwargs):
+        """Builds the request :meth:`save` would perform, for :meth:`bulk_write`"""
+        data = self._prep_save(doc, kwargs.pop('validate', True), args)
+        if args:
+            if '_id' not in doc:
+                raise ValueError('Cannot save a subset without an _id')
+            arg_data = {arg: data[arg] for arg in args}
+            return UpdateOne(dict(_id=doc._id), {'$set': arg_data})
+        if '_id' in doc:
+            return ReplaceOne(dict(_id=doc._id), data, upsert=True)
+        return self._insert_request(doc, data)
+
+    def _insert_request(self, doc, data):
+        if '_id' not in data:
+            # Generated now, so that doc gets it like with insert
+            data['_id'] = doc['_id'] = bson.ObjectId()
+        return InsertOne(data)
+
+    def delete_op(self, doc) -> DeleteOne:
+        """Builds the request :meth:`delete` would perform, for :meth:`bulk_write`"""
+        return DeleteOne({'_id': doc._id})
+
+    @invalidates_query_cache
+    def bulk_write(self, cls, requests, ordered=True, **kwargs):
+        return self._impl(cls).bulk_write(requests, ordered=ordered, **kwargs)
+
     @annotate_doc_failure
+    @invalidates_query_cache
     def upsert(self, doc, spec_fields, **kwargs):
         self._prep_save(doc, kwargs.pop('validate', True))
         if type(spec_fields) != list:
@@ -215,6 +325,7 @@ class Session:
                                upsert=True)
 
     @annotate_doc_failure
+    @invalidates_query_cache
     def delete(self, doc):
         return self._impl(doc).delete_one({'_id':doc._id})
 
@@ -227,6 +338,7 @@ class Session:
             self._set(doc[key_parts[0]], key_parts[1:], value)
 
     @annotate_doc_failure
+    @invalidates_query_cache
     def set(self, doc, fields_values):
         """
         sets a key/value pairs, and persists those changes to the datastore
@@ -239,6 +351,7 @@ class Session:
         return impl.update_one({'_id':doc._id}, {'$set':fields_values})
 
     @annotate_doc_failure
+    @invalidates_query_cache
     def increase_field(self, doc, **kwargs):
         """
         usage: increase_field(key=value)
@@ -1,21 +1,26 @@
+import gc
 import os
 import sys
 from collections import defaultdict
 from unittest import TestCase, SkipTest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from ming import schema as S
 from ming import create_datastore
 from ming import Session
-from ming.exc import MingException
+from ming.exc import MingException, ReadOnlyError
 from ming.odm import ODMSession, Mapper
 from ming.odm import FieldProperty, RelationProperty, ForeignIdProperty
 from ming.odm import FieldPropertyWithMissingNone
 from ming.odm.declarative import MappedClass
-from ming.odm import state, mapper
+from ming.odm import state, mapper, session
 from ming.odm import MapperExtension, SessionExtension
 from ming.odm.odmsession import ODMCursor
+from ming.odm.icollection import InstrumentedList
+from ming.base import Object
 import bson
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import BulkWriteError
 
 class TestIndex(TestCase):
 
@@ -152,6 +157,64 @@ class TestRelation(TestCase):
         parent = self.Parent.query.get(_id=1)
         self.assertEqual(len(parent.children), 5)
 
+    def test_eager_many_to_one(self):
+        parents = [self.Parent(_id=i) for i in range(3)]
+        children = [self.Child(_id=i, parent_id=i % 3) for i in range(6)]
+        self.Child(_id=10, parent_id=None)
+        self.session.flush()
+        self.session.clear()
+        parent = self.Parent.query.get(_id=1)
+        with patch.object(self.session.impl, 'find', wraps=self.session.impl.find) as find:
+            children = self.Child.query.find().options(eager=['parent']).sort('_id').all()
+            self.assertEqual([c.parent._id if c.parent else None for c in children],
+                             [0, 1, 2, 0, 1, 2, None])
+        self.assertEqual(find.call_count, 2)
+        self.assertEqual(sorted(find.call_args[0][1]['_id']['$in']), [0, 2])
+        self.assertIs(children[1].parent, parent)
+        self.assertIs(children[0].parent, children[3].parent)
+
+    def test_eager_batches(self):
+        self.Parent(_id=1)
+        for i in range(5):
+            self.Child(_id=i, parent_id=1)
+        self.session.flush()
+        self.session.clear()
+        with patch.object(self.session.impl, 'find', wraps=self.session.impl.find) as find:
+            children = self.Child.query.find().options(eager=['parent'], eager_batch_size=2).all()
+        self.assertEqual(len(children), 5)
+        self.assertEqual(find.call_count, 2)
+        self.assertTrue(all(c.parent is children[0].parent for c in children))
+
+    def test_load_relations_one_to_many(self):
+        parents = [self.Parent(_id=i) for i in range(3)]
+        for i in range(6):
+            self.Child(_id=i, parent_id=i % 2)
+        self.session.flush()
+        self.session.clear()
+        parents = self.Parent.query.find().sort('_id').all()
+        with patch.object(self.session.impl, 'find', wraps=self.session.impl.find) as find:
+            self.session.load_relations(parents, 'children')
+            self.assertEqual([[c._id for c in p.children] for p in parents],
+                             [[0, 2, 4], [1, 3, 5], []])
+        self.assertEqual(find.call_count, 1)
+        self.assertRaises(TypeError, parents[0].children.append, parents[2].children)
+
+    def test_eager_one_to_many(self):
+        self.Parent(_id=1)
+        self.Child(_id=1, parent_id=1)
+        self.session.flush()
+        self.session.clear()
+        with patch.object(self.session.impl, 'find', wraps=self.session.impl.find) as find:
+            parent = self.Parent.query.find().options(eager=['children']).first()
+            self.assertEqual([c._id for c in parent.children], [1])
+        self.assertEqual(find.call_count, 2)
+
+    def test_eager_unknown_relation(self):
+        self.Child(_id=1, parent_id=None)
+        self.session.flush()
+        cursor = self.Child.query.find().options(eager=['parent_id'])
+        self.assertRaises(AttributeError, cursor.first)
+
     def test_instrumented_readonly(self):
         parent = self.Parent(_id=1)
         children = [ self.Child(_id=i, parent_id=1) for i in range(5) ]
@@ -279,6 +342,25 @@ class TestManyToManyListRelation(TestCase):
         child = self.Child.query.get(_id=0)
         self.assertEqual(len(child.parents), 2)
 
+    def test_load_relations(self):
+        children = [ self.Child(_id=i) for i in range(5) ]
+        self.Parent(_id=1, _children=[4, 0, 2])
+        self.Parent(_id=2, _children=[1, 0, 7])
+        self.Parent(_id=3, _children=[])
+        self.session.flush()
+        self.session.clear()
+        parents = self.Parent.query.find().sort('_id').all()
+        children = self.Child.query.find().sort('_id').all()
+        with patch.object(self.session.impl, 'find', wraps=self.session.impl.find) as find:
+            self.session.load_relations(parents, 'children')
+            self.assertEqual([sorted(c._id for c in p.children) for p in parents],
+                             [[0, 2, 4], [0, 1], []])
+            self.session.load_relations(children, 'parents')
+            self.assertEqual([sorted(p._id for p in c.parents) for c in children],
+                             [[1, 2], [2], [1], [], [1]])
+        self.assertEqual(find.call_count, 2)
+        self.assertIs(parents[0].children[0], children[parents[0].children[0]._id])
+
     def test_instrumented_readonly(self):
         children = [ self.Child(_id=i) for i in range(5) ]
         parent = self.Parent(_id=1)
@@ -392,6 +474,22 @@ class TestManyToManyListReverseRelation(TestCase):
         child = self.Child.query.get(_id=0)
         self.assertEqual(len(child.parents), 2)
 
+    def test_load_relations(self):
+        self.Parent(_id=1)
+        self.Parent(_id=2)
+        self.Parent(_id=3)
+        self.Child(_id=1, _parents=[1, 2])
+        self.Child(_id=2, _parents=[2])
+        self.session.flush()
+        self.session.clear()
+        parents = self.Parent.query.find().sort('_id').all()
+        with patch.object(self.session.impl, 'find', wraps=self.session.impl.find) as find:
+            self.session.load_relations(parents, 'children')
+            self.assertEqual([sorted(c._id for c in p.children) for p in parents],
+                             [[1], [1, 2], []])
+        self.assertEqual(find.call_count, 1)
+
+
 
 class TestManyToManyListCyclic(TestCase):
 
@@ -726,6 +824,677 @@ class TestBasicMapping(TestCase):
         self.session.expunge(doc)
         self.session.expunge(doc)
 
+    def test_get_many(self):
+        docs = [self.Basic(a=i) for i in range(5)]
+        self.session.flush()
+        self.session.expunge(docs[1])
+        self.session.expunge(docs[3])
+        missing_id = bson.ObjectId()
+        ids = [docs[3]._id, missing_id, docs[0]._id, docs[1]._id, docs[3]._id]
+        with patch.object(self.session.impl, 'find', wraps=self.session.impl.find) as find:
+            result = self.Basic.query.get_many(ids)
+        self.assertEqual(find.call_count, 1)
+        self.assertEqual([d.a if d else None for d in result], [3, None, 0, 1, 3])
+        self.assertIs(result[2], docs[0])
+        self.assertIs(result[0], result[4])
+        self.assertIs(self.session.get(self.Basic, docs[3]._id), result[0])
+
+    def test_get_many_chunks(self):
+        docs = [self.Basic(a=i) for i in range(5)]
+        self.session.flush()
+        self.session.clear()
+        with patch.object(self.session.impl, 'find', wraps=self.session.impl.find) as find:
+            result = self.session.get_many(self.Basic, [d._id for d in docs], chunk_size=2)
+        self.assertEqual(find.call_count, 3)
+        self.assertEqual([d.a for d in result], [0, 1, 2, 3, 4])
+
+    def test_iter_batches(self):
+        docs = [self.Basic(a=i) for i in range(5)]
+        self.session.flush()
+        self.session.expunge(docs[1])
+        batches = list(self.Basic.query.find().sort('a').iter_batches(2))
+        self.assertEqual([[d.a for d in batch] for batch in batches], [[0, 1], [2, 3], [4]])
+        self.assertIs(batches[0][0], docs[0])
+        self.assertIsNot(batches[0][1], docs[1])
+        self.assertIs(self.Basic.query.get(_id=docs[1]._id), batches[0][1])
+        self.assertEqual(state(batches[0][1]).status, 'clean')
+        self.assertEqual(len(self.session.uow), 5)
+
+    def test_iter_batches_hooks(self):
+        for i in range(5):
+            self.Basic(a=i)
+        self.session.flush()
+        ext = MagicMock()
+        self.session.extensions = [ext]
+        cursor = self.Basic.query.find().sort('a')
+        self.assertEqual(cursor.next().a, 0)
+        self.assertEqual(ext.before_cursor_next.call_count, 1)
+        self.assertEqual([d.a for d in cursor.all()], [1, 2, 3, 4])
+        self.assertEqual(ext.before_cursor_next.call_count, 3)
+        self.assertEqual(ext.after_cursor_next.call_count, 3)
+
+    def test_iter_batches_options(self):
+        for i in range(3):
+            self.Basic(a=i)
+        self.session.flush()
+        self.session.clear()
+        cursor = self.Basic.query.find().sort('a').options(decorate=lambda d: d.a)
+        self.assertEqual(list(cursor.iter_batches(2)), [[0, 1], [2]])
+        docs = self.Basic.query.find(readonly=True).all()
+        self.assertEqual(len(docs), 3)
+        self.assertEqual(len(self.session.uow), 3)
+
+
+class TestBulkFlush(TestCase):
+
+    def setUp(self):
+        Mapper._mapper_by_classname.clear()
+        self.datastore = create_datastore('mim:///test_db')
+        self.hooks_called = defaultdict(list)
+        tc = self
+        class LoggingSessionExtension(SessionExtension):
+            def before_insert(self, obj, st):
+                tc.hooks_called['before_insert'].append(obj)
+            def after_insert(self, obj, st):
+                assert 'clean' == st.status
+                tc.hooks_called['after_insert'].append(obj)
+            def after_update(self, obj, st):
+                tc.hooks_called['after_update'].append(obj)
+            def after_delete(self, obj, st):
+                tc.hooks_called['after_delete'].append(obj)
+        class LoggingMapperExtension(MapperExtension):
+            def before_update(self, instance, state, sess):
+                assert 'dirty' == state.status
+                tc.hooks_called['mapper_before_update'].append(instance)
+        self.session = ODMSession(bind=self.datastore, bulk_flush=True,
+                                  extensions=[LoggingSessionExtension])
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+                extensions = [LoggingMapperExtension]
+            _id = FieldProperty(S.ObjectId)
+            a = FieldProperty(int)
+        class Other(MappedClass):
+            class __mongometa__:
+                name = 'other'
+                session = self.session
+            _id = FieldProperty(S.ObjectId)
+            b = FieldProperty(int)
+        Mapper.compile_all()
+        self.Basic = Basic
+        self.Other = Other
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_one_bulk_write_per_collection(self):
+        docs = [self.Basic(a=i) for i in range(5)]
+        self.Other(b=1)
+        with patch.object(self.session.impl, 'bulk_write',
+                          wraps=self.session.impl.bulk_write) as bulk_write:
+            self.session.flush()
+        self.assertEqual(bulk_write.call_count, 2)
+        self.assertEqual(self.hooks_called['before_insert'][:5], docs)
+        self.assertEqual(len(self.hooks_called['after_insert']), 6)
+        self.assertEqual(self.Basic.query.find().count(), 5)
+        self.assertEqual(self.Other.query.find().count(), 1)
+        for doc in docs:
+            self.assertEqual(state(doc).status, 'clean')
+
+    def test_update_and_delete(self):
+        docs = [self.Basic(a=i) for i in range(3)]
+        self.session.flush()
+        docs[0].a = 10
+        docs[1].delete()
+        self.session.flush()
+        self.assertEqual(self.hooks_called['mapper_before_update'], [docs[0]])
+        self.assertEqual(self.hooks_called['after_update'], [docs[0]])
+        self.assertEqual(self.hooks_called['after_delete'], [docs[1]])
+        self.session.clear()
+        self.assertEqual(sorted(d.a for d in self.Basic.query.find()), [2, 10])
+
+    def test_unordered(self):
+        self.session.bulk_ordered = False
+        with patch.object(self.session.impl, 'bulk_write',
+                          wraps=self.session.impl.bulk_write) as bulk_write:
+            self.Basic(a=1)
+            self.session.flush()
+        self.assertEqual(bulk_write.call_args[1]['ordered'], False)
+
+    def test_failed_writes(self):
+        self.session.impl.db.basic.create_index('a', unique=True)
+        self.session.impl.db.basic.insert_one({'a': 3})
+        for ordered, flushed in ((True, [True, False, False]), (False, [True, False, True])):
+            with self.subTest(ordered=ordered):
+                self.session.bulk_ordered = ordered
+                docs = [self.Basic(a=a) for a in (1, 3, 4)]
+                with self.assertRaises(BulkWriteError):
+                    self.session.flush()
+                self.assertEqual([state(d).status == 'clean' for d in docs], flushed)
+                docs[1].a = 5
+                self.session.flush()
+                self.assertEqual(sorted(d.a for d in self.Basic.query.find()), [1, 3, 4, 5])
+                self.session.clear()
+                self.session.impl.db.basic.delete_many({'a': {'$ne': 3}})
+
+
+class TestMaxTrackedObjects(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore, max_tracked_objects=5)
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+        Mapper.compile_all()
+        self.Basic = Basic
+        self.session.impl.db.basic.insert_many([dict(_id=i, a=i) for i in range(20)])
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_evicts_while_iterating(self):
+        for doc in self.Basic.query.find().sort('_id'):
+            self.assertLessEqual(len(self.session.uow), 5)
+        self.assertEqual(len(list(self.session.imap)), 5)
+        self.assertEqual(sorted(d._id for d in self.session.uow), [15, 16, 17, 18, 19])
+
+    def test_least_recently_used(self):
+        docs = self.Basic.query.find({'_id': {'$lt': 5}}).sort('_id').all()
+        self.assertIs(self.session.get(self.Basic, 0), docs[0])
+        self.Basic.query.get(_id=5)
+        self.assertIs(session(docs[0]), self.session)
+        self.assertIsNone(session(docs[1]))
+        self.assertIsNone(self.session.imap.get(self.Basic, 1))
+
+    def test_keeps_dirty(self):
+        docs = self.Basic.query.find({'_id': {'$lt': 5}}).sort('_id').all()
+        docs[0].a = 100
+        self.Basic.query.find({'_id': {'$gte': 5}}).all()
+        self.assertIs(session(docs[0]), self.session)
+        self.assertEqual(list(self.session.uow.dirty), [docs[0]])
+        # The 15 objects returned by the query are kept along with the dirty one
+        self.assertEqual(len(self.session.uow), 16)
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': 0})['a'], 100)
+
+    def test_keeps_returned_objects(self):
+        docs = self.Basic.query.find().sort('_id').all()
+        self.assertEqual(len(self.session.uow), 20)
+        self.assertTrue(all(session(d) is self.session for d in docs))
+        docs[10].a = 100
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': 10})['a'], 100)
+
+    def test_tracks_changed_evicted_objects(self):
+        docs = [self.Basic.query.get(_id=i) for i in range(10)]
+        self.assertIsNone(session(docs[0]))
+        docs[0].a = 100
+        self.assertIs(session(docs[0]), self.session)
+        self.assertIs(self.session.get(self.Basic, 0), docs[0])
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': 0})['a'], 100)
+        self.session.expunge(docs[1])
+        docs[1].a = 100
+        self.assertIsNone(session(docs[1]))
+
+    def test_flush_on_evict(self):
+        self.session.flush_on_evict = True
+        docs = [self.Basic(_id=100 + i, a=i) for i in range(8)]
+        self.assertEqual(len(self.session.uow), 5)
+        self.assertIsNone(session(docs[0]))
+        self.assertEqual(self.session.impl.db.basic.count_documents({'_id': {'$gte': 100}}), 6)
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.count_documents({'_id': {'$gte': 100}}), 8)
+
+
+class TestWeakIdentityMap(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore, weak_identity_map=True)
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+        Mapper.compile_all()
+        self.Basic = Basic
+        self.session.impl.db.basic.insert_many([dict(_id=i, a=i) for i in range(5)])
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_releases_clean_objects(self):
+        docs = self.Basic.query.find().sort('_id').all()
+        self.assertEqual(len(self.session.uow), 5)
+        kept = docs[2]
+        del docs
+        gc.collect()
+        self.assertEqual(list(self.session.uow), [kept])
+        self.assertEqual([obj for cls, vid, obj in self.session.imap], [kept])
+        self.assertEqual(self.session.imap._keys, {id(kept): (self.Basic, 2)})
+        self.assertIs(self.Basic.query.get(_id=2), kept)
+
+    def test_keeps_pending_objects(self):
+        doc = self.Basic.query.get(_id=1)
+        doc.a = 10
+        self.Basic(_id=10, a=10)
+        del doc
+        gc.collect()
+        self.assertEqual(len(self.session.uow), 2)
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': 1})['a'], 10)
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': 10})['a'], 10)
+        gc.collect()
+        self.assertEqual(len(self.session.uow), 0)
+        self.assertEqual(list(self.session.imap), [])
+
+
+class TestReadOnlyQueries(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore)
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+            b = FieldProperty([int])
+        Mapper.compile_all()
+        self.Basic = Basic
+        self.session.impl.db.basic.insert_many([dict(_id=i, a=i, b=[i]) for i in range(5)])
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_not_tracked(self):
+        docs = self.Basic.query.find(readonly=True).sort('_id').all()
+        self.assertEqual([d.a for d in docs], [0, 1, 2, 3, 4])
+        self.assertEqual(docs[1].b, [1])
+        self.assertNotIsInstance(docs[1].b, InstrumentedList)
+        self.assertEqual(len(self.session.uow), 0)
+        self.assertEqual(list(self.session.imap), [])
+        self.assertIsNone(session(docs[0]))
+        tracked = self.Basic.query.get(_id=0)
+        self.assertIsNot(tracked, docs[0])
+
+    def test_options(self):
+        doc = self.Basic.query.find({'_id': 2}).options(readonly=True).first()
+        self.assertEqual(doc.a, 2)
+        self.assertEqual(len(self.session.uow), 0)
+        docs = self.Basic.query.find().options(readonly=True).sort('_id').limit(2).all()
+        self.assertEqual([d._id for d in docs], [0, 1])
+        self.assertEqual(len(self.session.uow), 0)
+
+    def test_cannot_change(self):
+        doc = self.Basic.query.find({'_id': 2}, readonly=True).first()
+        with self.assertRaises(ReadOnlyError):
+            doc.a = 10
+        with self.assertRaises(ReadOnlyError):
+            del doc.a
+        with self.assertRaises(ReadOnlyError):
+            doc.delete()
+        self.assertEqual(doc.a, 2)
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': 2})['a'], 2)
+
+    def test_nested_changes_not_detected(self):
+        doc = self.Basic.query.find({'_id': 2}, readonly=True).first()
+        doc.b.append(3)
+        self.assertEqual(doc.b, [2, 3])
+        self.assertEqual(state(doc).status, 'clean')
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': 2})['b'], [2])
+
+
+class TestMemoizeQueries(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore, memoize_queries=True)
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+        class Other(MappedClass):
+            class __mongometa__:
+                name = 'other'
+                session = self.session
+            _id = FieldProperty(int)
+        Mapper.compile_all()
+        self.Basic = Basic
+        self.Other = Other
+        self.session.impl.db.basic.insert_many([dict(_id=i, a=i) for i in range(5)])
+        self.session.impl.db.other.insert_many([dict(_id=i) for i in range(5)])
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_repeated_query(self):
+        with patch.object(ODMCursor, '_next_docs', autospec=True,
+                          side_effect=ODMCursor._next_docs) as next_docs:
+            docs = self.Basic.query.find({'a': {'$gt': 1}}).sort('a').all()
+            self.assertEqual(next_docs.call_count, 2)
+            again = self.Basic.query.find({'a': {'$gt': 1}}).sort('a').all()
+            self.assertEqual(next_docs.call_count, 2)
+        self.assertEqual([d._id for d in docs], [2, 3, 4])
+        self.assertEqual(again, docs)
+        for doc, same in zip(docs, again):
+            self.assertIs(doc, same)
+
+    def test_query_shape(self):
+        find = self.Basic.query.find
+        self.assertEqual([d._id for d in find({}).sort('a').limit(2)], [0, 1])
+        self.assertEqual([d._id for d in find({}).sort('a', -1).limit(2)], [4, 3])
+        self.assertEqual([d._id for d in find({}).sort('a').skip(3)], [3, 4])
+        self.assertEqual([d._id for d in find({'a': 1})], [1])
+        self.assertEqual([d._id for d in find({}).sort('a').limit(2)], [0, 1])
+
+    def test_not_memoized_until_exhausted(self):
+        self.Basic.query.find({}).sort('a').first()
+        self.assertEqual(self.session._query_memo, {})
+        self.Basic.query.find({}).sort('a').all()
+        self.assertEqual(len(self.session._query_memo['basic']), 1)
+
+    def test_refresh_and_readonly_not_memoized(self):
+        self.Basic.query.find({}).all()
+        self.session.impl.db.basic.update_one({'_id': 1}, {'$set': {'a': 10}})
+        self.assertEqual(self.Basic.query.find({}, readonly=True).sort('_id').all()[1].a, 10)
+        self.assertEqual(self.Basic.query.find({}).sort('_id').all()[1].a, 1)
+        self.assertEqual(self.Basic.query.find({}, refresh=True).sort('_id').all()[1].a, 10)
+
+    def test_forgotten_on_flush(self):
+        self.assertEqual(self.Basic.query.find({'a': 1}).count(), 1)
+        self.assertEqual(len(self.Basic.query.find({'a': 1}).all()), 1)
+        self.Other.query.find({}).all()
+        obj = self.Basic.query.get(_id=2)
+        obj.a = 1
+        self.session.flush()
+        self.assertNotIn('basic', self.session._query_memo)
+        self.assertIn('other', self.session._query_memo)
+        self.assertEqual(sorted(d._id for d in self.Basic.query.find({'a': 1})), [1, 2])
+
+    def test_forgotten_on_update_and_remove(self):
+        self.assertEqual([d._id for d in self.Basic.query.find({'a': 1})], [1])
+        self.Basic.query.update({'_id': 2}, {'$set': {'a': 1}})
+        self.assertEqual(sorted(d._id for d in self.Basic.query.find({'a': 1})), [1, 2])
+        self.Basic.query.remove({'_id': 1})
+        self.assertEqual([d._id for d in self.Basic.query.find({'a': 1})], [2])
+        self.Basic.query.find_one_and_delete({'_id': 2})
+        self.assertEqual([d._id for d in self.Basic.query.find({'a': 1})], [])
+
+    def test_write_while_iterating(self):
+        cursor = self.Basic.query.find({})
+        cursor.first()
+        self.Basic.query.remove({'_id': 4})
+        cursor.all()
+        self.assertEqual(self.session._query_memo, {})
+
+    def test_expunged_objects(self):
+        docs = self.Basic.query.find({}).sort('_id').all()
+        self.session.expunge(docs[2])
+        again = self.Basic.query.find({}).sort('_id').all()
+        self.assertIsNot(again[2], docs[2])
+        self.assertIs(again[1], docs[1])
+
+    def test_disabled(self):
+        self.session.memoize_queries = False
+        self.Basic.query.find({}).all()
+        self.assertEqual(self.session._query_memo, {})
+
+
+class TestLazyDecoding(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore)
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+                lazy_decoding = True
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+            b = FieldProperty([dict(c=int)])
+            d = FieldProperty(str, if_missing='default')
+        Mapper.compile_all()
+        self.Basic = Basic
+        self.session.impl.db.basic.insert_many([
+            dict(_id=1, a=1, b=[dict(c=1)], extra=True),
+            dict(_id=2, a='invalid', b=[]),
+        ])
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_fields_validated_when_accessed(self):
+        self.assertEqual(len(self.Basic.query.find().all()), 2)
+        doc = self.Basic.query.get(_id=1)
+        st = state(doc)
+        self.assertEqual(sorted(st._lazy_fields), ['a', 'b', 'd'])
+        self.assertEqual(doc.a, 1)
+        self.assertEqual(sorted(st._lazy_fields), ['b', 'd'])
+        self.assertEqual(doc.d, 'default')
+        self.assertEqual(st.document, dict(_id=1, a=1, b=[dict(c=1)], d='default'))
+        self.assertIsNone(st._lazy_fields)
+
+    def test_invalid_field(self):
+        doc = self.Basic.query.get(_id=2)
+        self.assertEqual(doc.b, [])
+        with self.assertRaises(S.Invalid):
+            doc.a
+
+    def test_flush(self):
+        doc = self.Basic.query.get(_id=1)
+        doc.a = 5
+        self.assertEqual(state(doc).status, 'dirty')
+        with patch.object(self.session.impl, 'update_partial',
+                          wraps=self.session.impl.update_partial) as update_partial:
+            self.session.flush()
+        self.assertEqual(update_partial.call_args[0][2], {'$set': {'a': 5}})
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': 1}),
+                         dict(_id=1, a=5, b=[dict(c=1)], extra=True))
+
+    def test_refresh(self):
+        doc = self.Basic.query.get(_id=1)
+        self.assertEqual(doc.a, 1)
+        self.session.impl.db.basic.update_one({'_id': 1}, {'$set': {'a': 10}})
+        self.assertIs(self.Basic.query.find({'_id': 1}, refresh=True).first(), doc)
+        self.assertEqual(doc.a, 10)
+        self.assertEqual(state(doc).status, 'clean')
+
+    def test_raw_bson(self):
+        raw = RawBSONDocument(bson.encode(dict(_id=3, a=3, b=[dict(c=3, x=1)])))
+        doc = mapper(self.Basic).create_many([raw], {}, remake=False)[0]
+        self.assertIsInstance(doc, self.Basic)
+        self.assertEqual(doc._id, 3)
+        self.assertEqual(doc.b, [dict(c=3)])
+        self.assertEqual(sorted(state(doc)._lazy_fields), ['a', 'd'])
+        self.assertIsInstance(state(doc).document['b'][0], Object)
+
+
+class TestLazyValidation(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore)
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+                lazy_validation = True
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+            b = FieldProperty(int)
+            c = FieldProperty(int)
+        Mapper.compile_all()
+        self.Basic = Basic
+        self.session.impl.db.basic.insert_many([
+            dict(_id=1, a=1, b=1, c=1),
+            dict(_id=2, a=2, b='invalid', c='invalid'),
+        ])
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_fields_validated_when_accessed(self):
+        with patch.object(S.Int, '_validate', autospec=True, side_effect=S.Int._validate) as validate:
+            doc = self.Basic.query.find({'_id': 1}).first()
+            self.assertEqual(validate.call_count, 1)
+            self.assertEqual(doc.a, 1)
+            self.assertEqual(validate.call_count, 2)
+        self.assertEqual(sorted(state(doc)._lazy_fields), ['b', 'c'])
+
+    def test_validated_at_flush(self):
+        doc = self.Basic.query.get(_id=2)
+        doc.a = 3
+        with self.assertRaises(S.Invalid) as cm:
+            self.session.flush()
+        self.assertEqual(sorted(cm.exception.error_dict), ['b', 'c'])
+        self.session.expunge(doc)
+        doc = self.Basic.query.get(_id=1)
+        self.assertEqual(state(doc).status, 'clean')
+        doc.a = 3
+        self.session.flush()
+        self.assertIsNone(state(doc)._lazy_fields)
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': 1})['a'], 3)
+
+
+class TestDeferredFields(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore)
+        class Page(MappedClass):
+            class __mongometa__:
+                name = 'page'
+                session = self.session
+                deferred_fields = ['history']
+            _id = FieldProperty(int)
+            title = FieldProperty(str)
+            body = FieldProperty(str, if_missing='', deferred=True)
+            history = FieldProperty([str])
+        Mapper.compile_all()
+        self.Page = Page
+        self.session.impl.db.page.insert_many([
+            dict(_id=i, title='t%d' % i, body='b%d' % i, history=['h%d' % i]) for i in range(3)])
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def _count_finds(self):
+        return patch.object(self.session.impl, 'find', wraps=self.session.impl.find)
+
+    def test_loaded_when_accessed(self):
+        self.assertEqual(mapper(self.Page).deferred_fields, {'body', 'history'})
+        page = self.Page.query.get(_id=1)
+        self.assertEqual(state(page).deferred, {'body', 'history'})
+        with self._count_finds() as find:
+            self.assertEqual(page.title, 't1')
+            self.assertEqual(find.call_count, 0)
+            self.assertEqual(page.body, 'b1')
+            self.assertEqual(page.body, 'b1')
+            self.assertEqual(find.call_count, 1)
+        self.assertEqual(find.call_args[1]['projection'], {'body': 1})
+        self.assertEqual(page.history, ['h1'])
+        self.assertEqual(state(page).deferred, set())
+        self.assertEqual(state(page).status, 'clean')
+
+    def _note_class(self, **options):
+        class Note(MappedClass):
+            __mongometa__ = type('__mongometa__', (), dict(name='note', session=self.session, **options))
+            _id = FieldProperty(int)
+            title = FieldProperty(str)
+            text = FieldProperty(S.String(required=True), deferred=True)
+            size = FieldProperty(S.Int(if_missing=5), deferred=True)
+        Mapper.compile_all()
+        self.session.impl.db.note.insert_one(dict(_id=1, title='t', text='x', size=2))
+        return Note
+
+    def test_required_deferred_field(self):
+        Note = self._note_class()
+        note = Note.query.get(_id=1)
+        self.assertEqual(state(note).document, {'_id': 1, 'title': 't'})
+        self.assertEqual(state(note).deferred, {'text', 'size'})
+        self.assertEqual([n._id for n in Note.query.find()], [1])
+        self.assertEqual(note.size, 2)
+        self.assertEqual(note.text, 'x')
+
+    def test_required_deferred_field_lazy(self):
+        for option in ('lazy_validation', 'lazy_decoding'):
+            with self.subTest(option):
+                Note = self._note_class(**{option: True})
+                note = Note.query.get(_id=1)
+                self.assertEqual(state(note).document, {'_id': 1, 'title': 't'})
+                note.title = 'changed'
+                self.session.flush()
+                self.assertEqual(note.text, 'x')
+                self.assertEqual(self.session.impl.db.note.find_one(),
+                                 dict(_id=1, title='changed', text='x', size=2))
+                self.session.clear()
+                self.session.impl.db.note.delete_many({})
+
+    def test_positional_projection(self):
+        page = self.Page.query.find({'_id': 1}, {'title': 1, 'body': 1}).first()
+        self.assertEqual(state(page).deferred, set())
+        self.assertEqual(page.body, 'b1')
+
+    def test_explicit_projection(self):
+        page = self.Page.query.find({'_id': 1}, projection=['title', 'body']).first()
+        self.assertEqual(state(page).deferred, set())
+        self.assertEqual(page.body, 'b1')
+
+    def test_undefer(self):
+        with self._count_finds() as find:
+            pages = self.Page.query.find().sort('_id').undefer('body').all()
+            self.assertEqual(find.call_count, 2)
+            self.assertEqual([p.body for p in pages], ['b0', 'b1', 'b2'])
+            self.assertEqual(find.call_count, 2)
+        self.assertEqual(state(pages[0]).deferred, {'history'})
+        pages = self.session.get_many(self.Page, [0, 1])
+        self.session.load_fields(pages, 'body', 'history')
+        self.assertEqual(state(pages[1]).deferred, set())
+
+    def test_flush_leaves_deferred_fields(self):
+        page = self.Page.query.get(_id=1)
+        page.title = 'changed'
+        self.session.flush()
+        page = self.Page.query.get(_id=2)
+        page.title = 'changed'
+        state(page).changes = None
+        self.session.flush()
+        page.body = 'new body'
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.page.find_one({'_id': 1}),
+                         dict(_id=1, title='changed', body='b1', history=['h1']))
+        self.assertEqual(self.session.impl.db.page.find_one({'_id': 2}),
+                         dict(_id=2, title='changed', body='new body', history=['h2']))
+
+    def test_refresh(self):
+        page = self.Page.query.get(_id=1)
+        self.assertEqual(page.body, 'b1')
+        self.session.impl.db.page.update_one({'_id': 1}, {'$set': {'body': 'changed'}})
+        self.Page.query.find({'_id': 1}, refresh=True).first()
+        self.assertEqual(page.body, 'changed')
+
 
 class TestRealBasicMapping(TestBasicMapping):
     DATASTORE = f"mongodb://localhost/test_ming_TestRealBasicMapping_{os.getpid()}?serverSelectionTimeoutMS=100"
@@ -867,4 +1636,105 @@ class TestBeforeSave(TestCase):
         self.session.flush()  # then save
         self.session.close()
         doc = self.Basic.query.get(doc._id)
-        assert doc.a == 9, doc.a
\ No newline at end of file
+        assert doc.a == 9, doc.a
+
+class TestValidateReads(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore, validate_reads='sample:0')
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+        class Validated(MappedClass):
+            class __mongometa__:
+                name = 'validated'
+                session = self.session
+                validate_reads = 'full'
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+        Mapper.compile_all()
+        self.Basic = Basic
+        self.Validated = Validated
+        self.session.impl.db.basic.insert_one(dict(_id=1, a='invalid'))
+        self.session.impl.db.validated.insert_one(dict(_id=1, a='invalid'))
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_session_option(self):
+        doc = self.Basic.query.get(_id=1)
+        self.assertEqual(doc.a, 'invalid')
+        doc.a = 2
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one(), dict(_id=1, a=2))
+
+    def test_mapper_option(self):
+        self.assertRaises(S.Invalid, self.Validated.query.get, _id=1)
+
+
+class TestValidateSaves(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore, validate_reads='sample:0')
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+                validate_saves = 'changed'
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+            b = FieldProperty(int)
+            tags = FieldProperty([str])
+        Mapper.compile_all()
+        self.Basic = Basic
+        self.session.impl.db.basic.insert_one(dict(_id=1, a=1, b='invalid', tags=[]))
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_not_validated_by_default(self):
+        self.Basic.query.mapper.collection.m.validate_saves = None
+        doc = self.Basic.query.get(_id=1)
+        doc.tags.append(5)
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one()['tags'], [5])
+
+    def test_only_changed_fields(self):
+        doc = self.Basic.query.get(_id=1)
+        doc.a = 2
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one()['a'], 2)
+
+    def test_changed_in_place(self):
+        doc = self.Basic.query.get(_id=1)
+        doc.tags.append(5)
+        with self.assertRaises(S.Invalid) as cm:
+            self.session.flush()
+        self.assertEqual(list(cm.exception.error_dict), ['tags'])
+
+    def test_full(self):
+        self.Basic.query.mapper.collection.m.validate_saves = 'full'
+        doc = self.Basic.query.get(_id=1)
+        doc.a = 2
+        with self.assertRaises(S.Invalid) as cm:
+            self.session.flush()
+        self.assertEqual(list(cm.exception.error_dict), ['b'])
+
+    def test_saves_validated_values(self):
+        self.Basic.query.mapper.collection.m.validate_saves = 'full'
+        self.session.impl.db.basic.insert_one(dict(_id=2, a=1, b=2))
+        doc = self.Basic.query.get(_id=2)
+        state(doc).document['a'] = 2.0
+        state(doc).soil()
+        self.session.flush()
+        saved = self.session.impl.db.basic.find_one({'_id': 2})
+        self.assertEqual(saved, dict(_id=2, a=2, b=2, tags=[]))
+        self.assertIs(type(saved['a']), int)
+        self.assertIs(type(doc.a), int)
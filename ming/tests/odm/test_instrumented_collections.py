@@ -100,3 +100,38 @@ class TestICollection(TestCase):
         self.tracker.removed_item.assert_called_with(1)
 
 
+
+
+class TestPathRecording(TestCase):
+
+    def setUp(self):
+        self.doc = dict(
+            a=dict(b=[dict(c=1), dict(c=2)]))
+        self.tracker = Mock()
+        self.ia = instrument(self.doc['a'], self.tracker, key='a')
+
+    def test_set_path(self):
+        self.ia.b[1].c = 3
+        self.tracker.record.assert_called_with(('a', 'b', 1, 'c'), 'set', None)
+        self.ia.b[0] = dict(c=0)
+        self.tracker.record.assert_called_with(('a', 'b', 0), 'set', None)
+        del self.ia['b']
+        self.tracker.record.assert_called_with(('a', 'b'), 'set', None)
+
+    def test_list_ops(self):
+        self.ia.b.append(dict(c=3))
+        self.tracker.record.assert_called_with(('a', 'b'), 'push', [dict(c=3)])
+        self.ia.b.remove(dict(c=1))
+        self.tracker.record.assert_called_with(('a', 'b'), 'set', None)
+        self.ia.b.insert(0, dict(c=0))
+        self.tracker.record.assert_called_with(('a', 'b'), 'set', None)
+
+    def test_moved_item_path(self):
+        item = self.ia.b[1]
+        self.ia.b.insert(0, dict(c=0))
+        item.c = 5
+        self.tracker.record.assert_called_with(('a', 'b', 2, 'c'), 'set', None)
+
+    def test_invalid_key(self):
+        self.ia['x.y'] = 1
+        self.tracker.record.assert_called_with(('a',), 'set', None)
@@ -2,12 +2,15 @@ from unittest import TestCase
 
 from unittest.mock import Mock, patch
 
+import bson
+
 from ming import create_datastore
 from ming import schema as S
 from ming import collection, Field, Session
 from ming.base import Object
 from ming.odm import ODMSession, mapper, state, Mapper, session
 from ming.odm import ForeignIdProperty, RelationProperty
+from ming.odm import unit_of_work
 from ming.odm.icollection import InstrumentedList, InstrumentedObj
 
 
@@ -280,6 +283,256 @@ class TestBasicMapping(TestCase):
         assert doc_after_updates.a == 1
 
 
+class TestPartialUpdate(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        session = Session(bind=self.datastore)
+        self.session = ODMSession(session)
+        basic = collection(
+            'basic', session,
+            Field('_id', S.ObjectId),
+            Field('a', int),
+            Field('b', [int]),
+            Field('c', dict(
+                    d=int, e=int)),
+            Field('f', str, if_missing=S.Missing),
+            Field('g', [dict(x=int)]))
+        class Basic:
+            pass
+        self.session.mapper(Basic, basic)
+        self.Basic = Basic
+        doc = self.Basic(a=1, b=[2,3], c=dict(d=4, e=5), f='foo',
+                         g=[dict(x=1), dict(x=2)])
+        self.session.flush()
+        self.session.clear()
+        self.doc = self.Basic.query.get(_id=doc._id)
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def _flush(self):
+        with patch.object(self.session.impl, 'update_partial',
+                          wraps=self.session.impl.update_partial) as update_partial, \
+             patch.object(self.session.impl, 'save',
+                          wraps=self.session.impl.save) as save:
+            self.session.flush()
+        self.session.clear()
+        return update_partial, save
+
+    def test_set_scalar(self):
+        self.doc.a = 2
+        update_partial, save = self._flush()
+        update_partial.assert_called_once()
+        self.assertEqual(update_partial.call_args[0][2], {'$set': {'a': 2}})
+        self.assertFalse(save.called)
+        self.assertEqual(self.Basic.query.get(_id=self.doc._id).a, 2)
+
+    def test_set_nested(self):
+        self.doc.c.d = 7
+        self.doc.g[1].x = 3
+        update_partial, save = self._flush()
+        self.assertEqual(update_partial.call_args[0][2],
+                         {'$set': {'c.d': 7, 'g.1.x': 3}})
+        obj = self.Basic.query.get(_id=self.doc._id)
+        self.assertEqual(obj.c, dict(d=7, e=5))
+        self.assertEqual(obj.g, [dict(x=1), dict(x=3)])
+
+    def test_set_list_item(self):
+        self.doc.b[-1] = 7
+        update_partial, save = self._flush()
+        self.assertEqual(update_partial.call_args[0][2], {'$set': {'b.1': 7}})
+        self.assertEqual(self.Basic.query.get(_id=self.doc._id).b, [2, 7])
+
+    def test_push_and_pull(self):
+        self.doc.b.append(4)
+        self.doc.b.extend([5, 6])
+        self.doc.g.append(dict(x=3))
+        update_partial, save = self._flush()
+        self.assertEqual(update_partial.call_args[0][2],
+                         {'$push': {'b': {'$each': [4, 5, 6]},
+                                    'g': {'$each': [{'x': 3}]}}})
+        obj = self.Basic.query.get(_id=self.doc._id)
+        obj.b.remove(2)
+        obj.b.remove(5)
+        update_partial, save = self._flush()
+        self.assertEqual(update_partial.call_args[0][2],
+                         {'$pullAll': {'b': [2, 5]}})
+        obj = self.Basic.query.get(_id=self.doc._id)
+        self.assertEqual(obj.b, [3, 4, 6])
+        self.assertEqual(obj.g, [dict(x=1), dict(x=2), dict(x=3)])
+
+    def test_pull_duplicate(self):
+        self.doc.b = [1, 2, 1]
+        self.session.flush()
+        self.doc.b.remove(1)
+        update_partial, save = self._flush()
+        self.assertEqual(update_partial.call_args[0][2], {'$set': {'b': [2, 1]}})
+
+    def test_conflicting_changes(self):
+        self.doc.g.append(dict(x=3))
+        self.doc.g[0].x = 5
+        update_partial, save = self._flush()
+        self.assertEqual(update_partial.call_args[0][2],
+                         {'$set': {'g': [{'x': 5}, {'x': 2}, {'x': 3}]}})
+
+    def test_moved_list_item(self):
+        item = self.doc.g[1]
+        self.doc.g.insert(0, dict(x=0))
+        self.session.flush()
+        item.x = 7
+        update_partial, save = self._flush()
+        self.assertEqual(update_partial.call_args[0][2], {'$set': {'g.2.x': 7}})
+        obj = self.Basic.query.get(_id=self.doc._id)
+        self.assertEqual(obj.g, [dict(x=0), dict(x=1), dict(x=7)])
+
+    def test_unset(self):
+        del self.doc.f
+        update_partial, save = self._flush()
+        self.assertEqual(update_partial.call_args[0][2], {'$unset': {'f': ''}})
+        obj = self.Basic.query.get(_id=self.doc._id)
+        self.assertRaises(AttributeError, getattr, obj, 'f')
+
+    def test_soil_after_nested_change_in_place(self):
+        state(self.doc).document['c']['d'] = 8
+        state(self.doc).soil()
+        update_partial, save = self._flush()
+        self.assertFalse(update_partial.called)
+        save.assert_called_once()
+        self.assertEqual(self.Basic.query.get(_id=self.doc._id).c, dict(d=8, e=5))
+
+    def test_consecutive_flushes(self):
+        self.doc.a = 2
+        self.session.flush()
+        self.doc.c.e = 6
+        update_partial, save = self._flush()
+        self.assertEqual(update_partial.call_args[0][2],
+                         {'$set': {'c.e': 6}})
+        obj = self.Basic.query.get(_id=self.doc._id)
+        self.assertEqual((obj.a, obj.c.e), (2, 6))
+
+    def test_replace_when_everything_changed(self):
+        self.doc.a = 2
+        self.doc.b = [1]
+        self.doc.c = dict(d=1, e=1)
+        self.doc.f = 'bar'
+        self.doc.g = []
+        update_partial, save = self._flush()
+        self.assertFalse(update_partial.called)
+        save.assert_called_once()
+
+    def test_replace_without_instrumentation(self):
+        self.session.clear()
+        obj = self.Basic.query.find().options(instrument=False).first()
+        obj.a = 2
+        update_partial, save = self._flush()
+        self.assertFalse(update_partial.called)
+        save.assert_called_once()
+
+
+class TestIdentityMapFlush(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        session = Session(bind=self.datastore)
+        self.session = ODMSession(session)
+        basic = collection(
+            'basic', session,
+            Field('_id', S.ObjectId),
+            Field('a', int))
+        class Basic:
+            pass
+        self.session.mapper(Basic, basic)
+        self.Basic = Basic
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_flush_only_saves_changed(self):
+        docs = [self.Basic(a=i) for i in range(50)]
+        self.session.flush()
+        docs[0].a = 100
+        docs[1].delete()
+        new_doc = self.Basic(a=200)
+        with patch.object(self.session.imap, 'save',
+                          wraps=self.session.imap.save) as imap_save:
+            self.session.flush()
+        self.assertEqual(sorted(c[0][0].a for c in imap_save.call_args_list), [100, 200])
+        self.assertIs(self.session.get(self.Basic, docs[0]._id), docs[0])
+        self.assertIs(self.session.get(self.Basic, new_doc._id), new_doc)
+        self.assertIs(self.session.imap.get(self.Basic, docs[1]._id), None)
+        self.assertEqual(len(list(self.session.uow)), 50)
+
+    def test_changed_id(self):
+        doc = self.Basic(a=1)
+        self.session.flush()
+        old_id = doc._id
+        doc._id = bson.ObjectId()
+        self.session.flush()
+        self.assertIs(self.session.imap.get(self.Basic, old_id), None)
+        self.assertIs(self.session.imap.get(self.Basic, doc._id), doc)
+        self.session.expunge(doc)
+        self.assertIs(self.session.imap.get(self.Basic, doc._id), None)
+
+
+class TestUnitOfWorkStatus(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        session = Session(bind=self.datastore)
+        self.session = ODMSession(session)
+        basic = collection(
+            'basic', session,
+            Field('_id', S.ObjectId),
+            Field('a', int))
+        class Basic:
+            pass
+        self.session.mapper(Basic, basic)
+        self.Basic = Basic
+
+    def tearDown(self):
+        self.session.clear()
+        self.datastore.conn.drop_all()
+
+    def test_tracks_status_changes(self):
+        uow = self.session.uow
+        docs = [self.Basic(a=i) for i in range(10)]
+        self.assertEqual(list(uow.new), docs)
+        self.session.flush()
+        self.assertEqual(list(uow.new), [])
+        self.assertEqual(len(list(uow.clean)), 10)
+        docs[3].a = 30
+        docs[5].delete()
+        self.assertEqual(list(uow.dirty), [docs[3]])
+        self.assertEqual(list(uow.deleted), [docs[5]])
+        self.assertEqual(len(uow._pending), 2)
+        self.session.flush()
+        self.assertEqual(uow._pending, {})
+        self.assertEqual(len(list(uow)), 9)
+
+    def test_flush_skips_clean(self):
+        docs = [self.Basic(a=i) for i in range(50)]
+        self.session.flush()
+        docs[0].a = 100
+        with patch('ming.odm.unit_of_work.state', wraps=unit_of_work.state) as get_state:
+            self.session.flush()
+        self.assertEqual(get_state.call_count, 1)
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': docs[0]._id})['a'], 100)
+
+    def test_expunged(self):
+        doc = self.Basic(a=1)
+        self.session.flush()
+        self.session.expunge(doc)
+        doc.a = 2
+        self.assertEqual(list(self.session.uow.dirty), [])
+        self.session.save(doc)
+        self.assertEqual(list(self.session.uow.dirty), [doc])
+        self.session.flush()
+        self.assertEqual(self.session.impl.db.basic.find_one({'_id': doc._id})['a'], 2)
+
+
 class TestRelation(TestCase):
     def setUp(self):
         self.datastore = create_datastore('mim:///test_db')
@@ -0,0 +1,176 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from ming import create_datastore, mim
+from ming.cache import query_cache, _collection_key
+from ming.declarative import Document
+from ming.metadata import Field
+from ming.odm import ODMSession, Mapper, FieldProperty
+from ming.odm.declarative import MappedClass
+from ming.session import Session
+
+
+class TestQueryCache(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = Session(bind=self.datastore)
+        class Cached(Document):
+            class __mongometa__:
+                name = 'cached'
+                session = self.session
+                query_cache = True
+            _id = Field(int)
+            a = Field(int)
+        class NotCached(Document):
+            class __mongometa__:
+                name = 'not_cached'
+                session = self.session
+            _id = Field(int)
+            a = Field(int)
+        self.Cached = Cached
+        self.NotCached = NotCached
+        for i in range(5):
+            Cached(dict(_id=i, a=i)).m.insert()
+            NotCached(dict(_id=i, a=i)).m.insert()
+        query_cache.configure(max_entries=1000, ttl=60, max_size=64 * 1024 * 1024)
+
+    def tearDown(self):
+        query_cache.configure(max_entries=1000, ttl=60, max_size=64 * 1024 * 1024)
+        self.datastore.conn.drop_all()
+
+    def _count_finds(self):
+        return patch.object(mim.Collection, 'find', autospec=True, side_effect=mim.Collection.find)
+
+    def test_reuses_results(self):
+        with self._count_finds() as find:
+            docs = self.Cached.m.find({'a': {'$gt': 1}}).sort('a').all()
+            again = self.Cached.m.find({'a': {'$gt': 1}}).sort('a').all()
+        self.assertEqual(find.call_count, 1)
+        self.assertEqual([d.a for d in docs], [2, 3, 4])
+        self.assertEqual(again, docs)
+        self.assertIsInstance(again[0], self.Cached)
+
+    def test_not_cached_class(self):
+        with self._count_finds() as find:
+            self.NotCached.m.find({}).all()
+            self.NotCached.m.find({}).all()
+        self.assertEqual(find.call_count, 2)
+
+    def test_key(self):
+        with self._count_finds() as find:
+            self.assertEqual([d.a for d in self.Cached.m.find({}).sort('a').limit(2)], [0, 1])
+            self.assertEqual([d.a for d in self.Cached.m.find({}).sort('a').skip(3)], [3, 4])
+            self.assertEqual([d.a for d in self.Cached.m.find({}).sort('a', -1).limit(2)], [4, 3])
+            self.assertEqual([d.a for d in self.Cached.m.find({}, projection={'a': 0}).sort('_id')],
+                             [None] * 5)
+            self.assertEqual([d.a for d in self.Cached.m.find({}).sort('a').limit(2)], [0, 1])
+        self.assertEqual(find.call_count, 4)
+
+    def test_results_are_copies(self):
+        doc = self.Cached.m.find({'_id': 1}).first()
+        doc.a = 100
+        self.assertEqual(self.Cached.m.find({'_id': 1}).first().a, 1)
+
+    def test_invalidated_by_writes(self):
+        self.assertEqual(self.Cached.m.find({'_id': 1}).first().a, 1)
+        doc = self.Cached.m.get(_id=1)
+        doc.a = 10
+        doc.m.save()
+        self.assertEqual(self.Cached.m.find({'_id': 1}).first().a, 10)
+        self.Cached.m.update_partial({'_id': 1}, {'$set': {'a': 20}})
+        self.assertEqual(self.Cached.m.find({'_id': 1}).first().a, 20)
+        self.Cached.m.find_one_and_update({'_id': 1}, {'$set': {'a': 30}})
+        self.assertEqual(self.Cached.m.find({'_id': 1}).first().a, 30)
+        self.Cached.m.remove({'_id': 1})
+        self.assertIsNone(self.Cached.m.find({'_id': 1}).first())
+
+    def test_generations(self):
+        cursor = self.Cached.m.find({})
+        key = _collection_key(self.datastore.db.cached)
+        generation = query_cache.generation(key)
+        self.NotCached.m.remove({})
+        self.assertEqual(query_cache.generation(key), generation)
+        self.Cached.m.remove({'_id': 4})
+        cursor.all()
+        self.assertEqual(len(query_cache), 1)
+        with patch.object(query_cache, 'generation', return_value=-1):
+            self.Cached.m.find({'_id': 0}).all()
+        self.assertEqual(len(query_cache), 1)
+
+    def test_invalidated_by_other_classes(self):
+        class Shared(Document):
+            class __mongometa__:
+                name = 'cached'
+                session = self.session
+            _id = Field(int)
+            a = Field(int)
+        self.assertEqual(self.Cached.m.find({'_id': 1}).first().a, 1)
+        Shared.m.update_partial({'_id': 1}, {'$set': {'a': 5}})
+        self.assertEqual(self.Cached.m.find({'_id': 1}).first().a, 5)
+
+    def test_distinct_clients(self):
+        collections = [mim.Connection().test_db.cached for _ in range(2)]
+        collections[0].insert_one({'_id': 1})
+        self.assertEqual(list(query_cache.cursor(collections[0], {})), [{'_id': 1}])
+        self.assertEqual(list(query_cache.cursor(collections[1], {})), [])
+
+    def test_ttl(self):
+        query_cache.configure(ttl=0)
+        with self._count_finds() as find:
+            self.Cached.m.find({}).all()
+            self.Cached.m.find({}).all()
+        self.assertEqual(find.call_count, 2)
+
+    def test_max_entries(self):
+        query_cache.configure(max_entries=2)
+        for i in range(3):
+            self.Cached.m.find({'_id': i}).all()
+        self.assertEqual(len(query_cache), 2)
+        with self._count_finds() as find:
+            self.Cached.m.find({'_id': 2}).all()
+            self.Cached.m.find({'_id': 0}).all()
+        self.assertEqual(find.call_count, 1)
+
+    def test_max_size(self):
+        query_cache.configure(max_size=30)
+        self.Cached.m.find({'_id': 0}).all()
+        self.assertEqual(len(query_cache), 1)
+        self.Cached.m.find({}).all()
+        self.assertEqual(len(query_cache), 1)
+        self.Cached.m.find({'_id': 1}).all()
+        self.assertEqual(len(query_cache), 1)
+
+
+class TestODMQueryCache(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = ODMSession(bind=self.datastore)
+        class Basic(MappedClass):
+            class __mongometa__:
+                name = 'basic'
+                session = self.session
+                query_cache = True
+            _id = FieldProperty(int)
+            a = FieldProperty(int)
+        Mapper.compile_all()
+        self.Basic = Basic
+        query_cache.clear()
+
+    def tearDown(self):
+        self.session.clear()
+        query_cache.clear()
+        self.datastore.conn.drop_all()
+
+    def test_invalidated_by_flush(self):
+        self.Basic(_id=1, a=1)
+        self.session.flush()
+        self.session.clear()
+        self.assertEqual(self.Basic.query.find({'a': 1}).count(), 1)
+        doc = self.Basic.query.find({'a': 1}).first()
+        doc.a = 2
+        self.session.flush()
+        self.session.clear()
+        self.assertIsNone(self.Basic.query.find({'a': 1}).first())
+        self.assertEqual(self.Basic.query.find({'a': 2}).first()._id, 1)
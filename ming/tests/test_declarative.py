@@ -3,6 +3,7 @@ from unittest import TestCase
 from collections import defaultdict
 
 from unittest import mock
+import bson
 import pymongo
 from pymongo.errors import AutoReconnect
 
@@ -510,3 +511,105 @@ class TestMigration(TestCase):
         self.assertEqual(self.TestDoc.make(dict(version=1, a=5)),
                          dict(version=2, a=5, b=42))
 
+
+
+class TestValidateReads(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = Session(bind=self.datastore)
+        class Sampled(Document):
+            class __mongometa__:
+                name = 'sampled'
+                session = self.session
+                validate_reads = 'sample:0'
+            _id = Field(S.ObjectId)
+            a = Field(int)
+            b = Field(S.Object(dict(c=int)))
+        self.Sampled = Sampled
+        self._id = bson.ObjectId()
+        self.datastore.db.sampled.insert_one(dict(_id=self._id, a='not an int', b=dict(c=1)))
+
+    def tearDown(self):
+        self.datastore.conn.drop_all()
+
+    def test_parse(self):
+        self.assertRaises(ValueError, Session, validate_reads='sample')
+        self.assertRaises(ValueError, Session, validate_reads='sample:2')
+        self.assertRaises(ValueError, Session, validate_reads='some')
+        Session(validate_reads='full')
+
+    def test_trusted(self):
+        doc = self.Sampled.m.find().one()
+        self.assertIsInstance(doc, self.Sampled)
+        self.assertEqual(doc._id, self._id)
+        self.assertEqual(doc.a, 'not an int')
+        self.assertEqual(doc.b.c, 1)
+        self.assertEqual(self.Sampled.m.find().next_batch(10), [doc])
+
+    def test_sampled_violation(self):
+        self.Sampled.m.validate_reads = 'sample:1'
+        with mock.patch('ming.session.log') as log:
+            doc = self.Sampled.m.find().one()
+        self.assertEqual(doc.a, 'not an int')
+        self.assertEqual(self.session.read_violations, {'sampled': 1})
+        self.assertTrue(log.warning.called)
+
+    def test_session_option(self):
+        self.Sampled.m.validate_reads = None
+        self.assertRaises(S.Invalid, self.Sampled.m.find().one)
+        self.session.validate_reads = 'sample:0'
+        self.assertEqual(self.Sampled.m.find().one().a, 'not an int')
+
+    def test_valid(self):
+        self.Sampled.m.validate_reads = 'sample:1'
+        self.datastore.db.sampled.update_one({}, {'$set': {'a': 5}, '$unset': {'b': 1}})
+        doc = self.Sampled.m.find().one()
+        self.assertEqual(doc, dict(_id=self._id, a=5, b=dict(c=None)))
+        self.assertEqual(self.session.read_violations, {})
+
+
+class TestValidateSaves(TestCase):
+
+    def setUp(self):
+        self.datastore = create_datastore('mim:///test_db')
+        self.session = Session(bind=self.datastore)
+        class Doc(Document):
+            class __mongometa__:
+                name = 'doc'
+                session = self.session
+                validate_saves = 'changed'
+            _id = Field(int)
+            a = Field(int)
+            b = Field(int)
+            c = Field(int, if_missing=3)
+        self.Doc = Doc
+
+    def tearDown(self):
+        self.datastore.conn.drop_all()
+
+    def test_only_saved_fields(self):
+        doc = self.Doc(dict(_id=1, a=1, b='invalid'))
+        doc.m.save('a', 'c')
+        self.assertEqual(doc.c, 3)
+        self.assertEqual(doc.b, 'invalid')
+        doc.a = 'invalid'
+        self.assertRaises(S.Invalid, doc.m.save, 'a')
+
+    def test_full(self):
+        self.Doc.m.validate_saves = 'full'
+        doc = self.Doc(dict(_id=1, a=1, b='invalid'))
+        self.assertRaises(S.Invalid, doc.m.save, 'a')
+
+    def test_whole_document_by_default(self):
+        self.Doc.m.validate_saves = None
+        doc = self.Doc(dict(_id=1, a=1, b='invalid'))
+        self.assertRaises(S.Invalid, doc.m.save, 'a')
+
+    def test_option(self):
+        with self.assertRaises(ValueError):
+            class Other(Document):
+                class __mongometa__:
+                    name = 'other'
+                    session = self.session
+                    validate_saves = 'strict'
@@ -1,4 +1,6 @@
+import os
 import re
+import tempfile
 import uuid
 from datetime import datetime
 from unittest import TestCase
@@ -7,8 +9,8 @@ import bson
 from bson.raw_bson import RawBSONDocument
 
 from ming import create_datastore, mim
-from pymongo import UpdateOne, CursorType
-from pymongo.errors import OperationFailure, DuplicateKeyError
+from pymongo import InsertOne, ReplaceOne, UpdateOne, DeleteOne, CursorType
+from pymongo.errors import OperationFailure, DuplicateKeyError, BulkWriteError
 from unittest.mock import patch
 
 
@@ -917,6 +919,84 @@ class TestMatch(TestCase):
         self.assertIsNone(mim.match({'a': uu_diff}, doc))
 
 
+class TestCompileMatch(TestCase):
+    docs = [
+        {'a': 1, 'b': 'x'}, {'a': 1.0}, {'a': True}, {'a': None}, {}, {'a': float('nan')},
+        {'a': [1, 2, [3]]}, {'a': {'b': 1, 'c': [1, 2]}}, {'a': [{'b': 1}, {'b': 2, 'c': 'xy'}]},
+        {'a': [{'b': [{'c': 1}]}]}, {'a': 'hello', 'b': datetime(2020, 1, 1)},
+        {'a': uuid.UUID('{12345678-1234-5678-1234-567812345678}')}]
+    specs = [
+        {}, {'a': 1}, {'a': 1.0}, {'a': None}, {'a': [1, 2, [3]]}, {'a': {'b': 1, 'c': [1, 2]}},
+        {'a': {'$ne': 1}}, {'a': {'$gt': 0, '$lte': 2}}, {'a': {'$lt': 'b'}}, {'a': {'$gte': 1.5}},
+        {'a': {'$in': [2, 'hello']}}, {'a': {'$nin': [1, None]}}, {'a': {'$all': [1, 2]}},
+        {'a': {'$exists': False}}, {'a.b': 1}, {'a.b': {'$exists': True}}, {'a.1.b': 2},
+        {'a.c': 'xy'}, {'a.b.c': 1}, {'a.0': 1}, {'a': re.compile('^he')}, {'a.c': {'$regex': 'x'}},
+        {'a': {'$elemMatch': {'b': 2, 'c': {'$exists': True}}}},
+        {'$or': [{'a': 1}, {'a.b': 2}], 'b': {'$exists': False}},
+        {'a': uuid.UUID('{12345678-1234-5678-1234-567812345678}')},
+        {'b': {'$lt': datetime(2021, 1, 1)}}]
+
+    def _checked(self, check):
+        try:
+            return bool(check())
+        except Exception as e:
+            return type(e)
+
+    def test_same_as_match(self):
+        for spec in self.specs:
+            matcher = mim.compile_match(spec)
+            for doc in self.docs:
+                self.assertEqual(self._checked(lambda: matcher(doc)),
+                                 self._checked(lambda: mim.match(spec, doc) is not None),
+                                 (spec, doc))
+
+    def test_shared_by_shape(self):
+        mim._matcher_factory.cache_clear()
+        self.assertTrue(mim.compile_match({'a.b': {'$in': [1, 2]}, 'c': 1})({'a': {'b': 2}, 'c': 1}))
+        self.assertFalse(mim.compile_match({'a.b': {'$in': [3]}, 'c': 'x'})({'a': {'b': 2}, 'c': 'x'}))
+        info = mim._matcher_factory.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_uncompiled_operators(self):
+        matcher = mim.compile_match({'a': {'$options': 'i', '$regex': 'X'}, 'b.$': 1})
+        self.assertFalse(matcher({'a': 'x', 'b': [1]}))
+        with self.assertRaises(NotImplementedError):
+            mim.compile_match({'a': {'$size': 1}})({'a': 1})
+
+    def test_missing_parent(self):
+        # match creates the missing ``a`` while traversing ``a.b``, the compiled
+        # matcher doesn't and gives MongoDB's answer
+        spec = {'a.b': {'$exists': False}, 'a': {'$exists': False}}
+        self.assertTrue(mim.compile_match(spec)({}))
+        self.assertIsNone(mim.match(spec, {}))
+
+    def test_errors(self):
+        self.assertTrue(mim.compile_match({'a': {'$lt': 'b'}})({'a': 1}))
+        with self.assertRaises(AttributeError):
+            mim.compile_match({'a.b': 1})({'a': 1})
+        with self.assertRaises(re.error):
+            mim.compile_match({'a': {'$regex': '('}})({'a': 'x'})
+        with self.assertRaises(TypeError):
+            mim.compile_match({'a': {'$in': 1}})({'a': 1})
+        broken = lambda params: lambda doc: doc.missing
+        with patch.object(mim, '_matcher_factory', lambda shape: broken):
+            with self.assertRaises(AttributeError):  # not hidden by falling back to match
+                mim.compile_match({'a': 1})({'a': 1})
+
+    def test_find(self):
+        coll = create_datastore('mim:///testdb').db.compiled
+        coll.drop()
+        coll.insert_many([dict(doc, _id=i) for i, doc in enumerate(self.docs)])
+        for spec in self.specs:
+            try:
+                expected = [i for i, doc in enumerate(self.docs) if mim.match(spec, doc) is not None]
+            except (AttributeError, TypeError, ValueError):
+                continue  # some documents can't be matched against the spec
+            self.assertEqual([doc['_id'] for doc in coll.find(spec)], expected, spec)
+        coll.update_one({'_id': 6, 'a': 2}, {'$set': {'a.$': 5}})
+        self.assertEqual(coll.find_one({'_id': 6})['a'], [1, 5, [3]])
+
+
 class TestBulkOperations(TestCase):
     def setUp(self):
         self.bind = create_datastore('mim:///testdb')
@@ -935,6 +1015,45 @@ class TestBulkOperations(TestCase):
         self.assertEqual(data, [1, 2])
 
 
+    def test_mixed_operations(self):
+        coll = self.bind.db.coll
+        coll.insert_one({'_id': 1, 'a': 1})
+        coll.insert_one({'_id': 2, 'a': 2})
+
+        result = coll.bulk_write([
+            InsertOne({'_id': 3, 'a': 3}),
+            ReplaceOne({'_id': 1}, {'_id': 1, 'a': 10}),
+            ReplaceOne({'_id': 4}, {'_id': 4, 'a': 4}, upsert=True),
+            UpdateOne({'_id': 2}, {'$set': {'a': 20}}),
+            DeleteOne({'_id': 3}),
+        ])
+
+        self.assertEqual(result.inserted_count, 1)
+        self.assertEqual(result.matched_count, 2)
+        self.assertEqual(result.upserted_ids, {2: 4})
+        self.assertEqual(result.deleted_count, 1)
+        data = sorted((d['_id'], d['a']) for d in coll.find())
+        self.assertEqual(data, [(1, 10), (2, 20), (4, 4)])
+
+    def test_ordered_stops_on_error(self):
+        coll = self.bind.db.coll
+        coll.insert_one({'_id': 1})
+
+        with self.assertRaises(BulkWriteError) as cm:
+            coll.bulk_write([InsertOne({'_id': 1}), InsertOne({'_id': 2})])
+        self.assertEqual(cm.exception.details['writeErrors'][0]['index'], 0)
+        self.assertEqual(coll.count_documents({}), 1)
+
+    def test_unordered_continues_on_error(self):
+        coll = self.bind.db.coll
+        coll.insert_one({'_id': 1})
+
+        with self.assertRaises(BulkWriteError):
+            coll.bulk_write([InsertOne({'_id': 1}), InsertOne({'_id': 2})],
+                            ordered=False)
+        self.assertEqual(coll.count_documents({}), 2)
+
+
 class TestAggregate(TestCase):
 
     def setUp(self):
@@ -969,3 +1088,233 @@ class TestAggregate(TestCase):
         res = list(res)
         self.assertEqual(len(res), 1)
         self.assertEqual(res[0]['d'], 1)
+
+
+class TestIndexedQueries(TestCase):
+
+    def setUp(self):
+        self.bind = create_datastore('mim:///testdb')
+        self.bind.conn.drop_all()
+        self.coll = self.bind.db.coll
+        self.plain = self.bind.db.plain
+        values = [0, 1, 2, 1.5, float('nan'), 'a', 'b', True, None, [1, 'a'], {'x': 1},
+                  datetime(2020, 1, 1)]
+        docs = []
+        for i in range(60):
+            doc = {'_id': i, 'b': i % 3, 'sub': [{'c': values[(i * 7) % len(values)]}]}
+            if i % 11:
+                doc['a'] = values[i % len(values)]
+            docs.append(doc)
+        for coll in (self.coll, self.plain):
+            coll.insert_many([dict(doc) for doc in docs])
+        self.coll.create_index('a')
+        self.coll.create_index([('sub.c', -1)])
+
+    def _check(self, query, sort=None):
+        expected = [d['_id'] for d in self.plain.find(query, sort=sort)]
+        self.assertEqual([d['_id'] for d in self.coll.find(query, sort=sort)], expected)
+        return self.coll.find(query, sort=sort).explain()
+
+    def _stage(self, explain):
+        plan = explain['queryPlanner']['winningPlan']
+        while 'inputStage' in plan and plan['stage'] in ('SORT', 'FETCH'):
+            plan = plan['inputStage']
+        return plan['stage']
+
+    def test_same_results(self):
+        for field in ('a', 'sub.c'):
+            for value in (0, 1, 1.5, 'a', True, datetime(2020, 1, 1)):
+                self._check({field: value})
+                self._check({field: {'$in': [value, 2]}, 'b': {'$ne': 1}})
+                for op in ('$gt', '$gte', '$lt', '$lte'):
+                    self._check({field: {op: value}})
+                    self._check({field: {op: value}}, sort=[('b', -1)])
+
+    def test_uses_index(self):
+        self.assertEqual(self._stage(self._check({'a': 1})), 'IXSCAN')
+        self.assertEqual(self._stage(self._check({'a': {'$gte': 1, '$lt': 2}})), 'IXSCAN')
+        self.assertEqual(self._stage(self._check({'sub.c': {'$in': ['a', 'b']}})), 'IXSCAN')
+        self.assertEqual(self._stage(self._check({'_id': {'$in': [3, 4]}})), 'IDHACK')
+        self.assertEqual(self._stage(self._check({'b': 1})), 'COLLSCAN')
+        self.assertEqual(self._stage(self._check({'a': None})), 'COLLSCAN')
+        explain = self.coll.find({'a': 1}).explain()
+        self.assertEqual(explain['executionStats']['nReturned'],
+                         explain['executionStats']['totalDocsExamined'])
+
+    def test_sort_with_index(self):
+        for doc in self.coll.find({'a': {'$exists': False}}):
+            self.coll.delete_one({'_id': doc['_id']})
+            self.plain.delete_one({'_id': doc['_id']})
+        self.coll.update_many({'a': {'$in': [[1, 'a'], {'x': 1}]}}, {'$set': {'a': 3}})
+        self.plain.update_many({'a': {'$in': [[1, 'a'], {'x': 1}]}}, {'$set': {'a': 3}})
+        self.coll.update_many({'a': float('nan')}, {'$set': {'a': 4}})
+        self.plain.update_many({'a': float('nan')}, {'$set': {'a': 4}})
+        for direction in (1, -1):
+            explain = self._check({}, sort=[('a', direction)])
+            self.assertEqual(explain['queryPlanner']['winningPlan']['stage'], 'FETCH')
+            self._check({'a': {'$gt': 0}}, sort=[('a', direction)])
+        explain = self._check({}, sort=[('b', 1)])
+        self.assertEqual(explain['queryPlanner']['winningPlan']['stage'], 'SORT')
+
+    def test_writes_update_index(self):
+        self.coll.update_one({'a': 1}, {'$set': {'a': 'z'}})
+        self.plain.update_one({'a': 1}, {'$set': {'a': 'z'}})
+        self.coll.replace_one({'_id': 2}, {'_id': 2, 'a': 'z'})
+        self.plain.replace_one({'_id': 2}, {'_id': 2, 'a': 'z'})
+        self.coll.delete_many({'a': 0})
+        self.plain.delete_many({'a': 0})
+        self.coll.insert_one({'_id': 100, 'a': 'z'})
+        self.plain.insert_one({'_id': 100, 'a': 'z'})
+        for value in ('z', 0, 1):
+            self._check({'a': value})
+        self._check({'a': {'$gte': 'b'}})
+        self.coll.drop_index('a')
+        self.assertEqual(self._stage(self._check({'a': 'z'})), 'COLLSCAN')
+
+
+class TestCopyOnWrite(TestCase):
+
+    def setUp(self):
+        self.coll = mim.Connection(copy_on_write=True).db.coll
+        self.doc = {'_id': 1, 'a': {'b': [1, {'c': 2}]}, 'd': [[1], {'e': 1}]}
+        self.coll.insert_one(dict(self.doc))
+
+    def test_returns_copies(self):
+        doc = self.coll.find_one()
+        self.assertIsInstance(doc, mim.CowDict)
+        self.assertEqual(doc, self.doc)
+        doc['a']['b'][1]['c'] = 3
+        doc['a']['b'].append(4)
+        for item in doc['d']:
+            item.clear()
+        doc.pop('_id')
+        self.assertEqual(self.coll.find_one(), self.doc)
+        self.assertEqual(doc, {'a': {'b': [1, {'c': 3}, 4]}, 'd': [[], {}]})
+
+    def test_plain_copies(self):
+        doc = self.coll.find_one()
+        for copied in (dict(doc), doc.copy(), {**doc}, bson.BSON.encode(doc).decode()):
+            copied['a']['b'].append(5)
+            copied['d'][1]['e'] = 2
+        self.assertEqual(self.coll.find_one(), self.doc)
+
+    def test_updates_keep_returned_documents(self):
+        doc = self.coll.find_one()
+        self.coll.update_one({'_id': 1}, {'$set': {'a.b.1.c': 3}, '$push': {'d': 2}})
+        self.assertEqual(doc, self.doc)
+        self.assertEqual(self.coll.find_one({'a.b.c': 3})['d'], [[1], {'e': 1}, 2])
+
+    def test_projection(self):
+        doc = self.coll.find_one({}, {'a.b': 1})
+        doc['a']['b'].clear()
+        self.assertEqual(self.coll.find_one(), self.doc)
+
+
+class TestRawStorage(TestCase):
+
+    def setUp(self):
+        self.coll = mim.Connection(raw_storage=True).db.coll
+        self.coll.create_index('a', unique=True)
+        self.coll.create_index('b.c')
+        self.coll.insert_many([{'_id': i, 'a': i, 'b': {'c': i % 2}} for i in range(4)])
+
+    def test_stores_bson(self):
+        self.assertTrue(all(isinstance(doc, bytes) for doc in self.coll._data.values()))
+        doc = self.coll.find_one({'b.c': 1}, sort=[('a', -1)])
+        self.assertEqual(doc, {'_id': 3, 'a': 3, 'b': {'c': 1}})
+        doc['b']['c'] = 2
+        self.assertEqual(self.coll.count_documents({'b.c': 2}), 0)
+
+    def test_writes(self):
+        self.coll.insert_one({'a': 10})
+        self.assertIsInstance(self.coll.find_one({'a': 10})['_id'], bson.ObjectId)
+        self.coll.update_many({'b.c': 0}, {'$set': {'b.c': 5}})
+        self.assertEqual([doc['_id'] for doc in self.coll.find({'b.c': 5})], [0, 2])
+        self.assertEqual(self.coll.find({'b.c': 5}).explain()['queryPlanner']['winningPlan']['stage'],
+                         'FETCH')
+        with self.assertRaises(DuplicateKeyError):
+            self.coll.update_one({'_id': 1}, {'$set': {'a': 0}})
+        self.assertEqual(self.coll.find_one({'_id': 1})['a'], 1)
+        self.coll.delete_many({'b.c': 1})
+        self.assertEqual(self.coll.count_documents({}), 3)
+        self.assertTrue(all(isinstance(doc, bytes) for doc in self.coll._data.values()))
+
+
+class TestSnapshot(TestCase):
+
+    def setUp(self):
+        self.connection = mim.Connection()
+        coll = self.connection.db.coll
+        coll.create_index('a', unique=True)
+        coll.create_index([('b.c', -1)], sparse=True)
+        coll.insert_many([{'_id': i, 'a': i, 'b': {'c': [i, str(i)]}} for i in range(5)])
+        coll.delete_one({'_id': 1})
+        self.connection.other['fs.files'].insert_one({'_id': uuid.UUID(int=1), 'when': datetime(2020, 1, 1)})
+        self.connection.other.keys.insert_one(RawBSONDocument(bson.encode({'_id': 1, 'k': 'v'})))
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, 'snapshot.bson')
+
+    def _check(self, restored):
+        restored.restore(self.path)
+        self.assertEqual(sorted(restored.list_database_names()), ['db', 'other'])
+        coll = restored.db.coll
+        self.assertEqual(list(coll.find()), list(self.connection.db.coll.find()))
+        self.assertEqual(coll.index_information(), self.connection.db.coll.index_information())
+        self.assertEqual(coll._unique_indexes, self.connection.db.coll._unique_indexes)
+        with self.assertRaises(DuplicateKeyError):
+            coll.insert_one({'_id': 10, 'a': 2})
+        self.assertEqual(coll.find({'b.c': '3'}).explain()['queryPlanner']['winningPlan']['stage'], 'FETCH')
+        self.assertEqual(list(restored.other['fs.files'].find()), list(self.connection.other['fs.files'].find()))
+        self.assertEqual(restored.other.keys.find_one().raw, bson.encode({'_id': 1, 'k': 'v'}))
+
+    def test_round_trip(self):
+        self.connection.snapshot(self.path)
+        restored = mim.Connection()
+        restored.db.stale.insert_one({'_id': 1})
+        self._check(restored)
+        self.assertNotIn('stale', restored.db.list_collection_names())
+
+    def test_raw_storage(self):
+        self.connection.snapshot(self.path)
+        restored = mim.Connection(raw_storage=True)
+        self._check(restored)
+        self.assertTrue(all(isinstance(doc, bytes) for doc in restored.db.coll._data.values()))
+        restored.snapshot(self.path)
+        self._check(mim.Connection())
+
+    def test_existing_handles(self):
+        datastore = create_datastore('mim:///test_snapshot')
+        self.addCleanup(datastore.conn.drop_database, 'test_snapshot')
+        coll = datastore.db.coll
+        coll.create_index('a', unique=True)
+        coll.insert_many([{'_id': 1, 'a': 1}, {'_id': 2, 'a': 2}])
+        datastore.conn.snapshot(self.path)
+        coll.delete_one({'_id': 1})
+        coll.insert_one({'_id': 3, 'a': 1})
+        datastore.db.stale.insert_one({'_id': 1})
+        datastore.conn.restore(self.path)
+        self.assertIs(datastore.db.coll, coll)
+        self.assertEqual(list(datastore.db.coll.find().sort('_id')), [{'_id': 1, 'a': 1}, {'_id': 2, 'a': 2}])
+        self.assertNotIn('stale', datastore.db.list_collection_names())
+        with self.assertRaises(DuplicateKeyError):
+            coll.insert_one({'_id': 3, 'a': 1})
+
+    def test_indexes_saved_as_bson(self):
+        self.connection.snapshot(self.path)
+        with open(self.path, 'rb') as f:
+            stream = mim._bson_stream(f.read())
+        next(stream)
+        info = bson.decode(next(stream))
+        self.assertEqual(info['collection'], 'coll')
+        self.assertEqual(info['indexes'], [
+            {'key': [['a', 1]], 'unique': True, 'name': 'a'},
+            {'key': [['b.c', -1]], 'sparse': True, 'name': 'b.c'},
+        ])
+        self.assertNotIn('state', info)
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(bson.encode({'a': 1}))
+        with self.assertRaises(ValueError):
+            mim.Connection().restore(self.path)
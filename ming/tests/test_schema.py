@@ -241,5 +241,88 @@ class TestNumberDecimal(TestCase):
         self.assertRaises(S.Invalid, si.validate, "12.42")
 
 
+class TestCompiledObject(TestCase):
+
+    def setUp(self):
+        self.schema = S.Object(dict(
+            _id=S.ObjectId(if_missing=None),
+            name=S.String(required=True),
+            score=S.Float(if_missing=1.5),
+            count=S.Int(if_missing=0),
+            tags=[str],
+            sub=dict(a=int, b=S.Array(S.Object(dict(c=str)))),
+            created=datetime))
+
+    def _uncompiled(self, value, **kw):
+        return self.schema._validate_fields(value, **kw)
+
+    def test_compiled(self):
+        self.assertIsNotNone(self.schema._compiled)
+        self.assertIsNotNone(self.schema.fields['sub']._compiled)
+
+    def test_same_result(self):
+        values = [
+            dict(name='x'),
+            dict(_id=bson.ObjectId(), name='x', score=2, count=3, tags=['a', 'b'],
+                 sub=dict(a=1, b=[dict(c='d'), dict()]),
+                 created=datetime(2012, 2, 8, 12, 42, 14, 123456)),
+            dict(name='x', score=None, count=None, tags=None),
+            dict(name='x', tags=('a',), sub=dict(b=[])),
+        ]
+        for value in values:
+            result = self.schema.validate(value)
+            self.assertEqual(self._uncompiled(value), result)
+            self.assertTrue(isinstance(result.sub, dict))
+
+    def test_defaults(self):
+        result = self.schema.validate(dict(name='x'))
+        self.assertEqual(1.5, result.score)
+        self.assertEqual(0, result.count)
+        self.assertEqual([], result.tags)
+        self.assertEqual(dict(a=None, b=[]), result.sub)
+
+    def test_extra(self):
+        value = dict(name='x', extra=1, sub=dict(extra=2))
+        self.assertRaises(S.Invalid, self.schema.validate, value)
+        self.assertEqual(
+            dict(_id=None, name='x', extra=1, score=1.5, count=0, tags=[],
+                 sub=dict(extra=2, a=None, b=[]), created=None),
+            self.schema.validate(value, allow_extra=True, strip_extra=False))
+        self.assertEqual(
+            self._uncompiled(value, allow_extra=True, strip_extra=True),
+            self.schema.validate(value, allow_extra=True, strip_extra=True))
+
+    def test_detailed_errors(self):
+        with self.assertRaises(S.Invalid) as cm:
+            self.schema.validate(dict(count='x', tags=[1], sub=dict(b=[dict(c=2)])))
+        self.assertEqual({'name', 'count', 'tags', 'sub'}, set(cm.exception.error_dict))
+        self.assertIsInstance(cm.exception.error_dict['tags'].error_list[0], S.Invalid)
+
+    def test_conversions(self):
+        result = self.schema.validate(dict(name='x', count=True))
+        self.assertIsInstance(result['count'], int)
+
+    def test_extend(self):
+        self.schema._compiled
+        self.schema.extend(S.Object(dict(more=int)))
+        self.assertEqual(5, self.schema.validate(dict(name='x', more=5)).more)
+
+    def test_homogenous(self):
+        si = S.Object({str: int})
+        self.assertIsNone(si._compiled)
+        self.assertEqual(dict(a=1), si.validate(dict(a=1)))
+
+    def test_document(self):
+        class Doc(Document):
+            class __mongometa__:
+                name = 'doc'
+            _id = Field(int)
+            a = Field(str)
+        self.assertIsNotNone(Doc.m.schema._compiled)
+        doc = Doc.make(dict(_id=1, a='b'))
+        self.assertIsInstance(doc, Doc)
+        self.assertEqual(dict(_id=1, a='b'), doc)
+
+
 if __name__ == '__main__':
     main()
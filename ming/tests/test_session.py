@@ -150,6 +150,32 @@ class TestSession(TestCase):
         TestDoc = self.TestDoc
         self.assertRaises(ValueError, sess.find, TestDoc, a=5)
 
+    def test_get_many(self):
+        impl = self.bind.db['test_doc']
+        stored = {i: dict(_id=i, a=i) for i in range(5)}
+        impl.find.side_effect = lambda spec: [stored[i] for i in spec['_id']['$in'] if i in stored]
+        docs = self.TestDocNoSchema.m.get_many([3, 7, 0, 3])
+        impl.find.assert_called_once_with({'_id': {'$in': [3, 7, 0]}})
+        self.assertEqual([d.a if d else None for d in docs], [3, None, 0, 3])
+        self.assertIsInstance(docs[0], self.TestDocNoSchema)
+        impl.find.reset_mock()
+        docs = self.session.get_many(self.TestDocNoSchema, range(5), chunk_size=2)
+        self.assertEqual(impl.find.call_count, 3)
+        self.assertEqual([d._id for d in docs], [0, 1, 2, 3, 4])
+
+    def test_insert_op(self):
+        doc = self.TestDocNoSchema(dict(a=5))
+        op = self.session.insert_op(doc)
+        self.assertIsInstance(doc._id, bson.ObjectId)
+        self.assertEqual(op._doc, dict(_id=doc._id, a=5))
+
+    def test_iter_batches(self):
+        impl = self.bind.db['test_doc']
+        impl.find.return_value = iter([dict(_id=i, a=i) for i in range(5)])
+        batches = list(self.TestDocNoSchema.m.find({}).iter_batches(2))
+        self.assertEqual([[d.a for d in batch] for batch in batches], [[0, 1], [2, 3], [4]])
+        self.assertIsInstance(batches[0][0], self.TestDocNoSchema)
+
     def test_aggregations(self):
         # just check that they exist & run, no input/output checks
         self.TestDoc.m.aggregate()
@@ -160,3 +160,21 @@ def fix_write_concern(kwargs):
         warnings.warn('safe option is now deprecated', DeprecationWarning, stacklevel=2)
         kwargs['w'] = int(kwargs.pop('safe'))
     return kwargs
+
+def parse_validate_reads(validate_reads):
+    """Returns the fraction of the read documents that ``validate_reads`` validates.
+
+    ``None`` and ``'full'`` validate all of them and return ``None``,
+    ``'sample:0.01'`` validates 1% of them and returns ``0.01``.
+    """
+    if validate_reads is None or validate_reads == 'full':
+        return None
+    mode, _, rate = str(validate_reads).partition(':')
+    try:
+        rate = float(rate)
+    except ValueError:
+        rate = -1
+    if mode != 'sample' or not 0 <= rate <= 1:
+        raise ValueError("validate_reads must be 'full' or 'sample:<rate>' "
+                         "with a rate between 0 and 1, not %r" % (validate_reads,))
+    return rate